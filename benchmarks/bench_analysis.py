@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Benchmarks for the raster analysis hot paths on synthetic GeoTIFFs.
+
+Each (benchmark, size, layout, nodata fraction) case runs in a fresh process
+and records wall time, CPU time, peak memory and bytes read. Python heap
+peaks come from one extra tracemalloc run, so tracing does not slow down the
+timed runs. Results are appended to a JSON-lines history keyed by git
+commit, so runs on different commits can be compared with --compare.
+
+Example:
+    python benchmarks/bench_analysis.py --sizes assaba district --repeat 3 --compare
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import multiprocessing
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'climate-analysis'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'wsi_calculation'))
+
+DATA_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'data')
+HISTORY_PATH = os.path.join(REPO_ROOT, 'benchmarks', 'history.jsonl')
+
+# (rows, cols): from the Assaba precipitation tiles (~66 KB) up to Sahel scale
+SIZES = {
+    "assaba": (65, 46),
+    "district": (769, 565),
+    "region": (4000, 3000),
+    "sahel": (12000, 9000)
+}
+
+LAYOUTS = {
+    "striped": {},
+    "tiled": {"tiled": True, "blockxsize": 256, "blockysize": 256},
+    "tiled-lzw": {"tiled": True, "blockxsize": 256, "blockysize": 256, "compress": "lzw"}
+}
+
+NODATA_FRACTIONS = [0.0, 0.3, 0.9]
+
+# Same NoData conventions as the hackathon rasters
+NODATA = -3.4028234663852886e+38
+SENTINEL = 65533
+
+# Number of yearly rasters generated per case (time series / comparison inputs)
+N_YEARS = 3
+
+
+def make_synthetic_raster(path, shape, layout, nodata_fraction, seed):
+    """
+    Writes a float32 GeoTIFF with a smooth north-south gradient plus noise,
+    a fraction of NoData pixels and a few 65533 sentinel cells.
+    """
+    import rasterio
+    from rasterio.transform import from_origin
+
+    rng = np.random.default_rng(seed)
+    rows, cols = shape
+    gradient = np.linspace(500, 80, rows, dtype=np.float32)[:, np.newaxis]
+    data = gradient + rng.normal(0, 20, size=shape).astype(np.float32)
+    data[rng.random(shape) < nodata_fraction] = NODATA
+    data[rng.random(shape) < 0.001] = SENTINEL
+
+    profile = {
+        "driver": "GTiff",
+        "height": rows,
+        "width": cols,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:4326",
+        "transform": from_origin(-17.0, 24.0, 0.05, 0.05),
+        "nodata": NODATA
+    }
+    profile.update(LAYOUTS[layout])
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data, 1)
+
+
+def generate_dataset(size, layout, nodata_fraction, data_dir=DATA_DIR):
+    """
+    Returns N_YEARS synthetic rasters for a case, generating them only once.
+    """
+    case_dir = os.path.join(data_dir, f"{size}_{layout}_nd{int(nodata_fraction * 100)}")
+    os.makedirs(case_dir, exist_ok=True)
+    paths = []
+    for year in range(N_YEARS):
+        path = os.path.join(case_dir, f"{2010 + year}R.tif")
+        if not os.path.exists(path):
+            make_synthetic_raster(path, SIZES[size], layout, nodata_fraction, seed=year)
+        paths.append(path)
+    return paths
+
+
+# Each bench_* function does its imports and returns the callable to time,
+# so module import cost is not measured.
+def bench_calculate_time_series(files, workdir):
+    from analysis_tools.extra_analysis_module import calculate_time_series
+    return lambda: calculate_time_series(files)
+
+
+def bench_raster_difference(files, workdir):
+    from run_precipitation_analysis import raster_difference
+    return lambda: raster_difference(files[0], files[-1], os.path.join(workdir, "difference.tif"))
+
+
+def bench_get_raster_stats(files, workdir):
+    from analysis_tools.raster_io_module import read_masked
+    from analysis_tools.stats_module import get_raster_stats
+    return lambda: get_raster_stats(read_masked(files[0], no_data_values=(SENTINEL,)))
+
+
+def bench_calculate_gradient(files, workdir):
+    from calculate_precipitation_gradient import calculate_gradient
+    return lambda: calculate_gradient(files[0], os.path.join(workdir, "gradient.tif"))
+
+
+def bench_compare_rasters(files, workdir):
+    from analysis_tools.visualization_module import compare_rasters
+    return lambda: compare_rasters(files, workdir, "benchmark")
+
+
+BENCHMARKS = {
+    "calculate_time_series": bench_calculate_time_series,
+    "raster_difference": bench_raster_difference,
+    "get_raster_stats": bench_get_raster_stats,
+    "calculate_gradient": bench_calculate_gradient,
+    "compare_rasters": bench_compare_rasters
+}
+
+
+def _io_counters():
+    """
+    Bytes read/written by this process (Linux /proc), or None elsewhere.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _run_in_child(name, files, workdir, queue, trace=False):
+    """
+    Runs one benchmark in a fresh process and reports its measurements:
+    times, peak RSS and I/O, or only the tracemalloc peak if trace is set.
+    """
+    import io
+    import resource
+    import tracemalloc
+    import contextlib
+    import matplotlib
+    matplotlib.use("Agg")
+
+    os.makedirs(workdir, exist_ok=True)
+    run = BENCHMARKS[name](files, workdir)
+    if trace:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        queue.put({"peak_traced_mb": traced_peak / (1024.0 * 1024.0)})
+        return
+
+    io_before = _io_counters()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    # The analysis functions report progress with print; keep the output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    io_after = _io_counters()
+
+    queue.put({
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "bytes_read": None if io_before is None else io_after[0] - io_before[0],
+        "bytes_written": None if io_before is None else io_after[1] - io_before[1]
+    })
+
+
+def run_case(name, files, workdir, repeat):
+    """
+    Runs a benchmark repeat times, each in a new (spawned) process, plus one
+    untimed run under tracemalloc for the Python heap peak.
+
+    Returns:
+    - Dictionary with the best and median wall time, the other measurements
+      of the best run and peak_traced_mb.
+    """
+    context = multiprocessing.get_context("spawn")
+
+    def spawn(trace):
+        queue = context.Queue()
+        process = context.Process(target=_run_in_child, args=(name, files, workdir, queue, trace))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"Benchmark {name} failed on {files[0]} (exit code {process.exitcode})")
+        return queue.get()
+
+    runs = [spawn(trace=False) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run["wall_s"])
+    return dict(best, **spawn(trace=True), wall_median_s=statistics.median(run["wall_s"] for run in runs),
+                repeat=repeat)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def load_history(history_path=HISTORY_PATH):
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare_with_previous(record, history, threshold=0.10):
+    """
+    Prints the wall-time ratio of each case against the latest run recorded
+    for another commit, flagging slowdowns above threshold.
+
+    Returns:
+    - Number of regressions.
+    """
+    previous = next((r for r in reversed(history) if r.get("commit") != record.get("commit")), None)
+    if previous is None:
+        print("No run from another commit to compare with.")
+        return 0
+    baseline = {
+        (r["benchmark"], r["size"], r["layout"], r["nodata_fraction"]): r for r in previous["results"]
+    }
+    regressions = 0
+    print(f"Comparing with {str(previous['commit'])[:10]} ({previous['timestamp']}):")
+    for r in record["results"]:
+        key = (r["benchmark"], r["size"], r["layout"], r["nodata_fraction"])
+        if key not in baseline:
+            continue
+        ratio = r["wall_s"] / baseline[key]["wall_s"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- REGRESSION"
+            regressions += 1
+        print(f"  {key[0]:24} {key[1]:9} {key[2]:10} nd={key[3]:<4} x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the raster analysis functions on synthetic GeoTIFFs.")
+    parser.add_argument("--benchmarks", nargs="+", default=sorted(BENCHMARKS), choices=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", default=["assaba", "district", "region"], choices=list(SIZES))
+    parser.add_argument("--layouts", nargs="+", default=list(LAYOUTS), choices=list(LAYOUTS))
+    parser.add_argument("--nodata", nargs="+", type=float, default=NODATA_FRACTIONS, help="NoData fractions")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (best and median are kept)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where the synthetic rasters are cached")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON-lines results history")
+    parser.add_argument("--compare", action="store_true", help="Compare with the previous commit's run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown ratio flagged as regression")
+    args = parser.parse_args(argv)
+
+    commit, dirty = git_commit()
+    results = []
+    for size in args.sizes:
+        for layout in args.layouts:
+            for nodata_fraction in args.nodata:
+                files = generate_dataset(size, layout, nodata_fraction, args.data_dir)
+                workdir = os.path.join(args.data_dir, "_work")
+                for name in args.benchmarks:
+                    measured = run_case(name, files, workdir, args.repeat)
+                    results.append(dict(
+                        benchmark=name, size=size, layout=layout, nodata_fraction=nodata_fraction,
+                        input_bytes=sum(os.path.getsize(f) for f in files), **measured
+                    ))
+                    print(f"{name:24} {size:9} {layout:10} nd={nodata_fraction:<4} "
+                          f"{measured['wall_s'] * 1000:9.1f} ms  {measured['peak_rss_mb']:8.1f} MB RSS  "
+                          f"{(measured['bytes_read'] or 0) / 1e6:8.2f} MB read")
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results
+    }
+    history = load_history(args.history)
+    os.makedirs(os.path.dirname(args.history) or '.', exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Appended {len(results)} results to {args.history}")
+
+    if args.compare:
+        return 1 if compare_with_previous(record, history, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Checks distance_transform_tiled against scipy's exact Euclidean distance
+transform on random rasters (non-square shapes, sparse and dense features,
+several strip sizes). Exits with status 1 if any case differs.
+
+Example:
+    python benchmarks/check_distance.py --cases 200
+"""
+import os
+import sys
+import argparse
+import numpy as np
+from affine import Affine
+from scipy.ndimage import distance_transform_edt
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'climate-analysis'))
+
+from analysis_tools.distance_module import distance_transform_tiled
+
+PIXEL_SIZE = 10.0
+DENSITIES = [0.001, 0.01, 0.1, 0.5]
+TILE_SIZES = [1, 5, 1000]
+
+
+def check_case(feature_ids, tile_size):
+    """
+    Compares one raster with scipy. Returns a description of the mismatch,
+    or None if distances and nearest ids agree.
+    """
+    height, width = feature_ids.shape
+    grid = {
+        "transform": Affine(PIXEL_SIZE, 0, 0, 0, -PIXEL_SIZE, 0),
+        "crs": None,
+        "height": height,
+        "width": width
+    }
+    distance, ids = distance_transform_tiled(feature_ids, grid, tile_size=tile_size, return_ids=True)
+    expected = distance_transform_edt(feature_ids == 0, sampling=(PIXEL_SIZE, PIXEL_SIZE))
+    error = np.abs(distance - expected)
+    if error.max() > 1e-3:
+        return f"distance off by up to {error.max():.3f} m"
+    is_feature = feature_ids > 0
+    if not np.array_equal(ids[is_feature], feature_ids[is_feature]) or (ids <= 0).any():
+        return "nearest ids do not match the feature pixels"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=200, help="Number of random rasters")
+    parser.add_argument("--max-size", type=int, default=120, help="Largest raster edge in pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    checked, failures = 0, 0
+    for case in range(args.cases):
+        height, width = rng.integers(5, args.max_size + 1, 2)
+        density = rng.choice(DENSITIES)
+        feature_ids = np.where(rng.random((height, width)) < density,
+                               rng.integers(1, 50, (height, width)), 0).astype(np.int32)
+        if not feature_ids.any():
+            feature_ids[rng.integers(height), rng.integers(width)] = 1
+        for tile_size in TILE_SIZES:
+            checked += 1
+            problem = check_case(feature_ids, tile_size)
+            if problem is not None:
+                failures += 1
+                print(f"Case {case} ({height}x{width}, density {density}, tile_size {tile_size}): {problem}")
+
+    print(f"{checked - failures}/{checked} cases match scipy")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# How to use the check:
+# - Run it after any change to distance_module; a non-zero exit status means the
+#   tiled transform no longer matches scipy's exact transform.
@@ -0,0 +1,379 @@
+import os
+import json
+import hashlib
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.transform import Affine, from_origin
+from rasterio.warp import transform as warp_transform
+
+DEFAULT_CACHE_DIR = os.path.join('data', 'processed', 'alignment_cache')
+
+# Mappings already loaded in this process, keyed like the files on disk.
+_MAPPING_MEMO = {}
+
+# Number of rows transformed at once when building a mapping, to bound memory.
+_ROW_CHUNK = 256
+
+
+def make_grid(crs, transform, width, height):
+    """
+    Builds a grid description (the target or source of an alignment).
+
+    Parameters:
+    - crs: Anything accepted by rasterio's CRS (e.g. "EPSG:4326").
+    - transform: Affine transform of the grid.
+    - width, height: Size of the grid in pixels.
+
+    Returns:
+    - Dictionary with crs, transform, width and height.
+    """
+    return {
+        "crs": CRS.from_user_input(crs),
+        "transform": Affine(*tuple(transform)[:6]),
+        "width": int(width),
+        "height": int(height)
+    }
+
+
+def grid_from_raster(file_path):
+    """
+    Returns the grid of an existing raster file.
+    """
+    with rasterio.open(file_path) as src:
+        return make_grid(src.crs, src.transform, src.width, src.height)
+
+
+def grid_from_bounds(bounds, resolution, crs="EPSG:4326"):
+    """
+    Builds a north-up grid covering bounds = (left, bottom, right, top)
+    with square pixels of the given resolution (in CRS units).
+    """
+    left, bottom, right, top = bounds
+    width = int(np.ceil((right - left) / resolution))
+    height = int(np.ceil((top - bottom) / resolution))
+    return make_grid(crs, from_origin(left, top, resolution, resolution), width, height)
+
+
+def _grid_key(grid):
+    """
+    Canonical, hashable description of a grid (rounded to avoid float noise).
+    """
+    return {
+        "crs": grid["crs"].to_wkt(),
+        "transform": [round(v, 9) for v in tuple(grid["transform"])[:6]],
+        "width": grid["width"],
+        "height": grid["height"]
+    }
+
+
+def mapping_key(source_grid, target_grid, method):
+    """
+    Hash identifying the mapping for a (source grid, target grid, method) triple.
+    """
+    payload = json.dumps({
+        "source": _grid_key(source_grid),
+        "target": _grid_key(target_grid),
+        "method": method
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _pixel_centers(grid, row_start, row_stop):
+    """
+    Coordinates (in the grid CRS) of the pixel centers of rows row_start..row_stop.
+    """
+    rows, cols = np.mgrid[row_start:row_stop, 0:grid["width"]]
+    xs, ys = grid["transform"] * (cols.ravel() + 0.5, rows.ravel() + 0.5)
+    return np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+
+
+def _reproject_points(xs, ys, src_crs, dst_crs):
+    if src_crs == dst_crs:
+        return xs, ys
+    new_xs, new_ys = warp_transform(src_crs, dst_crs, xs, ys)
+    return np.asarray(new_xs, dtype=float), np.asarray(new_ys, dtype=float)
+
+
+def _fractional_index(grid, xs, ys):
+    """
+    Fractional (col, row) positions of points in a grid, 0.0 being the pixel edge.
+    """
+    cols, rows = ~grid["transform"] * (xs, ys)
+    return np.asarray(cols, dtype=float), np.asarray(rows, dtype=float)
+
+
+def _nearest_mapping(source_grid, target_grid):
+    n_target = target_grid["width"] * target_grid["height"]
+    src_index = np.full(n_target, -1, dtype=np.int64)
+    for row_start in range(0, target_grid["height"], _ROW_CHUNK):
+        row_stop = min(row_start + _ROW_CHUNK, target_grid["height"])
+        xs, ys = _pixel_centers(target_grid, row_start, row_stop)
+        xs, ys = _reproject_points(xs, ys, target_grid["crs"], source_grid["crs"])
+        cols, rows = _fractional_index(source_grid, xs, ys)
+        cols = np.floor(cols).astype(np.int64)
+        rows = np.floor(rows).astype(np.int64)
+        inside = (cols >= 0) & (cols < source_grid["width"]) & (rows >= 0) & (rows < source_grid["height"])
+        chunk = np.where(inside, rows * source_grid["width"] + cols, -1)
+        offset = row_start * target_grid["width"]
+        src_index[offset:offset + chunk.size] = chunk
+    return {"src_index": src_index}
+
+
+def _bilinear_mapping(source_grid, target_grid):
+    n_target = target_grid["width"] * target_grid["height"]
+    src_index = np.full((4, n_target), -1, dtype=np.int64)
+    weights = np.zeros((4, n_target), dtype=np.float32)
+    for row_start in range(0, target_grid["height"], _ROW_CHUNK):
+        row_stop = min(row_start + _ROW_CHUNK, target_grid["height"])
+        xs, ys = _pixel_centers(target_grid, row_start, row_stop)
+        xs, ys = _reproject_points(xs, ys, target_grid["crs"], source_grid["crs"])
+        cols, rows = _fractional_index(source_grid, xs, ys)
+        # Interpolate between pixel centers, hence the half-pixel shift
+        cols -= 0.5
+        rows -= 0.5
+        col0 = np.floor(cols).astype(np.int64)
+        row0 = np.floor(rows).astype(np.int64)
+        fc = cols - col0
+        fr = rows - row0
+        offset = row_start * target_grid["width"]
+        neighbours = [
+            (row0, col0, (1 - fr) * (1 - fc)),
+            (row0, col0 + 1, (1 - fr) * fc),
+            (row0 + 1, col0, fr * (1 - fc)),
+            (row0 + 1, col0 + 1, fr * fc)
+        ]
+        for k, (r, c, w) in enumerate(neighbours):
+            inside = (c >= 0) & (c < source_grid["width"]) & (r >= 0) & (r < source_grid["height"])
+            src_index[k, offset:offset + r.size] = np.where(inside, r * source_grid["width"] + c, -1)
+            weights[k, offset:offset + r.size] = np.where(inside, w, 0.0)
+    return {"src_index": src_index, "weights": weights}
+
+
+def _aggregate_mapping(source_grid, target_grid):
+    """
+    Many-to-one mapping: every source pixel center is assigned to the target
+    pixel containing it. Used for mode (categorical) and average aggregation.
+    """
+    src_parts = []
+    dst_parts = []
+    for row_start in range(0, source_grid["height"], _ROW_CHUNK):
+        row_stop = min(row_start + _ROW_CHUNK, source_grid["height"])
+        xs, ys = _pixel_centers(source_grid, row_start, row_stop)
+        xs, ys = _reproject_points(xs, ys, source_grid["crs"], target_grid["crs"])
+        cols, rows = _fractional_index(target_grid, xs, ys)
+        cols = np.floor(cols).astype(np.int64)
+        rows = np.floor(rows).astype(np.int64)
+        inside = (cols >= 0) & (cols < target_grid["width"]) & (rows >= 0) & (rows < target_grid["height"])
+        flat = np.arange(row_start * source_grid["width"], row_stop * source_grid["width"], dtype=np.int64)
+        src_parts.append(flat[inside])
+        dst_parts.append(rows[inside] * target_grid["width"] + cols[inside])
+    return {
+        "src_index": np.concatenate(src_parts),
+        "dst_index": np.concatenate(dst_parts)
+    }
+
+
+_MAPPING_BUILDERS = {
+    "nearest": _nearest_mapping,
+    "bilinear": _bilinear_mapping,
+    "mode": _aggregate_mapping,
+    "average": _aggregate_mapping
+}
+
+
+def compute_mapping(source_grid, target_grid, method="nearest"):
+    """
+    Computes the source-to-target resampling mapping (index arrays and weights).
+
+    Parameters:
+    - source_grid, target_grid: Grids built with make_grid / grid_from_raster.
+    - method: "nearest", "bilinear" (continuous data), "mode" (categorical
+      data such as MODIS LCT) or "average" (continuous aggregation).
+
+    Returns:
+    - Dictionary of NumPy arrays describing the mapping.
+    """
+    if method not in _MAPPING_BUILDERS:
+        raise ValueError(f"Unknown resampling method: {method}")
+    mapping = _MAPPING_BUILDERS[method](source_grid, target_grid)
+    mapping["method"] = method
+    mapping["source_shape"] = (source_grid["height"], source_grid["width"])
+    mapping["target_shape"] = (target_grid["height"], target_grid["width"])
+    return mapping
+
+
+def get_mapping(source_grid, target_grid, method="nearest", cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns the mapping for (source grid, target grid, method), computing it
+    only the first time and caching it on disk (and in memory).
+
+    Parameters:
+    - cache_dir: Directory for the .npz mapping files (None disables the disk cache).
+    """
+    key = mapping_key(source_grid, target_grid, method)
+    if key in _MAPPING_MEMO:
+        return _MAPPING_MEMO[key]
+
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, f"{method}_{key[:16]}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                mapping = {name: cached[name] for name in cached.files}
+            mapping["method"] = method
+            mapping["source_shape"] = tuple(int(v) for v in mapping["source_shape"])
+            mapping["target_shape"] = tuple(int(v) for v in mapping["target_shape"])
+            _MAPPING_MEMO[key] = mapping
+            return mapping
+
+    mapping = compute_mapping(source_grid, target_grid, method)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        arrays = {name: value for name, value in mapping.items() if name != "method"}
+        np.savez(cache_path, **arrays)
+        print(f"Saved {method} mapping to {cache_path}")
+    _MAPPING_MEMO[key] = mapping
+    return mapping
+
+
+def _valid_mask(values, nodata_values):
+    valid = np.ones(values.shape, dtype=bool)
+    if np.issubdtype(values.dtype, np.floating):
+        valid &= ~np.isnan(values)
+    for nodata in nodata_values:
+        if nodata is not None and not (isinstance(nodata, float) and np.isnan(nodata)):
+            valid &= values != nodata
+    return valid
+
+
+def _output_dtype(dtype, fill_value):
+    """
+    Keeps the source dtype, unless a NaN fill forces integer data to float32.
+    """
+    if isinstance(fill_value, float) and np.isnan(fill_value) and not np.issubdtype(dtype, np.floating):
+        return np.float32
+    return dtype
+
+
+def apply_mapping(data, mapping, nodata_values=(), fill_value=np.nan):
+    """
+    Resamples a 2D source array onto the target grid with a precomputed mapping.
+    This is a gather (or a bincount for mode/average), never a reprojection.
+
+    Parameters:
+    - data: 2D NumPy array on the source grid.
+    - mapping: Mapping returned by get_mapping / compute_mapping.
+    - nodata_values: Source values to be ignored (e.g. src.nodata, 65533).
+    - fill_value: Value for target pixels without valid source data.
+
+    Returns:
+    - 2D NumPy array on the target grid. Nearest and mode keep the source
+      dtype when fill_value fits in it; bilinear and average return float.
+    """
+    if tuple(data.shape) != tuple(mapping["source_shape"]):
+        raise ValueError(f"Data shape {data.shape} does not match mapping source {mapping['source_shape']}")
+
+    flat = data.ravel()
+    target_shape = mapping["target_shape"]
+    n_target = target_shape[0] * target_shape[1]
+    method = mapping["method"]
+
+    if method == "nearest":
+        index = mapping["src_index"]
+        inside = index >= 0
+        values = flat[np.where(inside, index, 0)]
+        valid = inside & _valid_mask(values, nodata_values)
+        out = np.full(n_target, fill_value, dtype=_output_dtype(data.dtype, fill_value))
+        out[valid] = values[valid]
+        return out.reshape(target_shape)
+
+    if method == "bilinear":
+        index = mapping["src_index"]
+        values = flat[np.where(index >= 0, index, 0)].astype(float)
+        weights = mapping["weights"] * ((index >= 0) & _valid_mask(values, nodata_values))
+        values = np.where(weights > 0, values, 0.0)
+        total = weights.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = (weights * values).sum(axis=0) / total
+        out[total == 0] = fill_value
+        return out.reshape(target_shape)
+
+    src_index = mapping["src_index"]
+    dst_index = mapping["dst_index"]
+    values = flat[src_index]
+    valid = _valid_mask(values, nodata_values)
+    values = values[valid]
+    dst_index = dst_index[valid]
+
+    if method == "average":
+        sums = np.bincount(dst_index, weights=values.astype(float), minlength=n_target)
+        counts = np.bincount(dst_index, minlength=n_target)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = sums / counts
+        out[counts == 0] = fill_value
+        return out.reshape(target_shape)
+
+    # Mode: count (target pixel, class) pairs with a single bincount
+    classes, class_codes = np.unique(values, return_inverse=True)
+    out = np.full(n_target, fill_value, dtype=_output_dtype(data.dtype, fill_value))
+    if classes.size == 0:
+        return out.reshape(target_shape)
+    counts = np.bincount(dst_index * classes.size + class_codes.ravel(), minlength=n_target * classes.size)
+    counts = counts.reshape(n_target, classes.size)
+    has_data = counts.sum(axis=1) > 0
+    out[has_data] = classes[np.argmax(counts[has_data], axis=1)]
+    return out.reshape(target_shape)
+
+
+def align_raster(file_path, target_grid, method="nearest", cache_dir=DEFAULT_CACHE_DIR,
+                 no_data_value=65533, band=1, fill_value=np.nan):
+    """
+    Reads a raster and resamples it onto target_grid, reusing the cached
+    mapping of its grid when one exists (e.g. another year of the same product).
+
+    Parameters:
+    - file_path: Path to the source raster.
+    - target_grid: Grid to align to.
+    - method: "nearest", "bilinear", "mode" or "average".
+    - cache_dir: Directory of the mapping cache.
+    - no_data_value: Extra value treated as NoData (65533 in the hackathon rasters).
+    - band: Band to read.
+    - fill_value: Value for target pixels without valid source data.
+
+    Returns:
+    - 2D NumPy array on the target grid.
+    """
+    with rasterio.open(file_path) as src:
+        source_grid = make_grid(src.crs, src.transform, src.width, src.height)
+        data = src.read(band)
+        nodata_values = (src.nodata, no_data_value)
+    mapping = get_mapping(source_grid, target_grid, method, cache_dir)
+    return apply_mapping(data, mapping, nodata_values, fill_value)
+
+
+def save_aligned_raster(data, target_grid, output_tif_path, nodata=np.nan):
+    """
+    Saves an aligned array as a GeoTIFF on the target grid.
+    """
+    profile = {
+        "driver": "GTiff",
+        "height": target_grid["height"],
+        "width": target_grid["width"],
+        "count": 1,
+        "dtype": str(data.dtype),
+        "crs": target_grid["crs"],
+        "transform": target_grid["transform"],
+        "nodata": nodata,
+        "compress": "lzw"
+    }
+    os.makedirs(os.path.dirname(output_tif_path) or '.', exist_ok=True)
+    with rasterio.open(output_tif_path, 'w', **profile) as dst:
+        dst.write(data, 1)
+    print(f"Saved aligned raster to {output_tif_path}")
+
+# How to use the alignment layer:
+# - Pick a target grid once, e.g. grid_from_raster("data/.../2010R.tif").
+# - align_raster(path, target_grid, method) for each year/product:
+#   the first call per source grid builds the mapping, later ones only gather.
+# - Use method="mode" for land cover classes, "bilinear"/"average" for continuous data.
@@ -0,0 +1,229 @@
+import os
+import json
+import shutil
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from .alignment_module import make_grid
+from .raster_io_module import invalid_mask, SENTINEL_NODATA
+from .timeseries_module import year_of
+
+DEFAULT_CLIMATOLOGY_DIR = os.path.join('data', 'processed', 'climatology')
+
+# Rows processed at once, to bound memory on large grids
+_ROW_BLOCK = 512
+
+_STATE_ARRAYS = {"count": np.uint16, "mean": np.float64, "m2": np.float64}
+
+
+def _meta_path(path):
+    return os.path.join(path, 'meta.json')
+
+
+def load_climatology(path, mode='r'):
+    """
+    Opens a climatology state: per-pixel count, mean and M2 (sum of squared
+    deviations), memory-mapped.
+
+    Returns:
+    - Dictionary with the grid, years, sources and the count/mean/m2 arrays.
+    """
+    with open(_meta_path(path), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    state = make_grid(meta["crs"], meta["transform"], meta["width"], meta["height"])
+    state.update(product=meta["product"], years=meta["years"], sources=meta["sources"], path=path)
+    for name in _STATE_ARRAYS:
+        state[name] = np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+    return state
+
+
+def _create_state(path, product, grid):
+    os.makedirs(path, exist_ok=True)
+    for name, dtype in _STATE_ARRAYS.items():
+        array = np.lib.format.open_memmap(
+            os.path.join(path, f'{name}.npy'), mode='w+', dtype=dtype, shape=(grid["height"], grid["width"])
+        )
+        array[:] = 0
+        array.flush()
+        del array
+    _save_meta(path, product, grid, years=[], sources={})
+
+
+def _save_meta(path, product, grid, years, sources):
+    meta = {
+        "product": product,
+        "crs": grid["crs"].to_wkt(),
+        "transform": list(grid["transform"])[:6],
+        "width": grid["width"],
+        "height": grid["height"],
+        "years": sorted(years),
+        "sources": sources
+    }
+    tmp_path = _meta_path(path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, _meta_path(path))
+
+
+def _fingerprint(file_path):
+    return [os.path.getsize(file_path), os.path.getmtime(file_path)]
+
+
+def add_year(file_path, product, store_dir=DEFAULT_CLIMATOLOGY_DIR, year=None, no_data_values=(SENTINEL_NODATA,)):
+    """
+    Adds one year to a product's climatology with Welford's update, reading
+    only that year's raster. Adding a year already in the state is a no-op.
+
+    Parameters:
+    - file_path: Raster of the new year (e.g. 2024R.tif).
+    - product: Climatology name (e.g. "precipitation").
+    - store_dir: Parent directory of the climatology states.
+    - year: Year of the raster (default: taken from the file name).
+    - no_data_values: Extra values ignored on top of the file's nodata.
+
+    Returns:
+    - Path of the climatology state.
+    """
+    year = year_of(file_path) if year is None else int(year)
+    path = os.path.join(store_dir, product)
+
+    with rasterio.open(file_path) as src:
+        grid = make_grid(src.crs, src.transform, src.width, src.height)
+        if not os.path.exists(_meta_path(path)):
+            _create_state(path, product, grid)
+        state = load_climatology(path)
+        if (src.width, src.height) != (state["width"], state["height"]) or src.transform != state["transform"]:
+            raise ValueError(f"{file_path} is not on the grid of the {product} climatology")
+        if year in state["years"]:
+            if state["sources"].get(str(year), {}).get("fingerprint") != _fingerprint(file_path):
+                print(f"Warning: {file_path} changed since {year} was added; rebuild the {product} climatology.")
+            else:
+                print(f"{year} is already in the {product} climatology.")
+            return path
+        del state
+
+        # Update copies of the state, swapped in at the end, so an interrupted
+        # update leaves the previous state intact
+        arrays = {}
+        for name in _STATE_ARRAYS:
+            shutil.copyfile(os.path.join(path, f'{name}.npy'), os.path.join(path, f'{name}.npy.tmp'))
+            arrays[name] = np.load(os.path.join(path, f'{name}.npy.tmp'), mmap_mode='r+')
+
+        for row in range(0, grid["height"], _ROW_BLOCK):
+            rows = slice(row, min(row + _ROW_BLOCK, grid["height"]))
+            block = src.read(1, window=Window(0, row, src.width, rows.stop - row))
+            valid = ~invalid_mask(block, (src.nodata,) + tuple(no_data_values))
+            count = arrays["count"][rows]
+            mean = arrays["mean"][rows]
+            m2 = arrays["m2"][rows]
+            x = block[valid].astype(np.float64)
+            n = count[valid] + 1
+            delta = x - mean[valid]
+            new_mean = mean[valid] + delta / n
+            m2[valid] += delta * (x - new_mean)
+            mean[valid] = new_mean
+            count[valid] = n
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    for name in _STATE_ARRAYS:
+        os.replace(os.path.join(path, f'{name}.npy.tmp'), os.path.join(path, f'{name}.npy'))
+
+    with open(_meta_path(path), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    sources = dict(meta["sources"])
+    sources[str(year)] = {"path": os.path.abspath(file_path), "fingerprint": _fingerprint(file_path)}
+    _save_meta(path, product, grid, meta["years"] + [year], sources)
+    print(f"Added {year} to the {product} climatology ({len(meta['years']) + 1} years)")
+    return path
+
+
+def build_climatology(raster_files, product, store_dir=DEFAULT_CLIMATOLOGY_DIR, no_data_values=(SENTINEL_NODATA,)):
+    """
+    Adds every year of raster_files not yet in the climatology.
+    """
+    path = None
+    for file_path in sorted(raster_files, key=year_of):
+        path = add_year(file_path, product, store_dir, no_data_values=no_data_values)
+    return path
+
+
+def _write_blocks(output_tif_path, state, compute, nodata=np.nan):
+    profile = {
+        "driver": "GTiff",
+        "height": state["height"],
+        "width": state["width"],
+        "count": 1,
+        "dtype": "float32",
+        "crs": state["crs"],
+        "transform": state["transform"],
+        "nodata": nodata,
+        "compress": "lzw",
+        "tiled": True,
+        "blockxsize": 256,
+        "blockysize": 256
+    }
+    os.makedirs(os.path.dirname(output_tif_path) or '.', exist_ok=True)
+    with rasterio.open(output_tif_path, 'w', **profile) as dst:
+        for row in range(0, state["height"], _ROW_BLOCK):
+            rows = slice(row, min(row + _ROW_BLOCK, state["height"]))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                block = compute(rows, row)
+            dst.write(block.astype(np.float32), 1, window=Window(0, row, state["width"], rows.stop - row))
+    print(f"Saved {output_tif_path}")
+
+
+def _std(state, rows, ddof, min_count):
+    count = state["count"][rows].astype(np.float64)
+    std = np.sqrt(state["m2"][rows] / (count - ddof))
+    return np.where(count >= max(min_count, ddof + 1), std, np.nan)
+
+
+def save_climatology_rasters(path, mean_tif_path, std_tif_path, ddof=1, min_count=2):
+    """
+    Writes the per-pixel mean and standard deviation of a climatology.
+    """
+    state = load_climatology(path)
+    _write_blocks(mean_tif_path, state,
+                  lambda rows, row: np.where(state["count"][rows] > 0, state["mean"][rows], np.nan))
+    _write_blocks(std_tif_path, state, lambda rows, row: _std(state, rows, ddof, min_count))
+
+
+def anomaly_raster(path, file_path, output_tif_path, kind="zscore", ddof=1, min_count=2,
+                   no_data_values=(SENTINEL_NODATA,)):
+    """
+    Anomaly (value - mean) or z-score ((value - mean) / std) of one year
+    against the stored climatology, in one blocked pass over that year's raster.
+
+    Parameters:
+    - path: Climatology state (from add_year/build_climatology).
+    - file_path: Raster of the year to compare (in the climatology or not).
+    - output_tif_path: Output GeoTIFF (float32, NaN as NoData).
+    - kind: "anomaly" or "zscore".
+    - ddof: Delta degrees of freedom of the standard deviation.
+    - min_count: Pixels with fewer years in the climatology are NoData.
+    """
+    if kind not in ("anomaly", "zscore"):
+        raise ValueError(f"Unknown kind {kind}")
+    state = load_climatology(path)
+    with rasterio.open(file_path) as src:
+        if (src.width, src.height) != (state["width"], state["height"]) or src.transform != state["transform"]:
+            raise ValueError(f"{file_path} is not on the grid of the {state['product']} climatology")
+
+        def compute(rows, row):
+            block = src.read(1, window=Window(0, row, src.width, rows.stop - row))
+            values = np.where(invalid_mask(block, (src.nodata,) + tuple(no_data_values)), np.nan, block)
+            count = state["count"][rows]
+            anomaly = np.where(count >= min_count, values - state["mean"][rows], np.nan)
+            if kind == "anomaly":
+                return anomaly
+            std = _std(state, rows, ddof, min_count)
+            return np.where(std > 0, anomaly / std, np.nan)
+
+        _write_blocks(output_tif_path, state, compute)
+
+# How to use the climatology:
+# - build_climatology(glob("data/.../*R.tif"), "precipitation") once; then add_year("2024R.tif", "precipitation").
+# - anomaly_raster(path, "2024R.tif", "2024_zscore.tif") compares a year with the stored mean/std.
+# - z-scores beyond +-2 mark unusually wet/dry (or productive) pixels for that year.
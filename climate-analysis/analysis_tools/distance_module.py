@@ -0,0 +1,225 @@
+import os
+import numpy as np
+import rasterio
+from rasterio import features
+from .alignment_module import grid_from_raster
+
+# Metres per degree of latitude (spherical approximation)
+METRES_PER_DEGREE = 111320.0
+
+
+def rasterize_lines(lines_path, grid, all_touched=True):
+    """
+    Burns a line layer (roads, streams) onto a grid.
+
+    Parameters:
+    - lines_path: Path to the line shapefile.
+    - grid: Grid (see alignment_module) to rasterize onto.
+    - all_touched: Burn every pixel touched by a line, so thin lines stay connected.
+
+    Returns:
+    - 2D int32 array with feature_index + 1 on line pixels and 0 elsewhere.
+    """
+    import geopandas as gpd  # only needed when rasterizing
+
+    gdf = gpd.read_file(lines_path)
+    if gdf.crs != grid["crs"]:
+        gdf = gdf.to_crs(grid["crs"])
+    shapes = ((geom, i + 1) for i, geom in enumerate(gdf.geometry) if geom is not None)
+    return features.rasterize(
+        shapes,
+        out_shape=(grid["height"], grid["width"]),
+        transform=grid["transform"],
+        fill=0,
+        all_touched=all_touched,
+        dtype='int32'
+    )
+
+
+def pixel_size_m(grid, row):
+    """
+    Pixel (height, width) in metres around a given row. Geographic grids are
+    converted at that row's latitude.
+    """
+    transform = grid["transform"]
+    dx, dy = abs(transform.a), abs(transform.e)
+    if grid["crs"] is not None and grid["crs"].is_geographic:
+        lat = transform.f + transform.e * (row + 0.5)
+        return dy * METRES_PER_DEGREE, dx * METRES_PER_DEGREE * np.cos(np.radians(lat))
+    return dy, dx
+
+
+def _nearest_rows(is_feature, strip):
+    """
+    First pass: for every pixel, the row of the nearest feature pixel in the
+    same column (-1 if the column has none), one strip of columns at a time.
+    """
+    height, width = is_feature.shape
+    rows = np.arange(height, dtype=np.int32)[:, None]
+    nearest = np.empty((height, width), dtype=np.int32)
+    for c0 in range(0, width, strip):
+        block = is_feature[:, c0:c0 + strip]
+        above = np.maximum.accumulate(np.where(block, rows, -1), axis=0)
+        below = np.minimum.accumulate(np.where(block, rows, height)[::-1], axis=0)[::-1]
+        use_above = (above >= 0) & ((below == height) | (rows - above <= below - rows))
+        nearest[:, c0:c0 + strip] = np.where(use_above, above, np.where(below < height, below, -1))
+    return nearest
+
+
+def _lower_envelope(f, w):
+    """
+    Second pass for a strip of rows: min over c' of w * (c - c')**2 + f[c'] for
+    every column c (lower envelope of parabolas, Felzenszwalb & Huttenlocher),
+    run on all rows of the strip at once.
+
+    Parameters:
+    - f: (rows, width) squared vertical distances (inf where a column has no feature).
+    - w: (rows,) squared pixel width of each row.
+
+    Returns:
+    - Column of the minimizing parabola for every pixel (rows, width).
+    """
+    n_rows, width = f.shape
+    vertex = np.zeros((n_rows, width), dtype=np.int64)
+    bound = np.full((n_rows, width + 1), np.inf)
+    top = np.full(n_rows, -1)
+    crossing = np.empty(n_rows)
+    for q in range(width):
+        rows = np.flatnonzero(np.isfinite(f[:, q]))
+        if rows.size == 0:
+            continue
+        # Pop the parabolas hidden by the new one
+        pending = rows[top[rows] >= 0]
+        while pending.size:
+            v = vertex[pending, top[pending]]
+            wp = w[pending]
+            s = ((f[pending, q] + wp * q * q) - (f[pending, v] + wp * v * v)) / (2 * wp * (q - v))
+            crossing[pending] = s
+            hidden = s <= bound[pending, top[pending]]
+            top[pending[hidden]] -= 1
+            pending = pending[hidden]
+        first = top[rows] < 0
+        top[rows] += 1
+        vertex[rows, top[rows]] = q
+        bound[rows, top[rows]] = np.where(first, -np.inf, crossing[rows])
+        bound[rows, top[rows] + 1] = np.inf
+
+    # Boundaries of popped parabolas are left beyond top + 1; clear them so
+    # every row stays sorted. The parabola covering each column is then the
+    # last boundary <= column, found with one searchsorted over the rows
+    # laid end to end
+    bound[np.arange(width + 1)[None, :] > top[:, None]] = np.inf
+    offsets = np.arange(n_rows)[:, None] * (width + 2)
+    keys = (np.clip(bound[:, :width], -1, width + 0.5) + offsets).ravel()
+    index = np.searchsorted(keys, (np.arange(width) + offsets).ravel(), side='right') - 1
+    segment = index.reshape(n_rows, width) - np.arange(n_rows)[:, None] * width
+    return np.take_along_axis(vertex, segment, axis=1)
+
+
+def distance_transform_tiled(feature_ids, grid, tile_size=1024, max_distance=None, return_ids=False):
+    """
+    Euclidean distance (metres) from every pixel to the nearest feature pixel,
+    computed exactly in two passes over strips of the raster.
+
+    The first pass finds the nearest feature row within each column (strips
+    of tile_size columns); the second combines the columns of each row
+    (strips of tile_size rows) with the lower envelope of parabolas. Both
+    passes are O(pixels) whatever the density of features, so sparse road or
+    stream networks cost no more than dense ones. On geographic grids the
+    pixel width of each row is used for that row.
+
+    Parameters:
+    - feature_ids: 2D int array, > 0 on feature pixels (see rasterize_lines).
+    - grid: Grid of feature_ids, used for pixel sizes.
+    - tile_size: Strip width in pixels (bounds the temporaries of each pass).
+    - max_distance: Optional cap (metres); farther pixels get max_distance.
+    - return_ids: Also return the id of the nearest feature for each pixel.
+
+    Returns:
+    - distance: 2D float32 array (inf where the raster has no feature at all).
+    - ids: 2D int32 array of nearest feature ids (only if return_ids).
+    """
+    height, width = feature_ids.shape
+    is_feature = feature_ids > 0
+    distance = np.full((height, width), np.inf, dtype=np.float32)
+    ids = np.zeros((height, width), dtype=np.int32) if return_ids else None
+    if not is_feature.any():
+        if max_distance is not None:
+            distance[:] = max_distance
+        return (distance, ids) if return_ids else distance
+
+    nearest_row = _nearest_rows(is_feature, tile_size)
+    dy = pixel_size_m(grid, 0)[0]
+    for r0 in range(0, height, tile_size):
+        r1 = min(r0 + tile_size, height)
+        rows = np.arange(r0, r1)
+        block = nearest_row[r0:r1]
+        with np.errstate(invalid='ignore'):
+            f = np.where(block >= 0, (dy * (rows[:, None] - block)) ** 2.0, np.inf)
+        w = np.array([pixel_size_m(grid, r)[1] for r in rows]) ** 2
+        columns = _lower_envelope(f, w)
+        offset = np.arange(width) - columns
+        distance[r0:r1] = np.sqrt(w[:, None] * offset ** 2 + np.take_along_axis(f, columns, axis=1))
+        if return_ids:
+            ids[r0:r1] = feature_ids[np.take_along_axis(block, columns, axis=1), columns]
+
+    if max_distance is not None:
+        np.minimum(distance, max_distance, out=distance)
+    if return_ids:
+        return distance, ids
+    return distance
+
+
+def save_distance_raster(data, grid, output_tif_path, nodata=None):
+    """
+    Saves a distance (float32) or nearest-id (int32) raster on the grid.
+    """
+    profile = {
+        "driver": "GTiff",
+        "height": grid["height"],
+        "width": grid["width"],
+        "count": 1,
+        "dtype": str(data.dtype),
+        "crs": grid["crs"],
+        "transform": grid["transform"],
+        "nodata": nodata,
+        "compress": "lzw",
+        "tiled": True
+    }
+    os.makedirs(os.path.dirname(output_tif_path) or '.', exist_ok=True)
+    with rasterio.open(output_tif_path, 'w', **profile) as dst:
+        dst.write(data, 1)
+    print(f"Saved raster to {output_tif_path}")
+
+
+def distance_to_lines(lines_path, reference_raster, output_tif_path, ids_output_path=None,
+                      max_distance=None, tile_size=1024):
+    """
+    Distance (metres) to the nearest line of a network (e.g. Main_Road.shp,
+    Streamwater.shp) on the grid of any analysis raster.
+
+    Parameters:
+    - lines_path: Path to the line shapefile.
+    - reference_raster: Raster whose grid is used (e.g. a precipitation or LCT tif).
+    - output_tif_path: Where to save the distance raster.
+    - ids_output_path: Optional path for the nearest-feature id raster.
+    - max_distance: Optional cap (metres).
+    - tile_size: Tile edge in pixels.
+    """
+    grid = grid_from_raster(reference_raster)
+    feature_ids = rasterize_lines(lines_path, grid)
+    result = distance_transform_tiled(
+        feature_ids, grid, tile_size=tile_size, max_distance=max_distance,
+        return_ids=ids_output_path is not None
+    )
+    if ids_output_path is not None:
+        distance, ids = result
+        save_distance_raster(ids, grid, ids_output_path, nodata=0)
+    else:
+        distance = result
+    save_distance_raster(distance, grid, output_tif_path)
+    return distance
+
+# How to interpret the distance rasters:
+# - Each pixel holds the straight-line distance in metres to the nearest road/stream pixel.
+# - The optional id raster gives the 1-based index of that nearest feature in the shapefile.
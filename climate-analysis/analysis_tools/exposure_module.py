@@ -0,0 +1,179 @@
+import os
+import csv
+import numpy as np
+import rasterio
+from rasterio import features
+from scipy import sparse
+from .alignment_module import make_grid, align_raster
+
+DISTRICTS_PATH = 'data/Datasets_Hackathon/Admin_layers/Assaba_Districts_layer.shp'
+
+
+def rasterize_districts(districts_path, grid, name_field="ADM3_EN"):
+    """
+    Burns the district polygons onto a grid.
+
+    Parameters:
+    - districts_path: Path to the districts shapefile.
+    - grid: Grid (see alignment_module.make_grid) to rasterize onto.
+    - name_field: Attribute holding the district name.
+
+    Returns:
+    - labels: 2D int32 array, 0 outside every district, i+1 inside district i.
+    - names: List of district names, in label order.
+    """
+    import geopandas as gpd  # only needed when building the labels
+
+    gdf = gpd.read_file(districts_path)
+    if gdf.crs != grid["crs"]:
+        gdf = gdf.to_crs(grid["crs"])
+    shapes = ((geom, i + 1) for i, geom in enumerate(gdf.geometry))
+    labels = features.rasterize(
+        shapes,
+        out_shape=(grid["height"], grid["width"]),
+        transform=grid["transform"],
+        fill=0,
+        dtype='int32'
+    )
+    return labels, [str(name) for name in gdf[name_field]]
+
+
+def build_exposure_matrix(population_path, districts_path=DISTRICTS_PATH,
+                          name_field="ADM3_EN", no_data_value=65533):
+    """
+    Precomputes the sparse (district x pixel) matrix whose entries are the
+    population of each pixel inside each district. Every hazard layer or year
+    is then aggregated with a single sparse matrix-vector product.
+
+    Parameters:
+    - population_path: Population raster (e.g. Assaba_Pop_2020.tif); its grid
+      becomes the exposure grid.
+    - districts_path: Path to the districts shapefile.
+    - name_field: Attribute holding the district name.
+    - no_data_value: Extra value treated as NoData.
+
+    Returns:
+    - Dictionary with the matrix, district names, grid and total population per district.
+    """
+    with rasterio.open(population_path) as src:
+        grid = make_grid(src.crs, src.transform, src.width, src.height)
+        population = src.read(1)
+        nodata = src.nodata
+
+    labels, names = rasterize_districts(districts_path, grid, name_field)
+
+    valid = labels > 0
+    if nodata is not None:
+        valid &= population != nodata
+    valid &= population != no_data_value
+    if np.issubdtype(population.dtype, np.floating):
+        valid &= ~np.isnan(population)
+
+    pixels = np.flatnonzero(valid)
+    rows = labels.ravel()[pixels] - 1
+    weights = population.ravel()[pixels].astype(np.float64)
+    matrix = sparse.csr_matrix(
+        (weights, (rows, pixels)),
+        shape=(len(names), population.size)
+    )
+    return {
+        "matrix": matrix,
+        "districts": names,
+        "grid": grid,
+        "population": np.asarray(matrix.sum(axis=1)).ravel()
+    }
+
+
+def exposure_stats(exposure, hazard, threshold=None):
+    """
+    Population-weighted statistics of one or more hazard layers per district.
+
+    Parameters:
+    - exposure: Result of build_exposure_matrix.
+    - hazard: Array on the exposure grid, either 2D (one layer) or 3D
+      (layers, rows, cols); NaN marks missing hazard values.
+    - threshold: If given, also counts the people living where hazard > threshold.
+
+    Returns:
+    - Dictionary of (districts x layers) arrays: weighted_mean, covered_population
+      and, with a threshold, people_above.
+    """
+    matrix = exposure["matrix"]
+    hazard = np.asarray(hazard, dtype=float)
+    if hazard.ndim == 2:
+        hazard = hazard[np.newaxis]
+    # One column per layer, so all layers go through a single sparse product
+    columns = hazard.reshape(hazard.shape[0], -1).T
+    valid = ~np.isnan(columns)
+
+    covered = matrix @ valid.astype(float)
+    weighted_sum = matrix @ np.where(valid, columns, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weighted_mean = weighted_sum / covered
+    weighted_mean[covered == 0] = np.nan
+
+    result = {
+        "weighted_mean": weighted_mean,
+        "covered_population": covered
+    }
+    if threshold is not None:
+        with np.errstate(invalid='ignore'):
+            above = valid & (columns > threshold)
+        result["people_above"] = matrix @ above.astype(float)
+    return result
+
+
+def exposure_for_files(exposure, hazard_files, threshold=None, method="bilinear", no_data_value=65533):
+    """
+    Aligns each hazard raster (precipitation, WSI, degradation, ...) to the
+    exposure grid and computes population-weighted statistics per district.
+
+    Parameters:
+    - exposure: Result of build_exposure_matrix.
+    - hazard_files: List of hazard raster paths (e.g. one per year).
+    - threshold: Optional hazard threshold for the people-above count.
+    - method: Resampling method used to align the hazards.
+    - no_data_value: Extra value treated as NoData.
+
+    Returns:
+    - List of dictionaries, one per (file, district).
+    """
+    stack = np.stack([
+        align_raster(f, exposure["grid"], method=method, no_data_value=no_data_value).astype(float)
+        for f in hazard_files
+    ])
+    stats = exposure_stats(exposure, stack, threshold)
+
+    results = []
+    for j, f in enumerate(hazard_files):
+        for i, district in enumerate(exposure["districts"]):
+            row = {
+                "filename": os.path.basename(f),
+                "district": district,
+                "population": float(exposure["population"][i]),
+                "covered_population": float(stats["covered_population"][i, j]),
+                "weighted_mean": float(stats["weighted_mean"][i, j])
+            }
+            if threshold is not None:
+                row["people_above"] = float(stats["people_above"][i, j])
+            results.append(row)
+    return results
+
+
+def save_exposure_to_csv(csv_path, results):
+    """
+    Saves the rows returned by exposure_for_files to a CSV file.
+    """
+    if not results:
+        return
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Saved exposure table to {csv_path}")
+
+# Example interpretation:
+# - weighted_mean: hazard value experienced by the average inhabitant of the district.
+# - covered_population: people living in pixels where the hazard is defined.
+# - people_above: people living where the hazard exceeds the chosen threshold.
@@ -3,11 +3,16 @@ import re
 import csv
 import numpy as np
 import rasterio
+from .raster_io_module import read_masked, masked_mean
+from .preview_module import preview_time_series
 
-def calculate_time_series(raster_files):
+def calculate_time_series(raster_files, target_accuracy=None):
     """
     Calcola la media (overall, north, center, south) per ciascun raster,
     suddiviso in 3 fasce orizzontali equivalenti (stessa altezza).
+
+    Con target_accuracy (es. 0.01 = +-1%) le medie sono approssimate da una
+    lettura decimata, con factor e intervalli di confidenza (<zona>_mean_low/_high).
     
     Ritorna: lista di dict con
         {
@@ -19,46 +24,56 @@ def calculate_time_series(raster_files):
         }
     """
     
+    if target_accuracy is not None:
+        results = []
+        for f in raster_files:
+            with rasterio.open(f) as src:
+                height, width = src.height, src.width
+            part_height = height // 3
+            zones = {
+                "north": (0, part_height, 0, width),
+                "center": (part_height, 2*part_height, 0, width),
+                "south": (2*part_height, height, 0, width)
+            }
+            results.extend(preview_time_series([f], zones, target=target_accuracy))
+        return results
+
     results = []
     
     for idx, f in enumerate(raster_files):
-        with rasterio.open(f) as src:
-            data = src.read(1).astype(float)
-            
-            # Gestione NoData
-            if src.nodata is not None:
-                data[data == src.nodata] = np.nan
+        # Dtype nativo con maschera NoData (nessuna copia float64)
+        data = read_masked(f, no_data_values=())
 
-            # Dimensioni in pixel
-            height, width = data.shape
-            
-            # Suddividiamo l'immagine in 3 parti (nord, centro, sud) equiestese in termini di righe.
-            # Esempio: se height=60, allora 60//3 = 20 righe ognuna.
-            part_height = height // 3
+        # Dimensioni in pixel
+        height, width = data.shape
+        
+        # Suddividiamo l'immagine in 3 parti (nord, centro, sud) equiestese in termini di righe.
+        # Esempio: se height=60, allora 60//3 = 20 righe ognuna.
+        part_height = height // 3
 
-            # Notare che se l'altezza non è divisibile per 3, l'ultima fascia includerà i pixel rimanenti.
-            # Esempio: height = 61 => prime 2 fasce 20 righe, l'ultima 21 righe
-            north_bounds  = (0, part_height,    0, width)                      # righe 0..part_height
-            center_bounds = (part_height, 2*part_height, 0, width)            # righe part_height..2*part_height
-            south_bounds  = (2*part_height, height,        0, width)          # righe 2*part_height..fine
+        # Notare che se l'altezza non è divisibile per 3, l'ultima fascia includerà i pixel rimanenti.
+        # Esempio: height = 61 => prime 2 fasce 20 righe, l'ultima 21 righe
+        north_bounds  = (0, part_height,    0, width)                      # righe 0..part_height
+        center_bounds = (part_height, 2*part_height, 0, width)            # righe part_height..2*part_height
+        south_bounds  = (2*part_height, height,        0, width)          # righe 2*part_height..fine
 
-            def zone_mean(data, bounds):
-                min_row, max_row, min_col, max_col = bounds
-                zone = data[min_row:max_row, min_col:max_col]
-                return np.nanmean(zone)
+        def zone_mean(data, bounds):
+            min_row, max_row, min_col, max_col = bounds
+            zone = data[min_row:max_row, min_col:max_col]
+            return masked_mean(zone)
 
-            overall_mean = np.nanmean(data)
-            north_mean   = zone_mean(data, north_bounds)
-            center_mean  = zone_mean(data, center_bounds)
-            south_mean   = zone_mean(data, south_bounds)
+        overall_mean = masked_mean(data)
+        north_mean   = zone_mean(data, north_bounds)
+        center_mean  = zone_mean(data, center_bounds)
+        south_mean   = zone_mean(data, south_bounds)
 
-            results.append({
-                "filename": os.path.basename(f),
-                "overall_mean": overall_mean,
-                "north_mean": north_mean,
-                "center_mean": center_mean,
-                "south_mean": south_mean
-            })
+        results.append({
+            "filename": os.path.basename(f),
+            "overall_mean": overall_mean,
+            "north_mean": north_mean,
+            "center_mean": center_mean,
+            "south_mean": south_mean
+        })
     return results
 
 
@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import functools
+import contextlib
+
+# Switch on for a run with start_run(report_path=...) or with the environment:
+#   G20_INSTRUMENT=<report.json>   write a JSON report at the end of the run
+#   G20_PROFILE=1                  also profile the slowest top-level stage
+ENV_REPORT = "G20_INSTRUMENT"
+ENV_PROFILE = "G20_PROFILE"
+
+_STATE = {
+    "enabled": False,
+    "run": None,
+    "report_path": None,
+    "profile": False,
+    "started": None,
+    "wall_start": None,
+    "stages": [],
+    "stack": [],
+    "stack_peaks": [],
+    "process_peak": None,
+    "requests": 0,
+    "slowest_profile": None
+}
+
+STAGE_KINDS = ("read", "compute", "write", "render", "http")
+
+
+def _io_counters():
+    """
+    Bytes read/written by the process so far (Linux /proc), or (None, None).
+    """
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        # ru_maxrss is in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    except ImportError:
+        return None
+
+
+def _rss_status():
+    """
+    Current RSS and its high-water mark since the last reset (MB, Linux /proc), or (None, None).
+    """
+    try:
+        with open('/proc/self/status') as f:
+            fields = dict(line.split(':', 1) for line in f if line.startswith(('VmRSS', 'VmHWM')))
+        rss, hwm = int(fields['VmRSS'].split()[0]) / 1024.0, int(fields['VmHWM'].split()[0]) / 1024.0
+    except (OSError, KeyError, ValueError):
+        return None, None
+    # Resetting the high-water mark also resets ru_maxrss, so the process peak is kept here
+    _STATE["process_peak"] = max(_STATE["process_peak"] or 0.0, hwm)
+    return rss, hwm
+
+
+def _process_peak_rss_mb():
+    peaks = [p for p in (_STATE["process_peak"], _peak_rss_mb()) if p is not None]
+    return max(peaks) if peaks else None
+
+
+def _reset_peak_rss():
+    """
+    Resets the RSS high-water mark (Linux >= 4.0), so VmHWM measures a single stage.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _count_http_requests():
+    """
+    Wraps requests.Session.request once so every HTTP call is counted.
+    """
+    try:
+        import requests
+    except ImportError:
+        return
+    if getattr(requests.Session.request, "_g20_counted", False):
+        return
+    original = requests.Session.request
+
+    @functools.wraps(original)
+    def counted(self, *args, **kwargs):
+        if _STATE["enabled"]:
+            _STATE["requests"] += 1
+        return original(self, *args, **kwargs)
+
+    counted._g20_counted = True
+    requests.Session.request = counted
+
+
+def is_enabled():
+    return _STATE["enabled"]
+
+
+def start_run(run_name, report_path=None, profile=None):
+    """
+    Starts instrumenting a pipeline run. Without report_path (and without the
+    G20_INSTRUMENT environment variable) instrumentation stays off and every
+    stage is a no-op.
+
+    Parameters:
+    - run_name: Name of the pipeline (e.g. "functioncall").
+    - report_path: JSON report written by finish_run.
+    - profile: Profile top-level stages and keep the slowest one's profile
+      (default: G20_PROFILE environment variable).
+    """
+    report_path = report_path or os.environ.get(ENV_REPORT)
+    if not report_path:
+        _STATE["enabled"] = False
+        return
+    if profile is None:
+        profile = os.environ.get(ENV_PROFILE, "") not in ("", "0")
+    _STATE.update(
+        enabled=True, run=run_name, report_path=report_path, profile=profile,
+        started=time.strftime("%Y-%m-%dT%H:%M:%S"), wall_start=time.perf_counter(),
+        stages=[], stack=[], stack_peaks=[], process_peak=None, requests=0, slowest_profile=None
+    )
+    _count_http_requests()
+
+
+@contextlib.contextmanager
+def stage(name, kind="compute"):
+    """
+    Measures a pipeline stage: wall time, CPU time, peak RSS during the stage
+    and RSS change, bytes read and written and HTTP requests. Stages can be
+    nested; a stage's peak includes its nested stages. The peak needs Linux
+    (it resets the process high-water mark) and is None elsewhere.
+
+    Parameters:
+    - name: Stage name (repeated names are aggregated in the report).
+    - kind: One of "read", "compute", "write", "render", "http".
+    """
+    if not _STATE["enabled"]:
+        yield
+        return
+
+    depth = len(_STATE["stack"])
+    parent = _STATE["stack"][-1] if _STATE["stack"] else None
+    # Fold the high-water mark so far into the open stages before resetting it
+    rss_start, hwm = _rss_status()
+    _STATE["stack_peaks"] = [max(p, hwm) if None not in (p, hwm) else p for p in _STATE["stack_peaks"]]
+    peak = rss_start if _reset_peak_rss() else None
+    _STATE["stack"].append(name)
+    _STATE["stack_peaks"].append(peak)
+    profiler = None
+    if _STATE["profile"] and depth == 0:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    read_before, written_before = _io_counters()
+    requests_before = _STATE["requests"]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        read_after, written_after = _io_counters()
+        rss_end, hwm = _rss_status()
+        _STATE["stack"].pop()
+        peak = _STATE["stack_peaks"].pop()
+        if peak is not None and hwm is not None:
+            peak = max(peak, hwm)
+            # Parents include this stage's peak
+            _STATE["stack_peaks"] = [max(p, peak) if p is not None else p for p in _STATE["stack_peaks"]]
+        record = {
+            "name": name,
+            "kind": kind,
+            "parent": parent,
+            "depth": depth,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_rss_mb": peak,
+            "rss_delta_mb": None if None in (rss_start, rss_end) else rss_end - rss_start,
+            "process_peak_rss_mb": _process_peak_rss_mb(),
+            "bytes_read": None if read_before is None else read_after - read_before,
+            "bytes_written": None if written_before is None else written_after - written_before,
+            "requests": _STATE["requests"] - requests_before
+        }
+        _STATE["stages"].append(record)
+        if profiler is not None:
+            slowest = _STATE["slowest_profile"]
+            if slowest is None or wall > slowest[1]:
+                _STATE["slowest_profile"] = (name, wall, profiler)
+
+
+def instrumented(name=None, kind="compute"):
+    """
+    Decorator version of stage(); the stage name defaults to the function name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name or func.__name__, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_worker():
+    """
+    Starts instrumenting in a worker process of an instrumented run. Nothing
+    is written in the worker: hand take_records() back to the parent, which
+    merges them with add_records().
+    """
+    _STATE.update(
+        enabled=True, run=None, report_path=None, profile=False,
+        started=None, wall_start=time.perf_counter(),
+        stages=[], stack=[], stack_peaks=[], process_peak=None, requests=0, slowest_profile=None
+    )
+    _count_http_requests()
+
+
+def take_records():
+    """
+    Returns the stage records measured so far in this process and clears them.
+    """
+    records = _STATE["stages"]
+    _STATE["stages"] = []
+    return records
+
+
+def add_records(records, worker=None):
+    """
+    Adds stage records measured in a worker process to the current run, under
+    the stage open in this process (if any).
+
+    Parameters:
+    - records: Records from take_records() in the worker.
+    - worker: Worker process id, kept in each record.
+    """
+    if not _STATE["enabled"]:
+        return
+    parent = _STATE["stack"][-1] if _STATE["stack"] else None
+    depth = len(_STATE["stack"])
+    for record in records:
+        _STATE["stages"].append(dict(
+            record,
+            parent=record["parent"] if record["parent"] is not None else parent,
+            depth=record["depth"] + depth,
+            worker=worker
+        ))
+        if record["depth"] == 0:
+            _STATE["requests"] += record["requests"]
+
+
+def _summarize(stages, key):
+    summary = {}
+    for record in stages:
+        entry = summary.setdefault(record[key], {
+            "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "bytes_read": 0, "bytes_written": 0, "requests": 0
+        })
+        entry["calls"] += 1
+        entry["wall_s"] += record["wall_s"]
+        entry["cpu_s"] += record["cpu_s"]
+        entry["bytes_read"] += record["bytes_read"] or 0
+        entry["bytes_written"] += record["bytes_written"] or 0
+        entry["requests"] += record["requests"]
+    return summary
+
+
+def finish_run():
+    """
+    Writes the JSON report of the current run (and the profile of its slowest
+    stage, if profiling was on), then switches instrumentation off. Call it
+    from a finally block, so a run that fails still gets its report.
+
+    Returns:
+    - The report dictionary, or None if instrumentation was off.
+    """
+    if not _STATE["enabled"]:
+        return None
+    _STATE["enabled"] = False
+
+    top_level = [record for record in _STATE["stages"] if record["depth"] == 0]
+    report = {
+        "run": _STATE["run"],
+        "started": _STATE["started"],
+        "total_wall_s": time.perf_counter() - _STATE["wall_start"],
+        "peak_rss_mb": _process_peak_rss_mb(),
+        "requests": _STATE["requests"],
+        "stages": _STATE["stages"],
+        "by_name": _summarize(_STATE["stages"], "name"),
+        "by_kind": _summarize(top_level, "kind"),
+        "slowest_stage": max(top_level, key=lambda r: r["wall_s"])["name"] if top_level else None
+    }
+
+    report_path = _STATE["report_path"]
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    if _STATE["slowest_profile"] is not None:
+        import pstats
+        name, _, profiler = _STATE["slowest_profile"]
+        profile_path = os.path.splitext(report_path)[0] + ".prof"
+        profiler.dump_stats(profile_path)
+        report["profile"] = {"stage": name, "path": profile_path}
+        with open(os.path.splitext(report_path)[0] + "_profile.txt", 'w', encoding='utf-8') as f:
+            pstats.Stats(profile_path, stream=f).sort_stats("cumulative").print_stats(30)
+
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved instrumentation report to {report_path}")
+    return report
+
+# How to use the report:
+# - Run a pipeline with G20_INSTRUMENT=reports/functioncall.json (add G20_PROFILE=1 for cProfile).
+# - "by_kind" shows whether the run is dominated by reads, computation, writes, plotting or HTTP calls.
+# - "slowest_stage" names the stage to optimize first; its profile is in <report>_profile.txt.
+# - A stage's peak_rss_mb is its own high-water mark; process_peak_rss_mb is the process-wide one so far.
+# - Stages run in worker processes carry the worker's process id in "worker"; their RSS figures are the worker's.
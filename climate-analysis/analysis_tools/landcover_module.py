@@ -0,0 +1,128 @@
+import os
+import re
+import csv
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from .alignment_module import make_grid
+from .distance_module import METRES_PER_DEGREE
+from .exposure_module import rasterize_districts, DISTRICTS_PATH
+from .raster_io_module import invalid_mask
+
+# MODIS MCD12Q1 LC_Type1 (IGBP) classes
+LCT_CLASSES = {
+    1: "Evergreen Needleleaf Forests",
+    2: "Evergreen Broadleaf Forests",
+    3: "Deciduous Needleleaf Forests",
+    4: "Deciduous Broadleaf Forests",
+    5: "Mixed Forests",
+    6: "Closed Shrublands",
+    7: "Open Shrublands",
+    8: "Woody Savannas",
+    9: "Savannas",
+    10: "Grasslands",
+    11: "Permanent Wetlands",
+    12: "Croplands",
+    13: "Urban and Built-up Lands",
+    14: "Cropland/Natural Vegetation Mosaics",
+    15: "Permanent Snow and Ice",
+    16: "Barren",
+    17: "Water Bodies"
+}
+
+# Rows of the land cover raster counted at once
+_ROW_BLOCK = 512
+
+
+def row_areas_km2(grid, row_start, row_stop):
+    """
+    Area in km2 of one pixel of each row, from the grid transform. Projected
+    grids have a constant pixel area (exact for the equal-area MODIS
+    sinusoidal grid); geographic grids use the area of each latitude band.
+    """
+    transform = grid["transform"]
+    rows = np.arange(row_start, row_stop)
+    if grid["crs"] is not None and grid["crs"].is_geographic:
+        radius = METRES_PER_DEGREE * 180 / np.pi
+        top = np.radians(transform.f + transform.e * rows)
+        bottom = np.radians(transform.f + transform.e * (rows + 1))
+        width = np.radians(abs(transform.a))
+        return radius ** 2 * width * np.abs(np.sin(top) - np.sin(bottom)) / 1e6
+    return np.full(rows.size, abs(transform.a * transform.e - transform.b * transform.d) / 1e6)
+
+
+def class_areas(lct_files, districts_path=DISTRICTS_PATH, name_field="ADM3_EN"):
+    """
+    Area of every land cover class in every district, for each year.
+
+    District labels and class codes are combined into one integer key, so
+    each block of rows is counted with a single area-weighted bincount and
+    every yearly raster is read once.
+
+    Parameters:
+    - lct_files: Yearly land cover rasters on the same grid (e.g. 2010LCT.tif ... 2023LCT.tif).
+    - districts_path: Path to the districts shapefile.
+    - name_field: Attribute holding the district name.
+
+    Returns:
+    - List of dictionaries with year, district, class, class_name and area_km2
+      (only the classes present in each district).
+    """
+    with rasterio.open(lct_files[0]) as src:
+        grid = make_grid(src.crs, src.transform, src.width, src.height)
+        dtype = np.dtype(src.dtypes[0])
+    if not np.issubdtype(dtype, np.integer) or dtype.itemsize > 2:
+        raise ValueError(f"Land cover rasters must be 8- or 16-bit integers, got {dtype}")
+    labels, names = rasterize_districts(districts_path, grid, name_field)
+
+    # Key = district label * n_codes + (class code - lowest code of the dtype)
+    low = int(np.iinfo(dtype).min)
+    n_codes = int(np.iinfo(dtype).max) - low + 1
+    n_keys = (len(names) + 1) * n_codes
+
+    results = []
+    for f in lct_files:
+        match = re.search(r'(\d{4})', os.path.basename(f))
+        year = int(match.group(1)) if match else os.path.basename(f)
+        areas = np.zeros(n_keys)
+        with rasterio.open(f) as src:
+            if (src.width, src.height) != (grid["width"], grid["height"]) or src.transform != grid["transform"]:
+                raise ValueError(f"{f} is not on the grid of {lct_files[0]}")
+            for row in range(0, grid["height"], _ROW_BLOCK):
+                stop = min(row + _ROW_BLOCK, grid["height"])
+                block = src.read(1, window=Window(0, row, grid["width"], stop - row))
+                block_labels = labels[row:stop]
+                valid = (block_labels > 0) & ~invalid_mask(block, (src.nodata,))
+                keys = block_labels[valid].astype(np.int64) * n_codes + (block[valid].astype(np.int64) - low)
+                weights = np.broadcast_to(row_areas_km2(grid, row, stop)[:, None], block.shape)[valid]
+                areas += np.bincount(keys, weights=weights, minlength=n_keys)
+
+        for key in np.flatnonzero(areas):
+            label, code = divmod(int(key), n_codes)
+            code += low
+            results.append({
+                "year": year,
+                "district": names[label - 1],
+                "class": code,
+                "class_name": LCT_CLASSES.get(code, "Unknown"),
+                "area_km2": float(areas[key])
+            })
+    return results
+
+
+def save_class_areas_to_csv(csv_path, results):
+    """
+    Saves the rows returned by class_areas to a CSV file.
+    """
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=["year", "district", "class", "class_name", "area_km2"])
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Saved land cover areas to {csv_path}")
+
+# How to read the land cover areas:
+# - One row per year, district and class; areas of a district sum to its area on the raster grid.
+# - Compare the same district and class across years to follow e.g. Grasslands turning into Barren.
+# - pandas.DataFrame(results).pivot_table(index="year", columns="class_name", values="area_km2", aggfunc="sum")
+#   gives the regional totals per class.
@@ -0,0 +1,357 @@
+import os
+import ast
+import json
+import time
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from .instrumentation_module import stage as instrument_stage
+from .instrumentation_module import is_enabled, start_worker, take_records, add_records
+
+CHUNK_SIZE = 1024 * 1024
+
+# Package whose modules are followed when hashing stage code
+PACKAGE = __name__.rpartition('.')[0]
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Source files hashed so far: path -> ([size, mtime_ns], sha256, imported package files)
+_SOURCE_HASHES = {}
+
+
+def make_stage(name, func, inputs=None, outputs=None, params=None, kind="compute"):
+    """
+    Declares a pipeline stage. The function is called as
+    func(**inputs, **outputs, **params), so existing functions such as
+    raster_difference(file_path1, file_path2, output_tif_path) can be used as they are.
+
+    Parameters:
+    - name: Unique stage name.
+    - func: Module-level function (it may run in a worker process).
+    - inputs: Dict of argument name -> file path (or list of file paths).
+    - outputs: Dict of argument name -> file path written by the stage.
+    - params: Dict of other (JSON-serializable) arguments.
+    - kind: Instrumentation kind ("read", "compute", "write", "render", "http").
+
+    Returns:
+    - Stage dictionary.
+    """
+    return {
+        "name": name,
+        "func": func,
+        "inputs": dict(inputs or {}),
+        "outputs": dict(outputs or {}),
+        "params": dict(params or {}),
+        "kind": kind
+    }
+
+
+def _paths(values):
+    paths = []
+    for value in values:
+        paths.extend(value if isinstance(value, (list, tuple)) else [value])
+    return paths
+
+
+def file_hash(path, file_cache=None):
+    """
+    sha256 of a file's content. Hashes are reused while the file's size and
+    modification time are unchanged, so unchanged inputs are not re-read.
+    """
+    info = os.stat(path)
+    fingerprint = [info.st_size, info.st_mtime_ns]
+    key = os.path.abspath(path)
+    if file_cache is not None and key in file_cache and file_cache[key]["fingerprint"] == fingerprint:
+        return file_cache[key]["sha256"]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    if file_cache is not None:
+        file_cache[key] = {"fingerprint": fingerprint, "sha256": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def _package_imports(source, path):
+    """
+    Files of the analysis_tools modules imported anywhere in a source file,
+    including imports inside functions.
+    """
+    names = set()
+    for node in ast.walk(ast.parse(source, filename=path)):
+        if isinstance(node, ast.ImportFrom):
+            if (node.level == 1 and node.module is None) or (node.level == 0 and node.module == PACKAGE):
+                # from . import x / from analysis_tools import x
+                names.update(alias.name for alias in node.names)
+            elif node.level == 1:
+                names.add(node.module.split('.')[0])
+            elif node.level == 0 and node.module and node.module.startswith(PACKAGE + '.'):
+                names.add(node.module.split('.')[1])
+        elif isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[1] for alias in node.names if alias.name.startswith(PACKAGE + '.'))
+    paths = [os.path.join(PACKAGE_DIR, name + '.py') for name in names]
+    return sorted(path for path in paths if os.path.exists(path))
+
+
+def _source_info(path):
+    """
+    sha256 of a source file and the package modules it imports, reused while
+    the file's size and modification time are unchanged.
+    """
+    info = os.stat(path)
+    fingerprint = [info.st_size, info.st_mtime_ns]
+    cached = _SOURCE_HASHES.get(path)
+    if cached is None or cached[0] != fingerprint:
+        with open(path, 'rb') as f:
+            source = f.read()
+        cached = (fingerprint, hashlib.sha256(source).hexdigest(), _package_imports(source, path))
+        _SOURCE_HASHES[path] = cached
+    return cached[1], cached[2]
+
+
+def code_hash(func):
+    """
+    Hash of the code a stage runs: the whole module defining func and the
+    analysis_tools modules it imports, directly or through each other. Editing
+    a helper it calls (e.g. get_raster_stats) invalidates the cached outputs;
+    editing a module it does not use does not.
+    """
+    try:
+        pending = [os.path.abspath(inspect.getsourcefile(func))]
+    except TypeError:
+        pending = []
+    hashes = {}
+    while pending:
+        path = pending.pop()
+        if path in hashes:
+            continue
+        hashes[path], imports = _source_info(path)
+        pending.extend(imports)
+    digest = hashlib.sha256()
+    for path in sorted(hashes):
+        digest.update(f"{os.path.basename(path)}:{hashes[path]}\n".encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage, file_cache=None):
+    """
+    Content address of a stage run: the function (name and the code it
+    depends on, see code_hash), the parameters, the output paths and the
+    content of every input file.
+    """
+    description = {
+        "func": f"{stage['func'].__module__}.{stage['func'].__qualname__}",
+        "code": code_hash(stage["func"]),
+        "params": stage["params"],
+        "outputs": stage["outputs"],
+        "inputs": {
+            name: [[path, file_hash(path, file_cache)] for path in _paths([value])]
+            for name, value in sorted(stage["inputs"].items())
+        }
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _producers(stages):
+    producers = {}
+    for stage in stages:
+        for path in _paths(stage["outputs"].values()):
+            producer = producers.setdefault(os.path.abspath(path), stage["name"])
+            if producer != stage["name"]:
+                raise ValueError(f"{path} is an output of both {producer} and {stage['name']}")
+    return producers
+
+
+def dependencies(stages):
+    """
+    Stage name -> names of the stages producing its inputs.
+    """
+    producers = _producers(stages)
+    deps = {}
+    for stage in stages:
+        deps[stage["name"]] = {
+            producers[os.path.abspath(path)] for path in _paths(stage["inputs"].values())
+            if os.path.abspath(path) in producers
+        } - {stage["name"]}
+    return deps
+
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return {"files": {}, "stages": {}}
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, state_path):
+    os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, state_path)
+
+
+def _is_up_to_date(stage, key, state):
+    record = state["stages"].get(stage["name"])
+    if record is None or record["key"] != key:
+        return False
+    for path in _paths(stage["outputs"].values()):
+        if not os.path.exists(path) or file_hash(path, state["files"]) != record["outputs"].get(path):
+            return False
+    return True
+
+
+def _call_stage(stage):
+    for path in _paths(stage["outputs"].values()):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    stage["func"](**stage["inputs"], **stage["outputs"], **stage["params"])
+
+
+def _run_stage(stage, instrument=False):
+    """
+    Runs a stage in a worker process. Errors are returned rather than raised,
+    so the stage's instrumentation records reach the parent either way.
+
+    Returns:
+    - Dict with the wall time, the error (None on success), the worker's
+      process id and its stage records (empty unless instrument).
+    """
+    if instrument:
+        start_worker()
+    error = None
+    start = time.perf_counter()
+    try:
+        with instrument_stage(stage["name"], stage["kind"]):
+            _call_stage(stage)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        "wall": time.perf_counter() - start,
+        "error": error,
+        "worker": os.getpid(),
+        "records": take_records() if instrument else []
+    }
+
+
+def run_pipeline(stages, state_path, workers=1, force=False):
+    """
+    Runs the stages in dependency order, re-executing only those whose
+    function, parameters or input files changed since the last run (or whose
+    outputs are missing or were modified). Independent stages run in parallel.
+
+    Parameters:
+    - stages: List of stages from make_stage.
+    - state_path: JSON file with the input hashes and stage keys of previous runs.
+    - workers: Number of worker processes (1 runs everything in this process).
+    - force: Re-execute every stage.
+
+    Returns:
+    - Dict of stage name -> "ran", "cached", "failed" or "skipped" (a dependency failed).
+    """
+    by_name = {stage["name"]: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+    deps = dependencies(stages)
+    produced = _producers(stages)
+    state = load_state(state_path)
+    status = {}
+
+    for stage in stages:
+        for path in _paths(stage["inputs"].values()):
+            if os.path.abspath(path) not in produced and not os.path.exists(path):
+                raise FileNotFoundError(f"Input {path} of stage {stage['name']} does not exist")
+
+    def ready():
+        names = [
+            name for name in by_name
+            if name not in status and name not in running.values() and all(d in status for d in deps[name])
+        ]
+        if not names and not running and len(status) < len(by_name):
+            raise ValueError(f"Dependency cycle between stages: {sorted(set(by_name) - set(status))}")
+        return names
+
+    def finish(name, key, error=None, wall=None):
+        stage = by_name[name]
+        missing = [path for path in _paths(stage["outputs"].values()) if not os.path.exists(path)]
+        if error is None and missing:
+            error = f"outputs not written: {', '.join(missing)}"
+        if error is not None:
+            status[name] = "failed"
+            state["stages"].pop(name, None)
+            print(f"[{name}] failed: {error}")
+        else:
+            status[name] = "ran"
+            state["stages"][name] = {
+                "key": key,
+                "outputs": {path: file_hash(path, state["files"]) for path in _paths(stage["outputs"].values())},
+                "wall_s": wall
+            }
+            print(f"[{name}] done in {wall:.2f} s")
+        save_state(state, state_path)
+
+    def prepare(name):
+        """
+        Decides whether a ready stage must run; returns its key, or None once it is settled.
+        """
+        if any(status[d] in ("failed", "skipped") for d in deps[name]):
+            status[name] = "skipped"
+            print(f"[{name}] skipped (a dependency failed)")
+            return None
+        key = stage_key(by_name[name], state["files"])
+        if not force and _is_up_to_date(by_name[name], key, state):
+            status[name] = "cached"
+            print(f"[{name}] up to date")
+            return None
+        return key
+
+    running = {}
+    if workers <= 1:
+        while len(status) < len(by_name):
+            for name in ready():
+                key = prepare(name)
+                if key is None:
+                    continue
+                start = time.perf_counter()
+                try:
+                    with instrument_stage(name, by_name[name]["kind"]):
+                        _call_stage(by_name[name])
+                except Exception as e:
+                    finish(name, key, error=e)
+                else:
+                    finish(name, key, wall=time.perf_counter() - start)
+        return status
+
+    # Workers measure their stages themselves; the records are merged here
+    keys = {}
+    instrument = is_enabled()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while len(status) < len(by_name):
+            for name in ready():
+                key = prepare(name)
+                if key is not None:
+                    keys[name] = key
+                    running[executor.submit(_run_stage, by_name[name], instrument)] = name
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error, wall = future.exception(), None
+                if error is None:
+                    result = future.result()
+                    add_records(result["records"], worker=result["worker"])
+                    error, wall = result["error"], result["wall"]
+                finish(name, keys[name], error=error, wall=wall)
+    return status
+
+
+def print_summary(status):
+    counts = {}
+    for result in status.values():
+        counts[result] = counts.get(result, 0) + 1
+    print("Pipeline: " + ", ".join(f"{count} {result}" for result, count in sorted(counts.items())))
+
+# How the runner decides what to re-execute:
+# - A stage's key hashes its code (its module and the analysis_tools modules it imports), parameters and the content of its input files.
+# - If the key and the recorded output hashes match, the stage is reported "up to date" and not run.
+# - Outputs of one stage that are inputs of another define the order; everything else may run in parallel.
+# - Delete the state file (or pass force=True) to rebuild everything.
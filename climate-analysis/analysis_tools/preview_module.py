@@ -0,0 +1,218 @@
+import os
+from statistics import NormalDist
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
+from .raster_io_module import invalid_mask, SENTINEL_NODATA
+
+# Coarsest level still worth using: at least this many valid pixels
+MIN_SAMPLE = 64
+
+
+def preview_levels(file_path):
+    """
+    Decimation factors available for a raster, finest first: 1, the file's
+    overview factors if it has any, otherwise powers of two.
+    """
+    with rasterio.open(file_path) as src:
+        factors = src.overviews(1)
+        if not factors:
+            factors = []
+            factor = 2
+            while min(src.height, src.width) // factor >= int(np.sqrt(MIN_SAMPLE)):
+                factors.append(factor)
+                factor *= 2
+    return [1] + sorted(factors)
+
+
+def read_preview(file_path, factor, method="overview", no_data_values=(SENTINEL_NODATA,), seed=0):
+    """
+    Reads about one pixel in factor x factor.
+
+    Parameters:
+    - file_path: Path to the raster file.
+    - factor: Decimation factor (1 reads the full resolution).
+    - method: "overview" (nearest-neighbour read, served from the overviews
+      when the file has them) or "sample" (one random row and column per
+      factor-wide stratum).
+    - no_data_values: Extra values to mask on top of the file's nodata.
+    - seed: Random seed of the stratified sample.
+
+    Returns:
+    - data: Masked array of the sampled pixels.
+    - rows, cols: Full-resolution row and column of each sampled row/column.
+    - shape: (height, width) at full resolution.
+    """
+    with rasterio.open(file_path) as src:
+        height, width = src.height, src.width
+        out_height, out_width = max(1, height // factor), max(1, width // factor)
+        if factor == 1:
+            data = src.read(1)
+            rows, cols = np.arange(height), np.arange(width)
+        elif method == "overview":
+            # Nearest-neighbour keeps actual pixel values (GDAL uses the
+            # overviews if present; build them with "nearest" to keep sample semantics)
+            data = src.read(1, out_shape=(out_height, out_width), resampling=Resampling.nearest)
+            rows = np.minimum(((np.arange(out_height) + 0.5) * height / out_height).astype(int), height - 1)
+            cols = np.minimum(((np.arange(out_width) + 0.5) * width / out_width).astype(int), width - 1)
+        elif method == "sample":
+            rng = np.random.default_rng(seed)
+            row_edges = np.linspace(0, height, out_height + 1).astype(int)
+            col_edges = np.linspace(0, width, out_width + 1).astype(int)
+            rows = row_edges[:-1] + (rng.random(out_height) * np.diff(row_edges)).astype(int)
+            cols = col_edges[:-1] + (rng.random(out_width) * np.diff(col_edges)).astype(int)
+            data = np.stack([src.read(1, window=Window(0, row, width, 1))[0, cols] for row in rows])
+        else:
+            raise ValueError(f"Unknown preview method {method}")
+        mask = invalid_mask(data, (src.nodata,) + tuple(no_data_values))
+    return np.ma.MaskedArray(data, mask=mask), rows, cols, (height, width)
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def _summarize(values, population, confidence):
+    """
+    Statistics of a pixel sample with normal-approximation confidence intervals.
+    population is the (estimated) number of valid pixels at full resolution.
+    """
+    n = values.size
+    if n == 0:
+        return {"min": None, "max": None, "mean": None, "median": None,
+                "mean_ci": (None, None), "median_ci": (None, None), "n": 0}
+    values = np.sort(values.astype(np.float64))
+    mean = float(values.mean())
+    z = _z(confidence)
+    # Finite population correction: the interval shrinks to the mean at full resolution
+    fpc = max(0.0, 1.0 - n / population) if population else 0.0
+    if fpc == 0:
+        half = 0.0
+    elif n > 1:
+        half = z * float(values.std(ddof=1)) / np.sqrt(n) * np.sqrt(fpc)
+    else:
+        half = np.inf
+    # Median: order statistics around n/2 (binomial normal approximation)
+    spread = z * np.sqrt(n) / 2 * np.sqrt(fpc)
+    low_rank = int(np.clip(np.floor(n / 2 - spread), 0, n - 1))
+    high_rank = int(np.clip(np.ceil(n / 2 + spread), 0, n - 1))
+    median = float(np.median(values))
+    median_ci = (median, median) if fpc == 0 else (float(values[low_rank]), float(values[high_rank]))
+    return {
+        "min": float(values[0]),
+        "max": float(values[-1]),
+        "mean": mean,
+        "median": median,
+        "mean_ci": (float(mean - half), float(mean + half)),
+        "median_ci": median_ci,
+        "n": n
+    }
+
+
+def _zone_sample(data, rows, cols, shape, bounds):
+    """
+    Valid sampled values of a zone and the zone's estimated valid pixels at full resolution.
+    """
+    min_row, max_row, min_col, max_col = bounds
+    row_in = (rows >= min_row) & (rows < max_row)
+    col_in = (cols >= min_col) & (cols < max_col)
+    values = data[np.ix_(row_in, col_in)].compressed()
+    cells = int(row_in.sum()) * int(col_in.sum())
+    zone_size = max(0, min(max_row, shape[0]) - min_row) * max(0, min(max_col, shape[1]) - min_col)
+    return values, (values.size * zone_size / cells if cells else 0)
+
+
+def _meets(stats, target):
+    # No valid pixel sampled: only a finer level can tell
+    if stats["n"] == 0:
+        return False
+    low, high = stats["mean_ci"]
+    return (high - low) / 2 <= target * max(abs(stats["mean"]), np.finfo(float).tiny)
+
+
+def preview_stats(file_path, target=0.01, zones=None, factor=None, method="overview",
+                  no_data_values=(SENTINEL_NODATA,), confidence=0.95, seed=0):
+    """
+    Approximate get_raster_stats (and zone means) from a decimated read.
+
+    With a target, the coarsest level whose confidence interval of the mean
+    is within target (relative half-width, e.g. 0.01 = +-1%) for the whole
+    raster and every zone is used; coarse levels are tried first, so the
+    cost is about that of the level finally used. Level 1 is exact.
+
+    Parameters:
+    - file_path: Path to the raster file.
+    - target: Relative accuracy of the means (ignored if factor is given).
+    - zones: Optional dict of name -> (min_row, max_row, min_col, max_col) in
+      full-resolution pixels, as in calculate_time_series.
+    - factor: Fixed decimation factor instead of a target.
+    - method: "overview" or "sample" (see read_preview).
+    - no_data_values: Extra values to mask on top of the file's nodata.
+    - confidence: Confidence level of the intervals.
+    - seed: Random seed of the stratified sample.
+
+    Returns:
+    - Dictionary with min, max, mean, median (as get_raster_stats), mean_ci,
+      median_ci, n (sampled valid pixels), factor, exact, data (the sampled
+      masked array, e.g. for plotting) and, if zones are given, zones:
+      {name: {"mean", "mean_ci", "n"}}. min and max are those of the
+      sample, so the true range is at least as wide.
+    """
+    factors = [factor] if factor is not None else sorted(preview_levels(file_path), reverse=True)
+    for level in factors:
+        data, rows, cols, shape = read_preview(file_path, level, method, no_data_values, seed)
+        # Valid pixels at full resolution, estimated from the sample's valid fraction
+        population = data.count() * shape[0] * shape[1] / data.size
+        stats = _summarize(data.compressed(), population, confidence)
+        zone_stats = {}
+        for name, bounds in (zones or {}).items():
+            zone = _summarize(*_zone_sample(data, rows, cols, shape, bounds), confidence)
+            zone_stats[name] = {"mean": zone["mean"], "mean_ci": zone["mean_ci"], "n": zone["n"]}
+        good = _meets(stats, target) and all(_meets(z, target) for z in zone_stats.values())
+        if level == 1 or factor is not None or (good and stats["n"] >= MIN_SAMPLE):
+            break
+    stats.update(factor=level, exact=level == 1, data=data)
+    if zones:
+        stats["zones"] = zone_stats
+    return stats
+
+
+def preview_time_series(raster_files, zones, target=0.01, method="overview", no_data_values=(),
+                        confidence=0.95):
+    """
+    Approximate version of calculate_time_series: overall and zone means with
+    confidence intervals, each raster read at the coarsest level meeting target.
+
+    Parameters:
+    - raster_files: Yearly rasters.
+    - zones: Dict of name -> (min_row, max_row, min_col, max_col), e.g.
+      {"north": north_bounds, "center": center_bounds, "south": south_bounds}.
+
+    Returns:
+    - List of dicts with filename, factor, overall_mean(_low/_high) and
+      <zone>_mean(_low/_high) for each zone.
+    """
+    results = []
+    for f in raster_files:
+        stats = preview_stats(f, target, zones, method=method, no_data_values=no_data_values,
+                              confidence=confidence)
+        row = {
+            "filename": os.path.basename(f),
+            "factor": stats["factor"],
+            "overall_mean": stats["mean"],
+            "overall_mean_low": stats["mean_ci"][0],
+            "overall_mean_high": stats["mean_ci"][1]
+        }
+        for name, zone in stats.get("zones", {}).items():
+            row[f"{name}_mean"] = zone["mean"]
+            row[f"{name}_mean_low"] = zone["mean_ci"][0]
+            row[f"{name}_mean_high"] = zone["mean_ci"][1]
+        results.append(row)
+    return results
+
+# How to read the preview statistics:
+# - factor is the decimation used (1 = full resolution, exact); n the valid pixels sampled.
+# - The true mean lies in mean_ci with the chosen confidence (95% by default).
+# - A smaller target gives finer levels and tighter intervals; target=0 always reads the full raster.
+# - Neighbouring pixels are correlated, so the intervals from a regular (overview) sample are usually conservative.
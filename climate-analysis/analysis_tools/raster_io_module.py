@@ -0,0 +1,100 @@
+import numpy as np
+import rasterio
+
+# Sentinel used for "no data" in several hackathon rasters, on top of their nodata tag
+SENTINEL_NODATA = 65533
+
+
+def _representable(value, dtype):
+    """
+    True if value can occur in an array of the given dtype (e.g. 65533 cannot in int8).
+    """
+    if np.issubdtype(dtype, np.integer):
+        info = np.iinfo(dtype)
+        return float(value).is_integer() and info.min <= value <= info.max
+    return True
+
+
+def invalid_mask(data, no_data_values=()):
+    """
+    Boolean mask of the cells equal to any of no_data_values (NaN included for floats).
+    Values that cannot occur in the array's dtype are skipped, so no cast is needed.
+    """
+    mask = np.zeros(data.shape, dtype=bool)
+    if np.issubdtype(data.dtype, np.floating):
+        mask |= np.isnan(data)
+    for value in no_data_values:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            continue
+        if _representable(value, data.dtype):
+            mask |= data == value
+    return mask
+
+
+def read_masked(file_path, band=1, no_data_values=(SENTINEL_NODATA,), window=None, dtype=None):
+    """
+    Reads a raster band as a masked array in its native dtype. Cells equal to
+    the file's nodata or to any of no_data_values are masked, so integer
+    products (LCT, GPP) stay 1-2 bytes per pixel instead of float64 copies.
+
+    Parameters:
+    - file_path: Path to the raster file.
+    - band: Band to read.
+    - no_data_values: Extra values to mask (default: the 65533 sentinel).
+    - window: Optional rasterio Window to read.
+    - dtype: Optional dtype to convert to (e.g. np.float32); None keeps the native one.
+
+    Returns:
+    - numpy.ma.MaskedArray (mask is always a full boolean array).
+    """
+    with rasterio.open(file_path) as src:
+        data = src.read(band, window=window)
+        mask = invalid_mask(data, (src.nodata,) + tuple(no_data_values))
+    if dtype is not None and data.dtype != dtype:
+        data = data.astype(dtype)
+    return np.ma.MaskedArray(data, mask=mask)
+
+
+def as_masked(data, no_data_values=()):
+    """
+    Accepts a masked array or a plain array (NaN = no data) and returns a masked array.
+    """
+    if np.ma.isMaskedArray(data):
+        return data
+    data = np.asarray(data)
+    return np.ma.MaskedArray(data, mask=invalid_mask(data, no_data_values))
+
+
+def valid_values(data):
+    """
+    1-D array of the valid cells of a masked array or of a NaN-filled array, in its own dtype.
+    """
+    if np.ma.isMaskedArray(data):
+        return data.compressed()
+    data = np.asarray(data)
+    if np.issubdtype(data.dtype, np.floating):
+        return data[~np.isnan(data)]
+    return data.ravel()
+
+
+def masked_mean(data):
+    """
+    Mean of the valid cells (accumulated in float64), or NaN if there are none.
+    """
+    values = valid_values(data)
+    if values.size == 0:
+        return np.nan
+    return float(np.mean(values, dtype=np.float64))
+
+
+def filled_float(data, dtype=np.float32):
+    """
+    Float copy with NaN in the masked cells (for plotting or writing GeoTIFFs).
+    """
+    data = as_masked(data)
+    return data.astype(np.promote_types(dtype, data.dtype)).filled(np.nan)
+
+# How to use the masked arrays:
+# - data.mask marks NoData; data.compressed() gives the valid values without any float copy.
+# - Matplotlib's imshow draws masked cells as transparent, like NaN.
+# - Use filled_float only when a NaN-filled float array is really needed (e.g. writing a difference raster).
@@ -0,0 +1,342 @@
+import os
+import csv
+import xml.etree.ElementTree as ET
+import numpy as np
+import rasterio
+from .raster_io_module import invalid_mask, _representable, SENTINEL_NODATA
+
+# Metadata domain of the sidecar holding our fingerprint and counts
+DOMAIN = "G20"
+
+HISTOGRAM_BINS = 256
+
+# Keys GDAL (and QGIS/ArcGIS) read from the default metadata domain
+_GDAL_KEYS = {"min": "STATISTICS_MINIMUM", "max": "STATISTICS_MAXIMUM", "mean": "STATISTICS_MEAN",
+              "std": "STATISTICS_STDDEV", "median": "STATISTICS_MEDIAN", "valid_count": "STATISTICS_COUNT"}
+
+_COUNT_KEYS = ["count", "valid_count", "nodata_count", "sentinel_count"]
+
+# Exact values, kept in the "G20" domain so the STATISTICS_* written by GDAL
+# can stay as they are when they only differ in the last digits
+_VALUE_KEYS = ["min", "max", "mean", "std", "median"]
+
+
+def sidecar_path(file_path):
+    return file_path + '.aux.xml'
+
+
+def _excluded(nodata, no_data_values):
+    values = [v for v in (nodata,) + tuple(no_data_values) if v is not None]
+    return ",".join(repr(float(v)) for v in values)
+
+
+def _fingerprint(file_path):
+    return {"SOURCE_SIZE": str(os.path.getsize(file_path)), "SOURCE_MTIME": repr(os.path.getmtime(file_path))}
+
+
+def compute_stats(file_path, band=1, no_data_values=(SENTINEL_NODATA,), bins=HISTOGRAM_BINS, data=None):
+    """
+    Statistics of the valid pixels of a band, in one read (none if data, the
+    band already read with read_masked and the same no_data_values, is given).
+
+    Returns:
+    - Dictionary with min, max, mean, std, median, count (all pixels),
+      valid_count, nodata_count (nodata tag or any of no_data_values),
+      sentinel_count (cells equal to 65533), excluded and histogram
+      ({"min", "max", "counts"} over the valid values).
+    """
+    with rasterio.open(file_path) as src:
+        nodata = src.nodata
+        if data is None:
+            data = src.read(band)
+            invalid = invalid_mask(data, (nodata,) + tuple(no_data_values))
+        else:
+            invalid = np.ma.getmaskarray(data)
+            data = np.ma.getdata(data)
+    values = data[~invalid]
+    stats = {
+        "count": int(data.size),
+        "valid_count": int(values.size),
+        "nodata_count": int(invalid.sum()),
+        "sentinel_count": int(np.sum(data == SENTINEL_NODATA)) if _representable(SENTINEL_NODATA, data.dtype) else 0,
+        "excluded": _excluded(nodata, no_data_values)
+    }
+    if values.size == 0:
+        stats.update(min=None, max=None, mean=None, std=None, median=None, histogram=None)
+        return stats
+    low, high = float(values.min()), float(values.max())
+    counts, _ = np.histogram(values, bins=bins, range=(low, high if high > low else low + 1))
+    stats.update(
+        min=low,
+        max=high,
+        mean=float(np.mean(values, dtype=np.float64)),
+        std=float(np.std(values, dtype=np.float64)),
+        median=float(np.median(values.astype(np.float64))),
+        histogram={"min": low, "max": high, "counts": [int(c) for c in counts]}
+    )
+    return stats
+
+
+def _band_element(root, band):
+    for element in root.findall('PAMRasterBand'):
+        if element.get('band') == str(band):
+            return element
+    return ET.SubElement(root, 'PAMRasterBand', band=str(band))
+
+
+def _metadata_element(band_element, domain=None):
+    for element in band_element.findall('Metadata'):
+        if element.get('domain') == domain:
+            return element
+    element = ET.SubElement(band_element, 'Metadata')
+    if domain is not None:
+        element.set('domain', domain)
+    return element
+
+
+def _same_value(text, value):
+    """
+    True if an existing MDI text already holds value, written with other
+    digits (GDAL writes "43613.000000" for 43613.0 and 14 significant digits
+    for floats), so it can be left as written.
+    """
+    try:
+        old, new = float(text), float(value)
+    except (TypeError, ValueError):
+        return text == value
+    return bool(np.isclose(old, new, rtol=1e-12, atol=0)) or (np.isnan(old) and np.isnan(new))
+
+
+def _set_items(metadata, items):
+    existing = {mdi.get('key'): mdi for mdi in metadata.findall('MDI')}
+    for key, value in items.items():
+        mdi = existing.get(key)
+        if mdi is None:
+            mdi = ET.SubElement(metadata, 'MDI', key=key)
+        elif _same_value(mdi.text, value):
+            continue
+        mdi.text = value
+
+
+def _read_histogram(item):
+    return {
+        "min": float(item.findtext('HistMin')),
+        "max": float(item.findtext('HistMax')),
+        "counts": [int(c) for c in item.findtext('HistCounts').split('|')]
+    }
+
+
+def _same_range(histogram, low, high):
+    # GDAL writes bounds with fewer digits than repr
+    return (np.isclose(histogram["min"], low, rtol=1e-9, atol=0)
+            and np.isclose(histogram["max"], high, rtol=1e-9, atol=0))
+
+
+def _histogram_matches(item, histogram):
+    """
+    True if a HistItem holds the same buckets as histogram.
+    """
+    try:
+        existing = _read_histogram(item)
+    except (TypeError, ValueError):
+        return False
+    return _same_range(existing, histogram["min"], histogram["max"]) and existing["counts"] == histogram["counts"]
+
+
+def write_sidecar_stats(file_path, stats, band=1):
+    """
+    Stores statistics in the GDAL .aux.xml sidecar: STATISTICS_* in the
+    default domain and a histogram (read by GDAL, QGIS and ArcGIS), plus the
+    exact values, counts and the source size/mtime in the "G20" domain.
+    Other sidecar content (e.g. ArcGIS attribute tables, a histogram GDAL
+    already wrote, values we would only rewrite with more digits) is kept as
+    written.
+    """
+    path = sidecar_path(file_path)
+    if os.path.exists(path):
+        tree = ET.parse(path)
+        root = tree.getroot()
+    else:
+        root = ET.Element('PAMDataset')
+        tree = ET.ElementTree(root)
+    band_element = _band_element(root, band)
+
+    gdal_items = {key: ("nan" if stats[name] is None else repr(float(stats[name])))
+                  for name, key in _GDAL_KEYS.items()}
+    gdal_items["STATISTICS_VALID_PERCENT"] = repr(100.0 * stats["valid_count"] / stats["count"])
+    _set_items(_metadata_element(band_element), gdal_items)
+    g20_items = {key.upper(): str(stats[key]) for key in _COUNT_KEYS}
+    g20_items.update({key.upper(): ("nan" if stats[key] is None else repr(float(stats[key])))
+                      for key in _VALUE_KEYS})
+    g20_items["EXCLUDED"] = stats["excluded"]
+    g20_items.update(_fingerprint(file_path))
+
+    histogram = stats["histogram"]
+    histograms = band_element.find('Histograms')
+    if histograms is not None:
+        for item in histograms.findall('HistItem'):
+            if item.get('source') == DOMAIN:
+                histograms.remove(item)
+    # A band keeps the histogram it already has (e.g. GDAL's), so readers
+    # never see two; HISTOGRAM records whether that one equals ours
+    existing = list(band_element.iter('HistItem'))
+    if histogram is None:
+        g20_items["HISTOGRAM"] = "none"
+    elif existing:
+        g20_items["HISTOGRAM"] = "existing" if _histogram_matches(existing[0], histogram) else "other"
+    else:
+        g20_items["HISTOGRAM"] = DOMAIN
+    _set_items(_metadata_element(band_element, DOMAIN), g20_items)
+
+    if g20_items["HISTOGRAM"] == DOMAIN:
+        if histograms is None:
+            histograms = ET.SubElement(band_element, 'Histograms')
+        item = ET.SubElement(histograms, 'HistItem', source=DOMAIN)
+        for tag, text in (("HistMin", repr(histogram["min"])), ("HistMax", repr(histogram["max"])),
+                          ("BucketCount", str(len(histogram["counts"]))), ("IncludeOutOfRange", "0"),
+                          ("Approximate", "0"), ("HistCounts", "|".join(map(str, histogram["counts"])))):
+            ET.SubElement(item, tag).text = text
+
+    ET.indent(tree, space='  ')
+    tmp_path = path + '.tmp'
+    # Same layout as the sidecars GDAL writes (2-space indent, <MDI ...></MDI>
+    # for empty values, final newline)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(ET.tostring(root, encoding='unicode', short_empty_elements=False) + '\n')
+    os.replace(tmp_path, path)
+
+
+def read_sidecar_stats(file_path, band=1, no_data_values=(SENTINEL_NODATA,)):
+    """
+    Statistics stored by write_sidecar_stats, or None if the sidecar is
+    missing, was written for other NoData values, or the raster changed
+    (size or mtime differ). Reads only the XML, never the pixels. The
+    histogram is None when the band kept another histogram with other
+    buckets.
+    """
+    path = sidecar_path(file_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        root = ET.parse(path).getroot()
+    except ET.ParseError:
+        return None
+    band_element = None
+    for element in root.findall('PAMRasterBand'):
+        if element.get('band') == str(band):
+            band_element = element
+    if band_element is None:
+        return None
+
+    items = {}
+    for metadata in band_element.findall('Metadata'):
+        domain = metadata.get('domain')
+        if domain in (None, DOMAIN):
+            for mdi in metadata.findall('MDI'):
+                items[(domain, mdi.get('key'))] = mdi.text or ""
+    fingerprint = {key: items.get((DOMAIN, key)) for key in ("SOURCE_SIZE", "SOURCE_MTIME")}
+    if fingerprint != _fingerprint(file_path):
+        return None
+    with rasterio.open(file_path) as src:
+        nodata = src.nodata
+    if items.get((DOMAIN, "EXCLUDED")) != _excluded(nodata, no_data_values):
+        return None
+
+    if any((DOMAIN, key.upper()) not in items for key in _COUNT_KEYS + _VALUE_KEYS):
+        return None
+
+    stats = {key: int(items[(DOMAIN, key.upper())]) for key in _COUNT_KEYS}
+    stats["excluded"] = items[(DOMAIN, "EXCLUDED")]
+    for key in _VALUE_KEYS:
+        value = float(items[(DOMAIN, key.upper())])
+        stats[key] = None if np.isnan(value) else value
+    # Our own HistItem, or the band's existing one when it held the same buckets
+    stats["histogram"] = None
+    source = items.get((DOMAIN, "HISTOGRAM"))
+    for item in band_element.iter('HistItem'):
+        if (source == DOMAIN and item.get('source') == DOMAIN) or source == "existing":
+            stats["histogram"] = dict(_read_histogram(item), min=stats["min"], max=stats["max"])
+            break
+    return stats
+
+
+def raster_stats(file_path, band=1, no_data_values=(SENTINEL_NODATA,), refresh=False, data=None):
+    """
+    Statistics of a raster band from its sidecar when still valid; otherwise
+    computed once and written back to the sidecar.
+
+    Parameters:
+    - file_path: Path to the raster file.
+    - band: Band number.
+    - no_data_values: Extra values excluded on top of the file's nodata.
+    - refresh: Recompute even if the sidecar is valid.
+    - data: The band already read with read_masked (same no_data_values), used
+      instead of reading the raster again when the sidecar is missing or stale.
+
+    Returns:
+    - Dictionary as compute_stats (min, max, mean and median as in get_raster_stats).
+    """
+    stats = None if refresh else read_sidecar_stats(file_path, band, no_data_values)
+    if stats is None:
+        stats = compute_stats(file_path, band, no_data_values, data=data)
+        try:
+            write_sidecar_stats(file_path, stats, band)
+        except OSError as e:
+            print(f"Warning: could not write {sidecar_path(file_path)}: {e}")
+    return stats
+
+
+def inventory(file_paths, no_data_values=(SENTINEL_NODATA,), valid_range=None, refresh=False):
+    """
+    Checks many rasters from their sidecar statistics (pixels are read only
+    for rasters whose sidecar is missing or stale).
+
+    Parameters:
+    - file_paths: Raster paths.
+    - no_data_values: Extra values excluded on top of each file's nodata.
+    - valid_range: Optional (low, high) the valid values should stay within.
+    - refresh: Recompute every file.
+
+    Returns:
+    - List of dictionaries with filename, counts, min, max, mean and the flags
+      all_nodata, has_sentinel and out_of_range.
+    """
+    rows = []
+    for f in file_paths:
+        stats = raster_stats(f, no_data_values=no_data_values, refresh=refresh)
+        out_of_range = False
+        if valid_range is not None and stats["valid_count"]:
+            out_of_range = stats["min"] < valid_range[0] or stats["max"] > valid_range[1]
+        rows.append({
+            "filename": os.path.basename(f),
+            "count": stats["count"],
+            "valid_count": stats["valid_count"],
+            "nodata_count": stats["nodata_count"],
+            "sentinel_count": stats["sentinel_count"],
+            "min": stats["min"],
+            "max": stats["max"],
+            "mean": stats["mean"],
+            "all_nodata": stats["valid_count"] == 0,
+            "has_sentinel": stats["sentinel_count"] > 0,
+            "out_of_range": out_of_range
+        })
+    return rows
+
+
+def save_inventory_to_csv(csv_path, rows):
+    """
+    Saves the rows returned by inventory to a CSV file.
+    """
+    if not rows:
+        return
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    with open(csv_path, mode='w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved raster inventory to {csv_path}")
+
+# How the sidecar statistics are reused:
+# - The first call computes the statistics and writes them into <file>.aux.xml; later calls only parse the XML.
+# - Touching or rewriting the raster (size or mtime change) makes the sidecar stale, so it is recomputed.
+# - has_sentinel flags rasters that still contain the 65533 "no data" value; all_nodata flags empty rasters.
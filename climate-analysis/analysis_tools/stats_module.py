@@ -1,19 +1,21 @@
 import numpy as np
 import csv
 import os
+from .raster_io_module import valid_values
 
 def get_raster_stats(data):
     """
-    Calculates basic statistics from a NumPy array (float) containing raster values.
+    Calculates basic statistics from raster values.
     Returns a dictionary with min, max, mean, and median.
     
     Parameters:
-    - data: NumPy array containing raster values.
+    - data: Masked array (any dtype, see raster_io_module.read_masked)
+      or float NumPy array with NaN as no data.
     
     Returns:
     - Dictionary with min, max, mean, and median.
     """
-    valid_data = data[~np.isnan(data)]
+    valid_data = valid_values(data)
     if len(valid_data) == 0:
         return {
             "min": None,
@@ -25,11 +27,12 @@ def get_raster_stats(data):
     return {
         "min": float(np.min(valid_data)),
         "max": float(np.max(valid_data)),
-        "mean": float(np.mean(valid_data)),
-        "median": float(np.median(valid_data))
+        "mean": float(np.mean(valid_data, dtype=np.float64)),
+        # float64 as the median of two middle values depends on the precision
+        "median": float(np.median(valid_data.astype(np.float64)))
     }
 
-def save_stats_to_csv(csv_path, stats_list):
+def save_stats_to_csv(csv_path, stats_list, fieldnames=None):
     """
     Saves a list of dictionaries (with fields 'filename', 'min', 'max', 'mean', 'median')
     to a CSV file.
@@ -37,10 +40,11 @@ def save_stats_to_csv(csv_path, stats_list):
     Parameters:
     - csv_path: Path to the CSV file.
     - stats_list: List of dictionaries containing statistics.
+    - fieldnames: Columns to write (default: filename, min, max, mean, median).
     """
     os.makedirs(os.path.dirname(csv_path), exist_ok=True)
     with open(csv_path, mode='w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = ["filename", "min", "max", "mean", "median"]
+        fieldnames = fieldnames or ["filename", "min", "max", "mean", "median"]
         writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
         writer.writeheader()
         for row in stats_list:
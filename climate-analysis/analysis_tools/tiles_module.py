@@ -0,0 +1,306 @@
+import os
+import glob
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from .alignment_module import make_grid
+from .raster_io_module import invalid_mask, SENTINEL_NODATA
+
+# Shared buffers larger than this (stack + outputs) are memory-mapped files instead
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+
+# Used when the cache size cannot be read from the system
+DEFAULT_CACHE_BYTES = 1024 ** 2
+
+# Buffers attached by a worker process, by name
+_ATTACHED = {}
+
+
+def cache_bytes(level=2):
+    """
+    Size of the CPU cache of the given level (from /sys on Linux), or DEFAULT_CACHE_BYTES.
+    """
+    for index in glob.glob('/sys/devices/system/cpu/cpu0/cache/index*'):
+        try:
+            with open(os.path.join(index, 'level')) as f:
+                if int(f.read()) != level:
+                    continue
+            with open(os.path.join(index, 'size')) as f:
+                size = f.read().strip()
+        except (OSError, ValueError):
+            continue
+        units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+        if size[-1] in units:
+            return int(size[:-1]) * units[size[-1]]
+        return int(size)
+    return DEFAULT_CACHE_BYTES
+
+
+def allocate(shape, dtype, memory_budget=DEFAULT_MEMORY_BUDGET, fill=None):
+    """
+    Array that worker processes can attach to without copying: shared memory
+    if it fits in memory_budget, otherwise a temporary .npy memmap.
+
+    Returns:
+    - Buffer dictionary with kind, name, shape, dtype and array (release it with release()).
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    if nbytes <= memory_budget:
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        buffer = {"kind": "shm", "name": shm.name, "shape": tuple(shape), "dtype": dtype.str, "_shm": shm}
+        buffer["array"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    else:
+        fd, path = tempfile.mkstemp(suffix='.npy', prefix='tiles_')
+        os.close(fd)
+        buffer = {"kind": "memmap", "name": path, "shape": tuple(shape), "dtype": dtype.str}
+        buffer["array"] = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    if fill is not None:
+        buffer["array"][...] = fill
+    return buffer
+
+
+def release(buffer):
+    """
+    Frees a buffer from allocate (the array must not be used afterwards).
+    """
+    buffer.pop("array", None)
+    if buffer["kind"] == "shm":
+        buffer["_shm"].close()
+        buffer["_shm"].unlink()
+    else:
+        os.remove(buffer["name"])
+
+
+def _descriptor(buffer):
+    return {key: buffer[key] for key in ("kind", "name", "shape", "dtype")}
+
+
+def _attach(descriptor):
+    """
+    Array view of a buffer in a worker process (attached once per process).
+    """
+    name = descriptor["name"]
+    if name not in _ATTACHED:
+        if descriptor["kind"] == "shm":
+            try:
+                shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Python < 3.13: workers share the parent's resource tracker,
+                # which forgets the segment when the parent unlinks it
+                shm = shared_memory.SharedMemory(name=name)
+            array = np.ndarray(descriptor["shape"], dtype=np.dtype(descriptor["dtype"]), buffer=shm.buf)
+            _ATTACHED[name] = (shm, array)
+        else:
+            _ATTACHED[name] = (None, np.load(name, mmap_mode='r+'))
+    return _ATTACHED[name][1]
+
+
+def load_stack(raster_files, no_data_values=(SENTINEL_NODATA,), dtype=np.float32,
+               memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Decodes yearly rasters straight into one shared (time, row, col) buffer,
+    NaN where NoData, so the stack exists once for all the workers.
+
+    Returns:
+    - Buffer dictionary (see allocate) with the grid (crs, transform, width, height) added.
+    """
+    with rasterio.open(raster_files[0]) as src:
+        grid = make_grid(src.crs, src.transform, src.width, src.height)
+    buffer = allocate((len(raster_files), grid["height"], grid["width"]), dtype, memory_budget)
+    buffer.update(grid)
+    for t, file_path in enumerate(raster_files):
+        with rasterio.open(file_path) as src:
+            if (src.width, src.height) != (grid["width"], grid["height"]) or src.transform != grid["transform"]:
+                release(buffer)
+                raise ValueError(f"{file_path} is not on the grid of {raster_files[0]}")
+            for row in range(0, grid["height"], 256):
+                block = src.read(1, window=Window(0, row, grid["width"], min(256, grid["height"] - row)))
+                invalid = invalid_mask(block, (src.nodata,) + tuple(no_data_values))
+                buffer["array"][t, row:row + block.shape[0]] = np.where(invalid, np.nan, block)
+    return buffer
+
+
+def tile_shape(stack_shape, itemsize, workers=1, cache=None, halo=0):
+    """
+    Tile (rows, cols) whose slice of the stack fits in the CPU cache, with
+    full-width row strips when the rows are narrow enough, and at least about
+    four tiles per worker for load balancing.
+    """
+    cache = cache or cache_bytes()
+    layers, height, width = stack_shape
+    pixel_bytes = layers * itemsize
+    pixels = max(cache // pixel_bytes, 1)
+    if width * pixel_bytes * 8 <= cache:
+        cols = width
+    else:
+        cols = int(min(width, max(16, np.sqrt(pixels))))
+    rows = int(min(height, max(1, pixels // (cols + 2 * halo) - 2 * halo)))
+    tiles_wanted = 4 * workers
+    while rows > 1 and np.ceil(height / rows) * np.ceil(width / cols) < tiles_wanted:
+        rows = (rows + 1) // 2
+    return rows, cols
+
+
+def _tiles(height, width, rows, cols):
+    return [(r, min(r + rows, height), c, min(c + cols, width))
+            for r in range(0, height, rows) for c in range(0, width, cols)]
+
+
+def _run_tile(kernel, stack, outputs, tile, halo, params):
+    r0, r1, c0, c1 = tile
+    height, width = stack.shape[1:]
+    h0, h1 = max(r0 - halo, 0), min(r1 + halo, height)
+    w0, w1 = max(c0 - halo, 0), min(c1 + halo, width)
+    core = (slice(r0 - h0, r1 - h0), slice(c0 - w0, c1 - w0))
+    out = {name: array[..., r0:r1, c0:c1] for name, array in outputs.items()}
+    kernel(stack[:, h0:h1, w0:w1], out, core, **params)
+
+
+def _worker_tiles(kernel, stack_descriptor, output_descriptors, tiles, halo, params):
+    stack = _attach(stack_descriptor)
+    outputs = {name: _attach(descriptor) for name, descriptor in output_descriptors.items()}
+    for tile in tiles:
+        _run_tile(kernel, stack, outputs, tile, halo, params)
+    return len(tiles)
+
+
+def run_tiles(kernel, stack, outputs, workers=None, tile=None, halo=0, params=None,
+              memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Runs a pixel-wise kernel over a (time, row, col) stack tile by tile.
+    Workers attach to the shared stack and write their tiles into shared
+    output buffers in place; only tile coordinates are sent to them.
+
+    The kernel is called as kernel(stack, out, core, **params):
+    - stack: (time, rows, cols) view of the tile, with halo extra pixels on each side.
+    - out: {name: view of the output tile (leading dims..., rows, cols)} to fill.
+    - core: (row slice, col slice) of the tile inside stack (all of it when halo=0).
+    It must be a module-level function so it can be sent to the workers.
+
+    Parameters:
+    - kernel: Function as above.
+    - stack: Buffer from load_stack/allocate, or a (time, row, col) array (copied once into a buffer).
+    - outputs: {name: dtype} or {name: (dtype, leading_shape)}; float outputs start as NaN, others as 0.
+    - workers: Processes (default: os.cpu_count(); 1 runs in this process).
+    - tile: (rows, cols) per tile (default: tile_shape).
+    - halo: Neighbour pixels needed around each tile (e.g. for gradients).
+    - params: Extra keyword arguments of the kernel.
+    - memory_budget: Bytes of shared memory before falling back to memmaps.
+
+    Returns:
+    - {name: array (leading_shape..., height, width)}.
+    """
+    workers = workers or os.cpu_count() or 1
+    params = params or {}
+    owned = not isinstance(stack, dict)
+    if owned:
+        array = np.asarray(stack)
+        stack = allocate(array.shape, array.dtype, memory_budget)
+        stack["array"][...] = array
+    layers, height, width = stack["shape"]
+
+    buffers = {}
+    try:
+        for name, spec in outputs.items():
+            dtype, leading = spec if isinstance(spec, tuple) else (spec, ())
+            fill = np.nan if np.issubdtype(np.dtype(dtype), np.floating) else 0
+            buffers[name] = allocate(tuple(leading) + (height, width), dtype, memory_budget, fill)
+
+        rows, cols = tile or tile_shape(stack["shape"], np.dtype(stack["dtype"]).itemsize, workers, halo=halo)
+        tiles = _tiles(height, width, rows, cols)
+        if workers <= 1:
+            arrays = {name: buffer["array"] for name, buffer in buffers.items()}
+            for t in tiles:
+                _run_tile(kernel, stack["array"], arrays, t, halo, params)
+        else:
+            # A few contiguous batches of tiles per worker keep the dispatch overhead low
+            edges = np.linspace(0, len(tiles), min(len(tiles), workers * 4) + 1).astype(int)
+            batches = [tiles[start:stop] for start, stop in zip(edges[:-1], edges[1:])]
+            descriptors = {name: _descriptor(buffer) for name, buffer in buffers.items()}
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_worker_tiles, kernel, _descriptor(stack), descriptors, batch, halo, params)
+                           for batch in batches]
+                for future in futures:
+                    future.result()
+        return {name: np.array(buffer["array"]) for name, buffer in buffers.items()}
+    finally:
+        for buffer in buffers.values():
+            release(buffer)
+        if owned:
+            release(stack)
+
+
+def linear_trend(stack, out, core, times):
+    """
+    Kernel: per-pixel least-squares slope (units per time step) over the valid years.
+    Output: "slope".
+    """
+    values = stack[:, core[0], core[1]].astype(np.float64)
+    valid = ~np.isnan(values)
+    t = np.asarray(times, dtype=np.float64)[:, None, None] * valid
+    n = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = t.sum(axis=0) / n
+        v_mean = np.nansum(values, axis=0) / n
+        cov = np.nansum((t - t_mean) * (values - v_mean) * valid, axis=0)
+        var = np.sum(((t - t_mean) * valid) ** 2, axis=0)
+        out["slope"][...] = np.where((n >= 2) & (var > 0), cov / var, np.nan)
+
+
+def minmax_normalize(stack, out, core):
+    """
+    Kernel: each year scaled to 0-1 between the pixel's multi-year min and max
+    (as in the WSI normalization). Output: "normalized" with leading shape (time,).
+    """
+    values = stack[:, core[0], core[1]]
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # Pixels that are NoData every year stay NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        low = np.nanmin(values, axis=0)
+        high = np.nanmax(values, axis=0)
+        out["normalized"][...] = np.where(high > low, (values - low) / (high - low), np.nan)
+
+
+def gradient_magnitude(stack, out, core, sigma=1.0):
+    """
+    Kernel: Gaussian gradient magnitude of each year (run with halo >= 4 * sigma
+    to match the whole-raster result). Output: "gradient" with leading shape (time,).
+    """
+    from scipy.ndimage import gaussian_gradient_magnitude
+
+    for t in range(stack.shape[0]):
+        gradient = gaussian_gradient_magnitude(stack[t].astype(np.float32), sigma=sigma)
+        out["gradient"][t] = gradient[core]
+
+
+def save_output(array, grid, output_tif_path):
+    """
+    Writes a (row, col) or (band, row, col) result on the stack's grid as a float32 GeoTIFF.
+    """
+    array = array if array.ndim == 3 else array[None]
+    profile = {
+        "driver": "GTiff",
+        "height": grid["height"],
+        "width": grid["width"],
+        "count": array.shape[0],
+        "dtype": "float32",
+        "crs": grid["crs"],
+        "transform": grid["transform"],
+        "nodata": np.nan,
+        "compress": "lzw"
+    }
+    os.makedirs(os.path.dirname(output_tif_path) or '.', exist_ok=True)
+    with rasterio.open(output_tif_path, 'w', **profile) as dst:
+        dst.write(array.astype(np.float32))
+    print(f"Saved {output_tif_path}")
+
+# How to use the tile executor:
+# - stack = load_stack(sorted(glob("data/.../*R.tif"))); the decoded years live once in shared memory.
+# - run_tiles(linear_trend, stack, {"slope": np.float32}, params={"times": years}) gives the per-pixel trend.
+# - Kernels only see views: write the results into out[...] in place, never return them.
+# - release(stack) when done; stacks above the memory budget are temporary memmaps instead.
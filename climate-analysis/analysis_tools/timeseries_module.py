@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import warnings
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+from rasterio.windows import Window
+from rasterio.warp import transform as warp_transform
+from .alignment_module import make_grid
+from .raster_io_module import invalid_mask, SENTINEL_NODATA
+
+DEFAULT_STORE_DIR = os.path.join('data', 'processed', 'timeseries')
+
+# Rows read from each yearly raster at once while building a store
+_ROW_BLOCK = 256
+
+
+def year_of(file_path):
+    """
+    Year in a raster file name (e.g. 2010 from "2010R.tif" or "2010_GP.tif").
+    """
+    match = re.search(r'(\d{4})', os.path.basename(file_path))
+    if match is None:
+        raise ValueError(f"No year in the file name {file_path}")
+    return int(match.group(1))
+
+
+def _fill_value(dtype, nodata):
+    if np.issubdtype(dtype, np.floating):
+        return np.nan
+    if nodata is not None:
+        return nodata
+    return np.iinfo(dtype).max
+
+
+def _sources(raster_files):
+    return [
+        {"path": os.path.abspath(path), "size": os.path.getsize(path), "mtime": os.path.getmtime(path)}
+        for path in raster_files
+    ]
+
+
+def build_store(raster_files, product, store_dir=DEFAULT_STORE_DIR, no_data_values=(SENTINEL_NODATA,),
+                force=False):
+    """
+    Stacks yearly rasters of one product into a (row, col, time) array on
+    disk, so the whole history of a pixel is one contiguous read. The store
+    is rebuilt only when the list of files or one of them changed.
+
+    Parameters:
+    - raster_files: Yearly rasters on the same grid (e.g. 2010R.tif ... 2023R.tif).
+    - product: Store name (e.g. "precipitation", "gpp").
+    - store_dir: Parent directory of the stores.
+    - no_data_values: Extra values stored as NoData (the file's nodata always is).
+    - force: Rebuild even if the store is up to date.
+
+    Returns:
+    - Path of the store directory.
+    """
+    raster_files = sorted(raster_files, key=year_of)
+    path = os.path.join(store_dir, product)
+    meta_path = os.path.join(path, 'meta.json')
+    sources = _sources(raster_files)
+    if not force and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get("sources") == sources:
+                return path
+
+    with rasterio.open(raster_files[0]) as src:
+        grid = make_grid(src.crs, src.transform, src.width, src.height)
+        dtype = np.dtype(src.dtypes[0])
+        fill = _fill_value(dtype, src.nodata)
+
+    os.makedirs(path, exist_ok=True)
+    values_path = os.path.join(path, 'values.npy')
+    values = np.lib.format.open_memmap(
+        values_path + '.tmp', mode='w+', dtype=dtype, shape=(grid["height"], grid["width"], len(raster_files))
+    )
+    for t, file_path in enumerate(raster_files):
+        with rasterio.open(file_path) as src:
+            if (src.width, src.height) != (grid["width"], grid["height"]) or src.transform != grid["transform"]:
+                raise ValueError(f"{file_path} is not on the grid of {raster_files[0]}")
+            for row in range(0, grid["height"], _ROW_BLOCK):
+                rows = min(_ROW_BLOCK, grid["height"] - row)
+                block = src.read(1, window=Window(0, row, grid["width"], rows))
+                block = np.where(invalid_mask(block, (src.nodata,) + tuple(no_data_values)), fill, block)
+                values[row:row + rows, :, t] = block
+    values.flush()
+    del values
+    os.replace(values_path + '.tmp', values_path)
+
+    meta = {
+        "product": product,
+        "times": [year_of(f) for f in raster_files],
+        "crs": grid["crs"].to_wkt(),
+        "transform": list(grid["transform"])[:6],
+        "width": grid["width"],
+        "height": grid["height"],
+        "dtype": dtype.str,
+        "fill": None if isinstance(fill, float) and np.isnan(fill) else fill,
+        "sources": sources
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1, default=float)
+    print(f"Built {product} time-series store ({len(raster_files)} times) in {path}")
+    return path
+
+
+def open_store(path):
+    """
+    Opens a store read-only (memory-mapped: only the queried pixels are read).
+
+    Returns:
+    - Dictionary with the grid (crs, transform, width, height), times, fill and values.
+    """
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    store = make_grid(meta["crs"], meta["transform"], meta["width"], meta["height"])
+    store.update(
+        product=meta["product"],
+        times=np.asarray(meta["times"]),
+        fill=np.nan if meta["fill"] is None else meta["fill"],
+        values=np.load(os.path.join(path, 'values.npy'), mmap_mode='r')
+    )
+    return store
+
+
+def points_to_pixels(store, lons, lats):
+    """
+    Pixel (row, col) of many lon/lat points at once.
+
+    Returns:
+    - rows, cols: int arrays (-1 for points outside the grid).
+    """
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    xs, ys = lons, lats
+    if not store["crs"].is_geographic:
+        xs, ys = warp_transform("EPSG:4326", store["crs"], lons, lats)
+    cols, rows = ~store["transform"] * (np.asarray(xs, dtype=float), np.asarray(ys, dtype=float))
+    cols = np.floor(cols).astype(np.int64)
+    rows = np.floor(rows).astype(np.int64)
+    inside = (cols >= 0) & (cols < store["width"]) & (rows >= 0) & (rows < store["height"])
+    return np.where(inside, rows, -1), np.where(inside, cols, -1)
+
+
+def _as_float(values, fill):
+    values = values.astype(np.float64)
+    if not (isinstance(fill, float) and np.isnan(fill)):
+        values[values == fill] = np.nan
+    return values
+
+
+def point_series(store, lons, lats):
+    """
+    Full time series of the pixels under many points in one call.
+
+    Returns:
+    - (n_points, n_times) float array, NaN for NoData and points outside the grid.
+    """
+    rows, cols = points_to_pixels(store, lons, lats)
+    inside = rows >= 0
+    result = np.full((rows.size, len(store["times"])), np.nan)
+    if inside.any():
+        # Sorting by pixel keeps the memory-mapped reads in file order
+        order = np.argsort(rows[inside] * store["width"] + cols[inside])
+        index = np.flatnonzero(inside)[order]
+        result[index] = _as_float(store["values"][rows[index], cols[index], :], store["fill"])
+    return result
+
+
+def polygon_series(store, geometries, statistic="mean"):
+    """
+    Time series of the pixels inside each (small) polygon.
+
+    Parameters:
+    - store: Store from open_store.
+    - geometries: GeoJSON-like polygons (or shapely geometries) in lon/lat.
+    - statistic: "mean", "median", "min", "max" or "sum" over the valid pixels.
+
+    Returns:
+    - (n_polygons, n_times) float array.
+    """
+    from rasterio.features import geometry_mask
+    from rasterio.warp import transform_geom
+
+    reducers = {"mean": np.nanmean, "median": np.nanmedian, "min": np.nanmin, "max": np.nanmax, "sum": np.nansum}
+    reduce = reducers[statistic]
+    result = np.full((len(geometries), len(store["times"])), np.nan)
+    for i, geometry in enumerate(geometries):
+        if hasattr(geometry, "__geo_interface__"):
+            geometry = geometry.__geo_interface__
+        if not store["crs"].is_geographic:
+            geometry = transform_geom("EPSG:4326", store["crs"], geometry)
+
+        # Pixel window around the polygon, clipped to the grid
+        coords = np.array(_flatten_coords(geometry["coordinates"]), dtype=float)
+        cols, rows = ~store["transform"] * (coords[:, 0], coords[:, 1])
+        col0, col1 = max(int(np.floor(np.min(cols))), 0), min(int(np.ceil(np.max(cols))), store["width"])
+        row0, row1 = max(int(np.floor(np.min(rows))), 0), min(int(np.ceil(np.max(rows))), store["height"])
+        if col1 <= col0 or row1 <= row0:
+            continue
+        window_transform = store["transform"] * Affine.translation(col0, row0)
+        shape = (row1 - row0, col1 - col0)
+        inside = geometry_mask([geometry], out_shape=shape, transform=window_transform, invert=True)
+        if not inside.any():
+            # Polygon smaller than a pixel: use the pixels it touches
+            inside = geometry_mask([geometry], out_shape=shape, transform=window_transform, invert=True,
+                                   all_touched=True)
+        pixel_rows, pixel_cols = np.nonzero(inside)
+        pixels = _as_float(store["values"][pixel_rows + row0, pixel_cols + col0, :], store["fill"])
+        with warnings.catch_warnings():
+            # Years where every pixel is NoData give NaN
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            result[i] = reduce(pixels, axis=0)
+    return result
+
+
+def _flatten_coords(coords):
+    if isinstance(coords[0], (int, float)):
+        return [coords[:2]]
+    flat = []
+    for part in coords:
+        flat.extend(_flatten_coords(part))
+    return flat
+
+
+def query_points(store_paths, lons, lats):
+    """
+    Time series of many sites across several products.
+
+    Parameters:
+    - store_paths: Dict of product -> store directory (from build_store).
+    - lons, lats: Site coordinates.
+
+    Returns:
+    - DataFrame with site, lon, lat, product, year, value.
+    """
+    import pandas as pd
+
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    frames = []
+    for product, path in store_paths.items():
+        store = open_store(path)
+        series = point_series(store, lons, lats)
+        sites, times = np.meshgrid(np.arange(lons.size), np.arange(len(store["times"])), indexing='ij')
+        frames.append(pd.DataFrame({
+            "site": sites.ravel(),
+            "lon": lons[sites.ravel()],
+            "lat": lats[sites.ravel()],
+            "product": product,
+            "year": store["times"][times.ravel()],
+            "value": series.ravel()
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+# How to use the time-series stores:
+# - Build once per product: build_store(sorted(glob("data/.../*R.tif")), "precipitation").
+# - point_series(open_store(path), lons, lats) returns one row per site, one column per year.
+# - Rebuilding is automatic when a yearly file is added or changes; queries never open the GeoTIFFs.
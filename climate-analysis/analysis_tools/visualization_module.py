@@ -1,10 +1,13 @@
 import os
-import numpy as np
-import rasterio
-import matplotlib.pyplot as plt
-from .stats_module import get_raster_stats, save_stats_to_csv
+from .stats_module import save_stats_to_csv
+from .raster_io_module import read_masked
+from .preview_module import preview_stats
+from .sidecar_module import raster_stats
 
-def visualize_raster(file_path, ax, no_data_value=65533, hist_output_dir=None):
+# Extra CSV columns of compare_rasters in preview mode
+PREVIEW_FIELDS = ["mean_low", "mean_high", "median_low", "median_high", "factor"]
+
+def visualize_raster(file_path, ax, no_data_value=65533, hist_output_dir=None, data=None):
     """
     Loads the raster and visualizes it on the subplot ax,
     WITHOUT saving or closing the figure.
@@ -15,41 +18,40 @@ def visualize_raster(file_path, ax, no_data_value=65533, hist_output_dir=None):
     - ax: Matplotlib subplot axis to plot the raster.
     - no_data_value: Value representing no data in the raster.
     - hist_output_dir: Directory to save the histogram (if not None).
+    - data: Masked array already read with read_masked (avoids reading the file again).
     """
-    with rasterio.open(file_path) as src:
-        data = src.read(1).astype(float)
-
-        # Handle NoData
-        if src.nodata is not None:
-            data[data == src.nodata] = np.nan
-        data[data == no_data_value] = np.nan
-
-        # If all NoData, exit and print warning
-        if np.isnan(data).all():
-            ax.set_title(f"{os.path.basename(file_path)} - ALL NODATA")
-            ax.axis('off')
-            return
-        
-        # Plot the raster
-        cax = ax.imshow(data, cmap='viridis', interpolation='none')
-        ax.set_title(os.path.basename(file_path))
-        plt.colorbar(cax, ax=ax, orientation='vertical', label='Value')
-
-        # Optional histogram
-        if hist_output_dir is not None:
-            os.makedirs(hist_output_dir, exist_ok=True)
-            valid_data = data[~np.isnan(data)].ravel()
-            plt.figure()
-            plt.hist(valid_data, bins=50, color='blue', alpha=0.7)
-            plt.title(f"Histogram - {os.path.basename(file_path)}")
-            plt.xlabel('Value')
-            plt.ylabel('Frequency')
-            hist_path = os.path.join(hist_output_dir, f"{os.path.basename(file_path)}_hist.png")
-            plt.savefig(hist_path, bbox_inches='tight')
-            plt.close()
-            print(f"Saved histogram to {hist_path}")
-
-def compare_rasters(file_paths, output_dir, comparison_title):
+    import matplotlib.pyplot as plt
+
+    # Native dtype with a NoData mask (no float64 copy)
+    if data is None:
+        data = read_masked(file_path, no_data_values=(no_data_value,))
+
+    # If all NoData, exit and print warning
+    if data.count() == 0:
+        ax.set_title(f"{os.path.basename(file_path)} - ALL NODATA")
+        ax.axis('off')
+        return
+
+    # Plot the raster (masked cells are transparent)
+    cax = ax.imshow(data, cmap='viridis', interpolation='none')
+    ax.set_title(os.path.basename(file_path))
+    plt.colorbar(cax, ax=ax, orientation='vertical', label='Value')
+
+    # Optional histogram
+    if hist_output_dir is not None:
+        os.makedirs(hist_output_dir, exist_ok=True)
+        valid_data = data.compressed()
+        plt.figure()
+        plt.hist(valid_data, bins=50, color='blue', alpha=0.7)
+        plt.title(f"Histogram - {os.path.basename(file_path)}")
+        plt.xlabel('Value')
+        plt.ylabel('Frequency')
+        hist_path = os.path.join(hist_output_dir, f"{os.path.basename(file_path)}_hist.png")
+        plt.savefig(hist_path, bbox_inches='tight')
+        plt.close()
+        print(f"Saved histogram to {hist_path}")
+
+def compare_rasters(file_paths, output_dir, comparison_title, target_accuracy=None):
     """
     Creates a single figure with side-by-side subplots to
     visualize the rasters in file_paths.
@@ -59,6 +61,10 @@ def compare_rasters(file_paths, output_dir, comparison_title):
     - file_paths: List of paths to raster files.
     - output_dir: Directory to save the output visualization and statistics.
     - comparison_title: Title for the comparison visualization.
+    - target_accuracy: If set (e.g. 0.01 = +-1% on the mean), preview mode:
+      plots and statistics come from the coarsest overview level meeting it
+      (see preview_module.preview_stats) and the CSV also has the confidence
+      intervals and the decimation factor.
     """
     import matplotlib.pyplot as plt  # for safety, local import
 
@@ -69,21 +75,26 @@ def compare_rasters(file_paths, output_dir, comparison_title):
     stats_list = []
 
     for ax, file_path in zip(axes, file_paths):
-        with rasterio.open(file_path) as src:
-            data = src.read(1).astype(float)
-            if src.nodata is not None:
-                data[data == src.nodata] = np.nan
-            data[data == 65533] = np.nan
+        if target_accuracy is None:
+            data = read_masked(file_path, no_data_values=(65533,))
+            # Same values as get_raster_stats(data), reused from the .aux.xml sidecar when valid
+            stats = raster_stats(file_path, no_data_values=(65533,), data=data)
+            stats = {key: stats[key] for key in ("min", "max", "mean", "median")}
+        else:
+            preview = preview_stats(file_path, target=target_accuracy, no_data_values=(65533,))
+            data = preview["data"]
+            stats = {key: preview[key] for key in ("min", "max", "mean", "median", "factor")}
+            stats["mean_low"], stats["mean_high"] = preview["mean_ci"]
+            stats["median_low"], stats["median_high"] = preview["median_ci"]
 
         # Visualization
         visualize_raster(
             file_path, 
             ax, 
-            hist_output_dir=os.path.join(output_dir, "histograms")
+            hist_output_dir=os.path.join(output_dir, "histograms"),
+            data=data
         )
-        
-        # Calculate statistics
-        stats = get_raster_stats(data)
+
         stats_list.append({
             "filename": os.path.basename(file_path),
             **stats
@@ -100,7 +111,10 @@ def compare_rasters(file_paths, output_dir, comparison_title):
     # Save CSV with statistics
     csv_filename = f"{comparison_title}_stats.csv"
     csv_path = os.path.join(output_dir, "stats", csv_filename)
-    save_stats_to_csv(csv_path, stats_list)
+    fieldnames = None
+    if target_accuracy is not None:
+        fieldnames = ["filename", "min", "max", "mean", "median"] + PREVIEW_FIELDS
+    save_stats_to_csv(csv_path, stats_list, fieldnames)
 
     print(f"Saved CSV stats to {csv_path}")
 
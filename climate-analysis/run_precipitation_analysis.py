@@ -3,6 +3,8 @@ import re
 import csv
 import numpy as np
 import rasterio
+from analysis_tools.raster_io_module import read_masked, masked_mean
+from analysis_tools.preview_module import preview_time_series
 
 def raster_difference(file_path1, file_path2, output_tif_path):
     """
@@ -13,37 +15,35 @@ def raster_difference(file_path1, file_path2, output_tif_path):
     - Valori positivi => il secondo raster (es. un anno più recente) ha valori più alti.
     - Valori negativi => c'è stata una diminuzione rispetto al primo.
     """
-    with rasterio.open(file_path1) as src1, rasterio.open(file_path2) as src2:
-        data1 = src1.read(1).astype(float)
-        data2 = src2.read(1).astype(float)
-        
-        # Gestione del nodata
-        nodata1 = src1.nodata
-        nodata2 = src2.nodata
-        if nodata1 is not None:
-            data1[data1 == nodata1] = np.nan
-        if nodata2 is not None:
-            data2[data2 == nodata2] = np.nan
-        
-        # Differenza
-        diff_data = data2 - data1
+    # Dtype nativo con maschera del nodata (nessuna copia float64)
+    data1 = read_masked(file_path1, no_data_values=())
+    data2 = read_masked(file_path2, no_data_values=())
+
+    # Differenza in float32 (float64 solo se i dati lo richiedono, es. int32)
+    diff_dtype = np.promote_types(np.float32, np.promote_types(data1.dtype, data2.dtype))
+    diff_data = data2.astype(diff_dtype) - data1.astype(diff_dtype)
 
-        # Crea il profilo per il raster di output
+    # Crea il profilo per il raster di output
+    with rasterio.open(file_path1) as src1:
         profile = src1.profile
-        profile.update(dtype=rasterio.float32, count=1, compress='lzw', nodata=np.nan)
+    profile.update(dtype=rasterio.float32, count=1, compress='lzw', nodata=np.nan)
 
-        # Salva il raster di differenza
-        with rasterio.open(output_tif_path, 'w', **profile) as dst:
-            dst.write(diff_data.astype(np.float32), 1)
+    # Salva il raster di differenza (NaN dove uno dei due è nodata)
+    with rasterio.open(output_tif_path, 'w', **profile) as dst:
+        dst.write(diff_data.astype(np.float32).filled(np.nan), 1)
     
     print(f"Salvato il raster di differenza in: {output_tif_path}")
 
 
-def calculate_time_series(raster_files, north_bounds, center_bounds, south_bounds):
+def calculate_time_series(raster_files, north_bounds, center_bounds, south_bounds, target_accuracy=None):
     """
     Calcola la media (overall, north, center, south) per ciascun file raster.
     I bound devono essere specificati come tuple (min_row, max_row, min_col, max_col)
     in coordinate di pixel (o geografiche, se la funzione è strutturata per gestirle).
+
+    Con target_accuracy (es. 0.01 = +-1% sulla media) le medie sono approssimate
+    da una lettura decimata (preview_module.preview_time_series) e ogni dict
+    contiene anche factor e gli intervalli di confidenza (<zona>_mean_low/_high).
     
     Ritorna una lista di dizionari, uno per ciascun raster:
         {
@@ -57,32 +57,33 @@ def calculate_time_series(raster_files, north_bounds, center_bounds, south_bound
     def calculate_mean(data, bounds):
         min_row, max_row, min_col, max_col = bounds
         zone_data = data[min_row:max_row, min_col:max_col]
-        return np.nanmean(zone_data)
+        return masked_mean(zone_data)
+
+    if target_accuracy is not None:
+        zones = {"north": north_bounds, "center": center_bounds, "south": south_bounds}
+        return preview_time_series(raster_files, zones, target=target_accuracy)
 
     results = []
     for f in raster_files:
-        with rasterio.open(f) as src:
-            data = src.read(1).astype(float)
-            # Gestione nodata
-            if src.nodata is not None:
-                data[data == src.nodata] = np.nan
-
-            overall_mean = np.nanmean(data)
-            north_mean = calculate_mean(data, north_bounds)
-            center_mean = calculate_mean(data, center_bounds)
-            south_mean = calculate_mean(data, south_bounds)
-
-            results.append({
-                "filename": os.path.basename(f),
-                "overall_mean": overall_mean,
-                "north_mean": north_mean,
-                "center_mean": center_mean,
-                "south_mean": south_mean
-            })
+        # Gestione nodata: maschera sul dtype nativo
+        data = read_masked(f, no_data_values=())
+
+        overall_mean = masked_mean(data)
+        north_mean = calculate_mean(data, north_bounds)
+        center_mean = calculate_mean(data, center_bounds)
+        south_mean = calculate_mean(data, south_bounds)
+
+        results.append({
+            "filename": os.path.basename(f),
+            "overall_mean": overall_mean,
+            "north_mean": north_mean,
+            "center_mean": center_mean,
+            "south_mean": south_mean
+        })
     return results
 
 
-if __name__ == "__main__":
+def main():
     """
     Esempio di utilizzo completo:
       - Definizione dei bounding box (in pixel),
@@ -152,3 +153,7 @@ if __name__ == "__main__":
     #     "data/Datasets_Hackathon/Climate_Precipitation_Data/2023R.tif",
     #     "difference_2023_minus_2010.tif"
     # )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Single entry point for the project scripts.
+
+Each subcommand imports its module only when it runs, so heavy libraries
+(matplotlib, seaborn, cartopy, geopandas, Earth Engine) are loaded only by
+the commands that need them.
+
+Examples:
+    python g20.py -C data pipeline --workers 4
+    python g20.py dbf data/Datasets_Hackathon/Admin_layers --format parquet
+    python g20.py ingest copernicus_downloads --bbox -10.5 16.0 -4.0 22.0
+    python g20.py import-times
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRS = ['climate-analysis', 'src/analysis', 'src/utils', 'wsi_calculation', 'benchmarks']
+
+# name: (source directory, module, help, plotting, passes argv)
+# Commands run in the current directory (or the one given with -C), as the scripts do.
+COMMANDS = {
+    "precipitation-stats": ("climate-analysis", "run_precipitation_analysis",
+                            "Mean precipitation per year and zone to precipitation_results.csv", False, False),
+    "pipeline": ("src/analysis", "functioncall",
+                 "Comparisons, difference, time series, WSI and gradients (cached pipeline)", True, True),
+    "gradient": ("wsi_calculation", "calculate_precipitation_gradient",
+                 "Precipitation gradient rasters for every year", False, False),
+    "wsi": ("wsi_calculation", "calculate_wsi", "Water Stress Index from precipitation_results.csv", False, False),
+    "nasa-power": ("src/analysis", "data", "NASA POWER grid download, heatmaps and time series", True, False),
+    "power-adaptive": ("src/analysis", "power_adaptive",
+                       "Adaptive NASA POWER sampling under a request budget", False, True),
+    "power-maps": ("src/analysis", "power_interp", "Interpolate the NASA POWER grid to GeoTIFFs (IDW/Gaussian)", False, True),
+    "vector-maps": ("src/analysis", "Plot_vectorfiles", "Maps of the road, stream and admin layers", True, False),
+    "region-charts": ("src/analysis", "visualize_data", "Bar charts of the Assaba regions", True, False),
+    "era5": ("src/utils", "grid", "Download and plot ERA5 temperature", True, False),
+    "gee-exports": ("src/utils", "gee", "Yearly EVI exports from Earth Engine", False, False),
+    "gee-stats": ("src/utils", "test", "Annual EVI/LAI/precipitation table and map from Earth Engine", True, False),
+    "copernicus": ("src/utils", "copernicus", "Request and download Copernicus Season Maximum Value", False, False),
+    "catalog": ("src/utils", "uid", "Refresh and search the local Copernicus catalog", False, False),
+    "soil": ("src/utils", "soilgrids", "SoilGrids properties for the Assaba sites", False, False),
+    "dbf": ("src/utils", "read_dbf", "Convert DBF attribute tables", False, True),
+    "ingest": ("src/utils", "ingest", "Clip large rasters to the region of interest with windowed reads", False, True),
+    "benchmark": ("benchmarks", "bench_analysis", "Benchmarks of the raster analysis functions", False, True)
+}
+
+# Seconds allowed to import the module of a non-plotting command
+IMPORT_BUDGET_S = 0.5
+
+
+def setup_path():
+    for directory in SOURCE_DIRS:
+        path = os.path.join(REPO_ROOT, directory)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def run_command(name, argv):
+    import importlib
+
+    setup_path()
+    _, module_name, _, _, passes_argv = COMMANDS[name]
+    module = importlib.import_module(module_name)
+    if passes_argv:
+        return module.main(argv)
+    if argv:
+        raise SystemExit(f"{name} takes no arguments (got {' '.join(argv)})")
+    return module.main()
+
+
+def measure_import_time(module_name, repeat=3):
+    """
+    Best-of-repeat time to import a module in a fresh interpreter.
+    """
+    code = (
+        "import sys, time\n"
+        f"sys.path[:0] = {[os.path.join(REPO_ROOT, d) for d in SOURCE_DIRS]!r}\n"
+        "start = time.perf_counter()\n"
+        f"import {module_name}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed"
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(times), None
+
+
+def slowest_imports(module_name, top=8):
+    """
+    The modules imported directly by module_name that take the longest to
+    import, children included (from python -X importtime).
+    """
+    code = f"import sys; sys.path[:0] = {[os.path.join(REPO_ROOT, d) for d in SOURCE_DIRS]!r}; import {module_name}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    direct = []
+    # importtime lists children before their parent, indented two spaces per level
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        package = parts[2].rstrip()
+        depth = (len(package) - len(package.lstrip()) - 1) // 2
+        if depth == 1:
+            direct.append((int(parts[1]) / 1e6, package.strip()))
+        elif depth == 0:
+            if package.strip() == module_name:
+                return sorted(direct, reverse=True)[:top]
+            direct = []
+    return []
+
+
+def import_times(budget=IMPORT_BUDGET_S, names=None, detail=False):
+    """
+    Prints the import time of each command module and checks the non-plotting
+    ones against the budget.
+
+    Returns:
+    - Number of commands over budget (or failing to import).
+    """
+    over = 0
+    for name in names or sorted(COMMANDS):
+        _, module_name, _, plotting, _ = COMMANDS[name]
+        seconds, error = measure_import_time(module_name)
+        if error is not None:
+            print(f"{name:20} {module_name:34}   import failed: {error}")
+            if not plotting:
+                over += 1
+            continue
+        flag = ""
+        if not plotting and seconds > budget:
+            flag = f"  <-- over budget ({budget:.2f} s)"
+            over += 1
+        print(f"{name:20} {module_name:34} {seconds * 1000:8.1f} ms{'  (plots)' if plotting else ''}{flag}")
+        if detail and flag:
+            for cumulative, package in slowest_imports(module_name):
+                print(f"{'':24}{package:30} {cumulative * 1000:8.1f} ms")
+    return over
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(
+        description="G20 restoration analysis commands.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:20} {info[2]}" for name, info in sorted(COMMANDS.items()))
+        + f"\n  {'import-times':20} Import time of each command against the budget"
+    )
+    parser.add_argument("-C", dest="workdir", default=None, help="Run in this directory")
+    parser.add_argument("command", choices=sorted(COMMANDS) + ["import-times"], metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the command")
+    args = parser.parse_args(argv)
+
+    if args.workdir:
+        os.chdir(args.workdir)
+
+    if args.command == "import-times":
+        sub = argparse.ArgumentParser(prog="g20.py import-times")
+        sub.add_argument("--budget", type=float, default=IMPORT_BUDGET_S, help="Seconds per non-plotting command")
+        sub.add_argument("--detail", action="store_true", help="Show the slowest imports of commands over budget")
+        sub.add_argument("names", nargs="*", help="Commands to check (default: all)")
+        sub_args = sub.parse_args(args.args)
+        unknown = sorted(set(sub_args.names) - set(COMMANDS))
+        if unknown:
+            sub.error(f"unknown commands: {', '.join(unknown)}")
+        return 1 if import_times(sub_args.budget, sub_args.names, sub_args.detail) else 0
+
+    start = time.perf_counter()
+    result = run_command(args.command, args.args)
+    print(f"{args.command} finished in {time.perf_counter() - start:.1f} s")
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,7 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import rasterio
-from rasterio.plot import show
 import numpy as np
 import os
+from vector_cache import load_vector_layer
 
 def generate_uniform_raster(tiff_path, output_path, fill_value=1):
     """
@@ -36,6 +34,9 @@ def plot_shapefiles_with_existing_outline(shp_folder_path, outline_raster_path,
     - outline_raster_path: Path to the outline raster file.
     - output_folder: Folder to save the output plots.
     """
+    import matplotlib.pyplot as plt
+    from rasterio.plot import show
+
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
@@ -50,14 +51,10 @@ def plot_shapefiles_with_existing_outline(shp_folder_path, outline_raster_path,
 
         # Open the outline raster
         with rasterio.open(outline_raster_path) as src:
-            rasterio.plot.show(src, ax=ax, cmap='gray', alpha=0.5)
-
-        # Read shapefile
-        gdf = gpd.read_file(shp_file)
+            show(src, ax=ax, cmap='gray', alpha=0.5)
 
-        # Convert shapefile CRS to raster CRS
-        if gdf.crs != raster_crs:
-            gdf = gdf.to_crs(raster_crs)
+        # Read shapefile, already projected to the raster CRS, from the vector cache
+        gdf = load_vector_layer(shp_file, raster_crs)
 
         # Plot shapefile with distinction if available
         if 'TYPE' in gdf.columns:
@@ -80,16 +77,21 @@ def plot_shapefiles_with_existing_outline(shp_folder_path, outline_raster_path,
         plt.savefig(output_path, bbox_inches='tight', dpi=300)
         plt.close(fig)
 
-# Example usage
-shp_folder_path = 'Datasets_Hackathon/Streamwater_Line_Road_Network'
-raster_file = 'Datasets_Hackathon/Modis_Land_Cover_Data/2010LCT.tif'
-output_maps_folder = 'mappe_output'
-outline_path = os.path.join(output_maps_folder, 'outline_raster.tif')
-admin_layers_path = "Datasets_Hackathon/Admin_layers"
+def main():
+    # Example usage
+    shp_folder_path = 'Datasets_Hackathon/Streamwater_Line_Road_Network'
+    raster_file = 'Datasets_Hackathon/Modis_Land_Cover_Data/2010LCT.tif'
+    output_maps_folder = 'mappe_output'
+    outline_path = os.path.join(output_maps_folder, 'outline_raster.tif')
+    admin_layers_path = "Datasets_Hackathon/Admin_layers"
+
+    # Generate uniform raster
+    os.makedirs(output_maps_folder, exist_ok=True)
+    generate_uniform_raster(raster_file, outline_path)
 
-# Generate uniform raster
-generate_uniform_raster(raster_file, outline_path)
+    # Plot and save each shapefile separately
+    plot_shapefiles_with_existing_outline(shp_folder_path, outline_path, output_maps_folder)
+    plot_shapefiles_with_existing_outline(admin_layers_path, outline_path, output_maps_folder)
 
-# Plot and save each shapefile separately
-plot_shapefiles_with_existing_outline(shp_folder_path, outline_path, output_maps_folder)
-plot_shapefiles_with_existing_outline(admin_layers_path, outline_path, output_maps_folder)
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
 #!/usr/bin/env python
 import requests
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import pickle
+from power_grid import (make_store, save_store, load_store, store_from_dataframe, store_to_dataframe,
+                        set_point, field, regional_mean, param_index)
+try:
+    from analysis_tools.instrumentation_module import start_run, finish_run, stage
+except ImportError:
+    # Run as a plain script (without g20.py's path setup): no instrumentation
+    import contextlib
+
+    def start_run(run_name, report_path=None, profile=None):
+        pass
+
+    def finish_run():
+        return None
+
+    def stage(name, kind="compute"):
+        return contextlib.nullcontext()
 
 
 def fetch_nasa_power_data(lat, lon, start_date, end_date, parameters):
@@ -69,7 +82,7 @@ def build_grid(lon_min, lon_max, lat_min, lat_max, spacing):
     return lats, lons
 
 
-def main():
+def run_grid_analysis():
     # Define the region for Mauritania's Sahel.
     # For this example, we use: longitude from -17 to -4, latitude from 15 to 24.
     lon_min, lon_max = -17, -4
@@ -85,76 +98,67 @@ def main():
     param_list = ["T2M", "PRECTOTCORR", "ALLSKY_SFC_SW_DWN", "WS10M", "RH2M"]
     # Note: T2M is returned in Celsius from NASA POWER.
 
-    # Data will be stored in a list of dictionaries.
-    records = []
-
-    # Define a pickle filename to save/load the DataFrame.
+    # Grid results are kept in one (year, lat, lon, parameter) array (see power_grid.py),
+    # saved as a compressed .npz. The old pickle of the DataFrame is still read if present.
+    store_file = "../data/plots/nasa_power_grid_data.npz"
     pickle_file = "../data/plots/nasa_power_grid_data.pkl"
 
-    if os.path.exists(pickle_file):
+    if os.path.exists(store_file):
+        print("Loading grid data from", store_file)
+        with stage("load store", "read"):
+            store = load_store(store_file)
+    elif os.path.exists(pickle_file):
         print("Loading grid data from pickle file.")
-        with open(pickle_file, "rb") as f:
-            df = pickle.load(f)
+        with stage("load pickle", "read"), open(pickle_file, "rb") as f:
+            store = store_from_dataframe(pickle.load(f), param_list)
         # Check if T2M values are in Celsius (e.g., if min value < 0) and add 273 if needed.
-        if df["T2M"].min() < 0:
+        t2m = store["values"][..., param_index(store, "T2M")]
+        if np.nanmin(t2m) < 0:
             print("Detected T2M values in Celsius. Converting to Kelvin by adding 273.")
-            df["T2M"] = df["T2M"] + 273
+            t2m += 273
+        save_store(store, store_file)
+        print(f"Saved grid data as {store_file}")
     else:
         print("Building grid data from API for years", years)
         lats, lons = build_grid(lon_min, lon_max, lat_min, lat_max, spacing)
-        total_points = len(lats) * len(lons)
+        store = make_store(years, lats, lons, param_list)
+        total = store["values"].shape[0] * len(lats) * len(lons)
         count = 0
-        for year in years:
-            for lat in lats:
-                for lon in lons:
-                    try:
-                        means = get_annual_means_for_point(lat, lon, param_list, year)
-                        # **IMPORTANT**: Add 273 to T2M to convert from Celsius to Kelvin.
-                        means["T2M"] = means["T2M"] + 273
-                        records.append({
-                            "year": year,
-                            "latitude": lat,
-                            "longitude": lon,
-                            "T2M": means["T2M"],
-                            "PRECTOTCORR": means["PRECTOTCORR"],
-                            "ALLSKY_SFC_SW_DWN": means["ALLSKY_SFC_SW_DWN"],
-                            "WS10M": means["WS10M"],
-                            "RH2M": means["RH2M"]
-                        })
-                        count += 1
-                        print(f"Processed ({lat},{lon}) for {year} [{count}/{total_points * len(years)}]")
-                    except Exception as e:
-                        print(f"Error at ({lat},{lon}) for {year}: {e}")
-                        records.append({
-                            "year": year,
-                            "latitude": lat,
-                            "longitude": lon,
-                            "T2M": np.nan,
-                            "PRECTOTCORR": np.nan,
-                            "ALLSKY_SFC_SW_DWN": np.nan,
-                            "WS10M": np.nan,
-                            "RH2M": np.nan
-                        })
-        df = pd.DataFrame(records)
-        # Save as CSV (optional)
-        csv_file = "../data/plots/nasa_power_grid_data.csv"
-        df.to_csv(csv_file, index=False)
-        print(f"Saved grid data as CSV to {csv_file}")
-        # Save DataFrame as a pickle file for quick reaccess later.
-        with open(pickle_file, "wb") as f:
-            pickle.dump(df, f)
-        print(f"Saved grid data as pickle to {pickle_file}")
+        for y, year in enumerate(years):
+            with stage(f"fetch {year}", "http"):
+                for i, lat in enumerate(lats):
+                    for j, lon in enumerate(lons):
+                        try:
+                            means = get_annual_means_for_point(lat, lon, param_list, year)
+                            # **IMPORTANT**: Add 273 to T2M to convert from Celsius to Kelvin.
+                            means["T2M"] = means["T2M"] + 273
+                            set_point(store, year, lat, lon, means)
+                            count += 1
+                            print(f"Processed ({lat},{lon}) for {year} [{count}/{total}]")
+                        except Exception as e:
+                            # The point stays NaN in the store
+                            print(f"Error at ({lat},{lon}) for {year}: {e}")
+        with stage("save grid data", "write"):
+            save_store(store, store_file)
+            print(f"Saved grid data as {store_file}")
+            # Save as CSV (optional)
+            csv_file = "../data/plots/nasa_power_grid_data.csv"
+            store_to_dataframe(store).to_csv(csv_file, index=False)
+            print(f"Saved grid data as CSV to {csv_file}")
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     # --------------------------
     # Visualization 1: Heatmaps for each parameter for year 2022.
     # --------------------------
-    def create_heatmap(df, year, variable, title, out_file=None):
-        df_year = df[df["year"] == year]
-        heatmap_data = df_year.pivot(index="latitude", columns="longitude", values=variable)
-        # Sort latitudes in descending order for proper orientation.
-        heatmap_data = heatmap_data.sort_index(ascending=False)
+    def create_heatmap(store, year, variable, title, out_file=None):
+        # Latitudes in descending order for proper orientation.
+        heatmap_data = field(store, year, variable)[::-1]
         plt.figure(figsize=(8, 6))
         ax = sns.heatmap(heatmap_data, cmap="coolwarm", annot=True, fmt=".1f",
+                         xticklabels=[f"{lon:g}" for lon in store["lons"]],
+                         yticklabels=[f"{lat:g}" for lat in store["lats"][::-1]],
                          cbar_kws={"label": f"{variable}"})
         plt.title(title)
         plt.xlabel("Longitude")
@@ -165,19 +169,20 @@ def main():
             print(f"Saved heatmap as {out_file}")
         plt.show()
 
-    import seaborn as sns
     selected_year = 2022
     for param in param_list:
-        create_heatmap(df, selected_year, param, f"Mean {param} in {selected_year}")
+        with stage("heatmap", "render"):
+            create_heatmap(store, selected_year, param, f"Mean {param} in {selected_year}")
 
     # --------------------------
     # Visualization 2: Time series for each parameter separately.
     # --------------------------
     # For each parameter, compute the regional (grid-average) annual mean and plot the time series.
     for param in param_list:
-        regional = df.groupby("year")[param].mean().reset_index()
+        with stage("regional mean", "compute"):
+            regional = regional_mean(store, param)
         plt.figure(figsize=(8, 5))
-        sns.lineplot(data=regional, x="year", y=param, marker="o")
+        sns.lineplot(x=store["years"], y=regional, marker="o")
         plt.title(f"Regional Mean {param} (2013-2022)")
         plt.xlabel("Year")
         if param == "T2M":
@@ -193,10 +198,19 @@ def main():
         plt.grid(True)
         plt.tight_layout()
         out_file = f"regional_time_series_{param}.png"
-        plt.savefig(out_file)
+        with stage("time series plot", "render"):
+            plt.savefig(out_file)
         print(f"Saved regional time series plot for {param} as {out_file}")
         plt.show()
 
 
+def main():
+    start_run("nasa_power_grid")
+    try:
+        run_grid_analysis()
+    finally:
+        finish_run()
+
+
 if __name__ == "__main__":
     main()
@@ -1,25 +1,185 @@
 import os
+import re
+import argparse
 import rasterio
 from analysis_tools.visualization_module import compare_rasters
-from analysis_tools.extra_analysis_module import raster_difference, calculate_time_series
+from analysis_tools.extra_analysis_module import calculate_time_series
+from analysis_tools.instrumentation_module import start_run, finish_run
+from analysis_tools.pipeline_module import make_stage, run_pipeline, print_summary
+from run_precipitation_analysis import raster_difference
+from calculate_precipitation_gradient import calculate_gradient
 import numpy as np
 import csv
-import matplotlib.pyplot as plt
 
-def compare_rasters_in_groups(file_paths, out_dir, base_title):
+def compare_group(file_paths, figure_path, stats_path, out_dir, title):
     """
-    Divide the list of files into groups of 3 and visualize them side-by-side.
+    Pipeline stage: one comparison figure (and its stats CSV) for a group of rasters.
+    figure_path and stats_path are the files compare_rasters writes, declared for the runner.
     """
-    for i in range(0, len(file_paths), 3):
-        group = file_paths[i:i+3]
-        if group:
-            group_title = f"{base_title} (Group {i//3 + 1})"
-            compare_rasters(group, out_dir, group_title)
+    compare_rasters(file_paths, out_dir, title)
 
-def main():
+def difference_to_csv(difference_tif, csv_path):
+    """
+    Pipeline stage: writes the valid pixels of a difference raster as (Row, Col, Difference).
+    """
+    with rasterio.open(difference_tif) as src:
+        diff_data = src.read(1)
+        diff_data[diff_data == src.nodata] = np.nan
+    rows, cols = np.nonzero(~np.isnan(diff_data))
+    with open(csv_path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Row", "Col", "Difference"])
+        writer.writerows(zip(rows.tolist(), cols.tolist(), diff_data[rows, cols].tolist()))
+    print(f"Saved difference data to {csv_path}")
+
+def difference_histogram(difference_tif, png_path, title):
+    """
+    Pipeline stage: histogram of the valid pixels of a difference raster.
+    """
+    import matplotlib.pyplot as plt
+
+    with rasterio.open(difference_tif) as src:
+        diff_data = src.read(1)
+        diff_data[diff_data == src.nodata] = np.nan
+    plt.figure()
+    plt.hist(diff_data[~np.isnan(diff_data)].flatten(), bins=50, edgecolor='black')
+    plt.xlabel('Difference')
+    plt.ylabel('Frequency')
+    plt.title(title)
+    plt.grid(True)
+    plt.savefig(png_path)
+    plt.close()
+
+def time_series_csv(raster_files, csv_path):
+    """
+    Pipeline stage: overall/north/center/south means per year (same columns as
+    precipitation_results.csv, so the WSI can be computed from it).
+    """
+    results = calculate_time_series(raster_files)
+    with open(csv_path, 'w', newline='') as csvfile:
+        fieldnames = ['year', 'filename', 'overall_mean', 'north_mean', 'center_mean', 'south_mean']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in results:
+            match = re.search(r'(\d{4})', result['filename'])
+            writer.writerow(dict(result, year=match.group(1) if match else "N/A"))
+    print(f"Saved precipitation trend to {csv_path}")
+
+def trend_plot(csv_path, png_path):
+    """
+    Pipeline stage: plot of the yearly mean precipitation.
+    """
+    import matplotlib.pyplot as plt
+
+    with open(csv_path, newline='') as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    plt.figure()
+    plt.plot([row['year'] for row in rows], [float(row['overall_mean']) for row in rows], marker='o')
+    plt.xlabel('Year')
+    plt.ylabel('Mean Precipitation')
+    plt.title('Precipitation Trend Over Years')
+    plt.grid(True)
+    plt.savefig(png_path)
+    plt.close()
+
+def wsi_raster(csv_path, wsi_tif):
+    """
+    Pipeline stage: Water Stress Index from the yearly means (see calculate_wsi.py).
+    """
+    import pandas as pd
+    from calculate_wsi import calculate_wsi, save_as_tiff
+
+    wsi_data = calculate_wsi(pd.read_csv(csv_path))
+    save_as_tiff(np.array(wsi_data['WSI']).reshape((len(wsi_data), 1)), wsi_tif)
+    print(f'WSI results saved to {wsi_tif}')
+
+def build_pipeline(climate_files, population_files, output_dir, climate_data_dir):
+    """
+    Declares the analysis stages with their input and output files.
+
+    Returns:
+    - List of stages for run_pipeline.
+    """
+    stages = []
+    for base_title, files in (("Climate Data Comparison", climate_files),
+                              ("Population Data Comparison", population_files)):
+        for i in range(0, len(files), 3):
+            title = f"{base_title} (Group {i//3 + 1})"
+            stages.append(make_stage(
+                title, compare_group,
+                inputs={"file_paths": files[i:i+3]},
+                outputs={
+                    "figure_path": os.path.join(output_dir, f"{title}.png"),
+                    "stats_path": os.path.join(output_dir, "stats", f"{title}_stats.csv")
+                },
+                params={"out_dir": output_dir, "title": title},
+                kind="render"
+            ))
+
+    # Difference between 2020 and 2010
+    difference_out = os.path.join(output_dir, "2020_minus_2010.tif")
+    stages.append(make_stage(
+        "difference 2020-2010", raster_difference,
+        inputs={
+            "file_path1": os.path.join(climate_data_dir, "2010R.tif"),
+            "file_path2": os.path.join(climate_data_dir, "2020R.tif")
+        },
+        outputs={"output_tif_path": difference_out}
+    ))
+    stages.append(make_stage(
+        "difference csv", difference_to_csv,
+        inputs={"difference_tif": difference_out},
+        outputs={"csv_path": os.path.join(output_dir, "difference_2020_2010.csv")},
+        kind="write"
+    ))
+    stages.append(make_stage(
+        "difference histogram", difference_histogram,
+        inputs={"difference_tif": difference_out},
+        outputs={"png_path": os.path.join(output_dir, "difference_histogram.png")},
+        params={"title": 'Histogram of Differences (2020 - 2010)'},
+        kind="render"
+    ))
+
+    # Time series of the mean precipitation, its plot and the WSI
+    trend_csv = os.path.join(output_dir, "precipitation_trend.csv")
+    stages.append(make_stage(
+        "time series", time_series_csv,
+        inputs={"raster_files": climate_files},
+        outputs={"csv_path": trend_csv}
+    ))
+    stages.append(make_stage(
+        "trend plot", trend_plot,
+        inputs={"csv_path": trend_csv},
+        outputs={"png_path": os.path.join(output_dir, "precipitation_trend.png")},
+        kind="render"
+    ))
+    stages.append(make_stage(
+        "wsi", wsi_raster,
+        inputs={"csv_path": trend_csv},
+        outputs={"wsi_tif": os.path.join(output_dir, "wsi_results.tiff")}
+    ))
+
+    # Precipitation gradient per year
+    for input_tif in climate_files:
+        year = os.path.basename(input_tif).split('R')[0]
+        stages.append(make_stage(
+            f"gradient {year}", calculate_gradient,
+            inputs={"input_tif": input_tif},
+            outputs={"output_tif": os.path.join(output_dir, "gradients", f"{year}_precipitation_gradient.tif")}
+        ))
+    return stages
+
+def main(argv=None):
     """
     Main function to execute the data visualization and analysis pipeline.
+    Only the stages whose inputs changed since the last run are re-executed.
     """
+    parser = argparse.ArgumentParser(description="Run the precipitation and population analysis pipeline.")
+    parser.add_argument("--force", action="store_true", help="Re-execute every stage")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Parallel stages")
+    args = parser.parse_args(argv)
+
+    start_run("functioncall")
     climate_data_dir = 'Datasets_Hackathon/Climate_Precipitation_Data'
     population_data_dir = 'Datasets_Hackathon/Gridded_Population_Density_Data'
     output_dir = 'visualizations'
@@ -37,66 +197,16 @@ def main():
         if f.endswith('.tif')
     ])
 
-    # 2. Visualize and compute statistics in groups of 3
-    compare_rasters_in_groups(climate_files, output_dir, "Climate Data Comparison")
-    compare_rasters_in_groups(population_files, output_dir, "Population Data Comparison")
-
-    # 3. Example of difference analysis (optional)
-    # If you want to calculate the difference between 2020 and 2010:
-    # (Assuming the presence of "2020R.tif" and "2010R.tif")
-    difference_out = os.path.join(output_dir, "2020_minus_2010.tif")
-    raster_difference(
-        file_path1=os.path.join(climate_data_dir, "2010R.tif"),
-        file_path2=os.path.join(climate_data_dir, "2020R.tif"),
-        output_tif_path=difference_out
-    )
-
-    # Read the difference raster and save to CSV
-    with rasterio.open(difference_out) as src:
-        diff_data = src.read(1)
-        diff_data[diff_data == src.nodata] = np.nan
-        rows, cols = diff_data.shape
-        csv_path = os.path.join(output_dir, "difference_2020_2010.csv")
-        with open(csv_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["Row", "Col", "Difference"])
-            for row in range(rows):
-                for col in range(cols):
-                    if not np.isnan(diff_data[row, col]):
-                        writer.writerow([row, col, diff_data[row, col]])
-        print(f"Saved difference data to {csv_path}")
-
-    # Generate histogram of differences
-    plt.hist(diff_data[~np.isnan(diff_data)].flatten(), bins=50, edgecolor='black')
-    plt.xlabel('Difference')
-    plt.ylabel('Frequency')
-    plt.title('Histogram of Differences (2020 - 2010)')
-    plt.grid(True)
-    plt.savefig(os.path.join(output_dir, "difference_histogram.png"))
-    plt.show()
-
-    # 4. Example of time series analysis (optional)
-    # If you want a global trend, calculate the mean over all years of precipitation:
-    results = calculate_time_series(climate_files)
-    
-    # Save results to CSV
-    csv_path = os.path.join(output_dir, "precipitation_trend.csv")
-    with open(csv_path, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["Filename", "Mean Precipitation"])
-        writer.writerows(results)
-    print(f"Saved precipitation trend to {csv_path}")
-
-    # Generate graph
-    years = [fname.split('R')[0] for fname, _ in results]
-    mean_values = [meanval for _, meanval in results]
-    plt.plot(years, mean_values, marker='o')
-    plt.xlabel('Year')
-    plt.ylabel('Mean Precipitation')
-    plt.title('Precipitation Trend Over Years')
-    plt.grid(True)
-    plt.savefig(os.path.join(output_dir, "precipitation_trend.png"))
-    plt.show()
+    # 2. Comparisons, difference, time series, WSI and gradients
+    stages = build_pipeline(climate_files, population_files, output_dir, climate_data_dir)
+    try:
+        status = run_pipeline(
+            stages, os.path.join(output_dir, "pipeline_state.json"),
+            workers=args.workers, force=args.force
+        )
+        print_summary(status)
+    finally:
+        finish_run()
 
 if __name__ == "__main__":
     main()
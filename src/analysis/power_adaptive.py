@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+import os
+import sys
+import heapq
+import argparse
+import numpy as np
+from power_grid import PARAMETERS, make_store
+
+# Region of data.py: [lon_min, lat_min, lon_max, lat_max]
+SAHEL_BBOX = [-17.0, 15.0, -4.0, 24.0]
+
+# Coordinates are rounded to this many decimals to share points between cells
+_DECIMALS = 6
+
+
+def _cell_score(corners, scale):
+    """
+    Local variation of a cell: range of the corner values in units of each
+    parameter's spread, averaged over the years, worst parameter.
+    """
+    with np.errstate(invalid='ignore'):
+        ranges = (np.nanmax(corners, axis=0) - np.nanmin(corners, axis=0)) / scale   # (years, params)
+    if np.all(np.isnan(ranges)):
+        return 0.0
+    return float(np.nanmax(np.nanmean(ranges, axis=0)))
+
+
+def adaptive_sample(fetch, bbox=SAHEL_BBOX, years=None, params=PARAMETERS, initial_spacing=2.0, min_spacing=0.25,
+                    point_budget=400, tolerance=0.1, score_params=None):
+    """
+    Samples a region coarse-to-fine: starts from a regular grid and splits
+    (quadtree) cells where the field changes quickly, until the budget of
+    points is spent, every cell is below the tolerance, or the cells reach
+    min_spacing. Cells are split in order of corner range x area (a proxy
+    of their integrated interpolation error), so a sharp front does not use
+    up the budget before broad, moderately varying cells are refined.
+
+    Parameters:
+    - fetch: fetch(lat, lon) -> (year, param) array of values at a point (one "point" of budget).
+    - bbox: [lon_min, lat_min, lon_max, lat_max].
+    - years, params: Labels of the rows and columns returned by fetch.
+    - initial_spacing: Spacing (degrees) of the starting grid, as in data.py's build_grid.
+    - min_spacing: Cells are not split below this size.
+    - point_budget: Maximum number of points fetched (initial grid included).
+    - tolerance: Cells whose corner range is below this fraction of the
+      parameter's spread (standard deviation over the samples) are not split.
+    - score_params: Parameters driving the refinement (default: all), e.g. ["PRECTOTCORR"].
+
+    Returns:
+    - Point set (years, params, lons, lats, values (year, n_points, param))
+      as power_interp.points_from_store, plus spacing (cell size that added
+      each point) and the number of points fetched.
+    """
+    lon_min, lat_min, lon_max, lat_max = bbox
+    samples = {}
+    spacing_of = {}
+
+    def sample(lat, lon, spacing):
+        key = (round(lat, _DECIMALS), round(lon, _DECIMALS))
+        if key not in samples:
+            try:
+                samples[key] = np.asarray(fetch(key[0], key[1]), dtype=float)
+            except Exception as e:
+                # The point stays NaN, as in data.py
+                print(f"Error at ({key[0]},{key[1]}): {e}")
+                samples[key] = None
+            spacing_of[key] = spacing
+        return key
+
+    def corner_keys(lat0, lon0, size):
+        return [(round(lat, _DECIMALS), round(lon, _DECIMALS))
+                for lat in (lat0, lat0 + size) for lon in (lon0, lon0 + size)]
+
+    # Starting grid (same nodes as build_grid)
+    lats = np.arange(lat_min, lat_max + initial_spacing, initial_spacing)
+    lons = np.arange(lon_min, lon_max + initial_spacing, initial_spacing)
+    if len(lats) * len(lons) > point_budget:
+        raise ValueError(f"The {initial_spacing}° grid needs {len(lats) * len(lons)} points, over the budget")
+    for lat in lats:
+        for lon in lons:
+            sample(lat, lon, initial_spacing)
+
+    shape = next((v.shape for v in samples.values() if v is not None), None)
+    if shape is None:
+        raise RuntimeError("No point of the starting grid could be fetched")
+    years = list(range(shape[0])) if years is None else list(years)
+    params = list(params)
+    score_index = [params.index(p) for p in (score_params or params)]
+
+    def values(keys):
+        return np.stack([samples[k] if samples[k] is not None else np.full(shape, np.nan) for k in keys])
+
+    all_values = values(list(samples))[..., score_index]
+    scale = np.nanstd(all_values, axis=(0, 1))
+    scale[~(scale > 0)] = 1.0
+
+    def push(heap, lat0, lon0, size):
+        score = _cell_score(values(corner_keys(lat0, lon0, size))[..., score_index], scale)
+        if score >= tolerance and size / 2 >= min_spacing:
+            heapq.heappush(heap, (-score * size ** 2, lat0, lon0, size))
+
+    heap = []
+    for lat0 in lats[:-1]:
+        for lon0 in lons[:-1]:
+            push(heap, lat0, lon0, initial_spacing)
+
+    while heap:
+        _, lat0, lon0, size = heapq.heappop(heap)
+        half = size / 2
+        new = [(lat0 + half, lon0 + half), (lat0, lon0 + half), (lat0 + size, lon0 + half),
+               (lat0 + half, lon0), (lat0 + half, lon0 + size)]
+        missing = [p for p in new if (round(p[0], _DECIMALS), round(p[1], _DECIMALS)) not in samples]
+        if len(samples) + len(missing) > point_budget:
+            break
+        for lat, lon in missing:
+            sample(lat, lon, half)
+        for child_lat, child_lon in ((lat0, lon0), (lat0, lon0 + half), (lat0 + half, lon0),
+                                     (lat0 + half, lon0 + half)):
+            push(heap, child_lat, child_lon, half)
+
+    keys = list(samples)
+    print(f"Adaptive sampling: {len(keys)} points (budget {point_budget}), finest spacing "
+          f"{min(spacing_of.values()):g}°")
+    return {
+        "years": np.asarray(years),
+        "params": params,
+        "lons": np.array([k[1] for k in keys]),
+        "lats": np.array([k[0] for k in keys]),
+        "values": np.moveaxis(values(keys), 0, 1).astype(np.float32),
+        "spacing": np.array([spacing_of[k] for k in keys]),
+        "fetched": len(keys)
+    }
+
+
+def save_points(points, path):
+    """
+    Saves a point set as a compressed .npz.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(
+        path, years=points["years"], params=np.array(points["params"]), lons=points["lons"],
+        lats=points["lats"], values=points["values"], spacing=points["spacing"]
+    )
+
+
+def load_points(path):
+    """
+    Loads a point set saved by save_points.
+    """
+    with np.load(path) as archive:
+        points = {key: archive[key] for key in ("years", "lons", "lats", "values", "spacing")}
+        points["params"] = [str(p) for p in archive["params"]]
+    return points
+
+
+def points_to_store(points, spacing, bbox=SAHEL_BBOX, **kwargs):
+    """
+    Regular grid store (see power_grid.make_store) interpolated from a
+    non-uniform point set, for the heatmap and regional-mean code of data.py.
+    Keyword arguments go to power_interp.interpolate_points (method, k, ...).
+    """
+    from power_interp import build_interpolator, interpolate_points
+
+    lon_min, lat_min, lon_max, lat_max = bbox
+    lats = np.arange(lat_min, lat_max + spacing / 2, spacing)
+    lons = np.arange(lon_min, lon_max + spacing / 2, spacing)
+    store = make_store(points["years"], lats, lons, points["params"])
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing='ij')
+    rasters = interpolate_points(build_interpolator(points), lon_grid, lat_grid, **kwargs)  # (year, param, lat, lon)
+    store["values"][...] = np.moveaxis(rasters, 1, -1)
+    return store
+
+
+def nasa_power_fetcher(years, params=PARAMETERS):
+    """
+    fetch(lat, lon) for adaptive_sample using data.py's NASA POWER requests
+    (one request per year; T2M converted to Kelvin as in data.py).
+    """
+    from data import get_annual_means_for_point
+
+    def fetch(lat, lon):
+        rows = []
+        for year in years:
+            means = get_annual_means_for_point(lat, lon, params, year)
+            if "T2M" in means:
+                means["T2M"] = means["T2M"] + 273
+            rows.append([means[param] for param in params])
+        return np.array(rows)
+
+    return fetch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptive NASA POWER sampling under an API call budget.")
+    parser.add_argument("--budget", type=int, default=1200, help="NASA POWER requests (points x years)")
+    parser.add_argument("--years", nargs=2, type=int, default=[2013, 2022], metavar=("START", "END"))
+    parser.add_argument("--initial-spacing", type=float, default=2.0, help="Starting grid spacing (degrees)")
+    parser.add_argument("--min-spacing", type=float, default=0.5, help="Finest cell size (degrees)")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Corner range (fraction of the parameter's spread) below which cells are not split")
+    parser.add_argument("--score-params", nargs="+", default=["PRECTOTCORR"], help="Parameters driving the refinement")
+    parser.add_argument("--output", default="../data/plots/nasa_power_adaptive_points.npz", help="Point set file")
+    args = parser.parse_args(argv)
+
+    years = list(range(args.years[0], args.years[1] + 1))
+    points = adaptive_sample(
+        nasa_power_fetcher(years), SAHEL_BBOX, years, PARAMETERS, args.initial_spacing, args.min_spacing,
+        point_budget=args.budget // len(years), tolerance=args.tolerance, score_params=args.score_params
+    )
+    save_points(points, args.output)
+    print(f"Saved {points['fetched']} points ({points['fetched'] * len(years)} requests) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import os
+import numpy as np
+
+# NASA POWER parameters fetched for the Sahel grid
+PARAMETERS = ["T2M", "PRECTOTCORR", "ALLSKY_SFC_SW_DWN", "WS10M", "RH2M"]
+
+
+def make_store(years, lats, lons, params=PARAMETERS, dtype=np.float32):
+    """
+    Preallocates the grid results as one (year, lat, lon, parameter) array,
+    filled with NaN until a point is fetched.
+
+    Parameters:
+    - years, lats, lons: Coordinates of the grid (ascending).
+    - params: Parameter names (last axis).
+    - dtype: Value dtype (float32 halves the memory of the old DataFrame).
+
+    Returns:
+    - Dictionary with years, lats, lons, params and values.
+    """
+    years = np.asarray(years, dtype=np.int32)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    return {
+        "years": years,
+        "lats": lats,
+        "lons": lons,
+        "params": list(params),
+        "values": np.full((len(years), len(lats), len(lons), len(params)), np.nan, dtype=dtype)
+    }
+
+
+def _index(coords, value, name):
+    i = int(np.argmin(np.abs(coords - value)))
+    if not np.isclose(coords[i], value):
+        raise KeyError(f"{name} {value} is not on the grid")
+    return i
+
+
+def point_index(store, year, lat, lon):
+    """
+    (year, lat, lon) indices of a grid point.
+    """
+    return (_index(store["years"], year, "year"), _index(store["lats"], lat, "latitude"),
+            _index(store["lons"], lon, "longitude"))
+
+
+def param_index(store, param):
+    return store["params"].index(param)
+
+
+def set_point(store, year, lat, lon, means):
+    """
+    Writes the {parameter: value} results of one point-year into the store.
+    """
+    y, i, j = point_index(store, year, lat, lon)
+    store["values"][y, i, j, :] = [means.get(param, np.nan) for param in store["params"]]
+
+
+def field(store, year, param):
+    """
+    (lat, lon) array of one parameter in one year (a view, no copy).
+    """
+    return store["values"][_index(store["years"], year, "year"), :, :, param_index(store, param)]
+
+
+def regional_mean(store, param):
+    """
+    Grid-average of a parameter for every year (NaN points ignored).
+    """
+    values = store["values"][..., param_index(store, param)]
+    counts = np.sum(~np.isnan(values), axis=(1, 2))
+    sums = np.nansum(values, axis=(1, 2), dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def climatology(store, param, baseline_years=None):
+    """
+    Per-point mean of a parameter over baseline_years (default: all years).
+    """
+    values = store["values"][..., param_index(store, param)]
+    if baseline_years is not None:
+        values = values[np.isin(store["years"], baseline_years)]
+    counts = np.sum(~np.isnan(values), axis=0)
+    sums = np.nansum(values, axis=0, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def anomalies(store, param, baseline_years=None):
+    """
+    (year, lat, lon) departures of a parameter from its per-point climatology.
+    """
+    values = store["values"][..., param_index(store, param)]
+    return values - climatology(store, param, baseline_years).astype(values.dtype)
+
+
+def save_store(store, path):
+    """
+    Saves the store as a compressed .npz (a few KB for the 2° grid).
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez_compressed(
+        path, years=store["years"], lats=store["lats"], lons=store["lons"],
+        params=np.array(store["params"]), values=store["values"]
+    )
+
+
+def load_store(path):
+    """
+    Loads a store saved by save_store.
+    """
+    with np.load(path) as archive:
+        store = {
+            "years": archive["years"],
+            "lats": archive["lats"],
+            "lons": archive["lons"],
+            "params": [str(p) for p in archive["params"]],
+            "values": archive["values"]
+        }
+    return store
+
+
+def store_from_dataframe(df, params=PARAMETERS):
+    """
+    Builds a store from the old long table (year, latitude, longitude, parameters...).
+    """
+    years = np.unique(df["year"].to_numpy())
+    lats = np.unique(df["latitude"].to_numpy())
+    lons = np.unique(df["longitude"].to_numpy())
+    store = make_store(years, lats, lons, params)
+    y = np.searchsorted(years, df["year"].to_numpy())
+    i = np.searchsorted(lats, df["latitude"].to_numpy())
+    j = np.searchsorted(lons, df["longitude"].to_numpy())
+    for k, param in enumerate(params):
+        store["values"][y, i, j, k] = df[param].to_numpy()
+    return store
+
+
+def store_to_dataframe(store):
+    """
+    Long table (year, latitude, longitude, one column per parameter), as in the CSV export.
+    """
+    import pandas as pd
+
+    y, i, j = np.meshgrid(
+        np.arange(len(store["years"])), np.arange(len(store["lats"])), np.arange(len(store["lons"])), indexing='ij'
+    )
+    table = {
+        "year": store["years"][y.ravel()],
+        "latitude": store["lats"][i.ravel()],
+        "longitude": store["lons"][j.ravel()]
+    }
+    flat = store["values"].reshape(-1, len(store["params"]))
+    for k, param in enumerate(store["params"]):
+        table[param] = flat[:, k]
+    return pd.DataFrame(table)
+
+# How to use the store:
+# - field(store, 2022, "T2M") is the 2022 temperature map; regional_mean(store, "T2M") its yearly series.
+# - anomalies(store, "PRECTOTCORR") gives each year's departure from the per-point mean.
+# - Memory is years x lats x lons x params x 4 bytes, so finer grids stay cheap.
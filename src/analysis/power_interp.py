@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+import os
+import sys
+import argparse
+import numpy as np
+from power_grid import load_store
+from analysis_tools.alignment_module import grid_from_raster
+
+EARTH_RADIUS_KM = 6371.0
+
+# Target pixels interpolated at once (bounds the (pixels, k, layers) temporaries)
+_CHUNK = 65536
+
+
+def points_from_store(store):
+    """
+    Point set of a grid store (see power_grid.make_store): every (lat, lon)
+    node becomes one point.
+
+    Returns:
+    - Dictionary with years, params, lons, lats (n_points,) and values (year, n_points, param).
+    """
+    lat_grid, lon_grid = np.meshgrid(store["lats"], store["lons"], indexing='ij')
+    n_years, n_lats, n_lons, n_params = store["values"].shape
+    return {
+        "years": store["years"],
+        "params": list(store["params"]),
+        "lons": lon_grid.ravel(),
+        "lats": lat_grid.ravel(),
+        "values": store["values"].reshape(n_years, n_lats * n_lons, n_params)
+    }
+
+
+def _xyz(lons, lats):
+    """
+    Points on the sphere in km, so KD-tree (chord) distances follow the great-circle ones.
+    """
+    lon, lat = np.radians(lons), np.radians(lats)
+    return EARTH_RADIUS_KM * np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def build_interpolator(points):
+    """
+    KD-tree over the sample points, built once and reused for every grid, year and parameter.
+    """
+    from scipy.spatial import cKDTree
+
+    return {"points": points, "tree": cKDTree(_xyz(points["lons"], points["lats"]))}
+
+
+def _weights(distances, method, power, bandwidth_km):
+    if method == "idw":
+        # A target on a sample point gets (almost) all the weight
+        return 1.0 / np.maximum(distances, 1e-6) ** power
+    if method == "gaussian":
+        return np.exp(-0.5 * (distances / bandwidth_km) ** 2)
+    raise ValueError(f"Unknown interpolation method {method}")
+
+
+def _layers(points, years, params):
+    """
+    (n_points, n_layers) matrix of the selected years x parameters, and the layer shape.
+    """
+    year_index = [int(np.flatnonzero(points["years"] == y)[0]) for y in years]
+    param_index = [points["params"].index(p) for p in params]
+    values = points["values"][np.ix_(year_index, np.arange(points["values"].shape[1]), param_index)]
+    return np.moveaxis(values, 1, 0).reshape(values.shape[1], -1).astype(np.float64), (len(years), len(params))
+
+
+def _combine(weights, neighbours, layers):
+    """
+    Weighted mean of the neighbours for every target and layer; NaN samples
+    are left out, and targets without any valid neighbour get NaN.
+    """
+    values = layers[neighbours]                      # (targets, k, layers)
+    valid = ~np.isnan(values)
+    total = np.einsum('tk,tkl->tl', weights, valid)
+    weighted = np.einsum('tk,tkl->tl', weights, np.where(valid, values, 0.0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(total > 0, weighted / total, np.nan)
+
+
+def interpolate_points(interpolator, lons, lats, years=None, params=None, method="idw", k=8, power=2.0,
+                       bandwidth_km=150.0, max_distance_km=None):
+    """
+    Interpolates every selected year and parameter at many target points in
+    one vectorized pass (one KD-tree query per chunk of targets).
+
+    Parameters:
+    - interpolator: Result of build_interpolator.
+    - lons, lats: Target coordinates (any shape).
+    - years, params: Layers to interpolate (default: all).
+    - method: "idw" (inverse distance, weights 1/d**power) or "gaussian"
+      (weights exp(-d**2 / (2 * bandwidth_km**2))).
+    - k: Number of nearest sample points used.
+    - max_distance_km: Neighbours farther than this are ignored (NaN if none is left).
+
+    Returns:
+    - (year, param, *target shape) float32 array.
+    """
+    points = interpolator["points"]
+    years = list(points["years"]) if years is None else list(years)
+    params = list(points["params"]) if params is None else list(params)
+    layers, layer_shape = _layers(points, years, params)
+    k = min(k, layers.shape[0])
+
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    targets = _xyz(lons.ravel(), lats.ravel())
+    result = np.empty((targets.shape[0], layers.shape[1]), dtype=np.float32)
+    for start in range(0, targets.shape[0], _CHUNK):
+        chunk = targets[start:start + _CHUNK]
+        distances, neighbours = interpolator["tree"].query(chunk, k=k)
+        distances, neighbours = distances.reshape(len(chunk), k), neighbours.reshape(len(chunk), k)
+        weights = _weights(distances, method, power, bandwidth_km)
+        if max_distance_km is not None:
+            weights = np.where(distances <= max_distance_km, weights, 0.0)
+        result[start:start + len(chunk)] = _combine(weights, neighbours, layers)
+    return np.moveaxis(result, 0, -1).reshape(layer_shape + lons.shape)
+
+
+def grid_lonlat(grid):
+    """
+    Lon/lat of the centre of every pixel of a grid (reprojected for projected grids).
+    """
+    rows, cols = np.mgrid[0:grid["height"], 0:grid["width"]]
+    xs, ys = grid["transform"] * (cols + 0.5, rows + 0.5)
+    if grid["crs"] is not None and not grid["crs"].is_geographic:
+        from rasterio.warp import transform as warp_transform
+
+        lons, lats = warp_transform(grid["crs"], "EPSG:4326", xs.ravel(), ys.ravel())
+        return np.reshape(lons, xs.shape), np.reshape(lats, ys.shape)
+    return xs, ys
+
+
+def interpolate_to_grid(interpolator, grid, **kwargs):
+    """
+    Interpolated (year, param, row, col) rasters on a target grid, e.g. the
+    precipitation grid (grid_from_raster("2010R.tif")). Keyword arguments are
+    those of interpolate_points.
+    """
+    lons, lats = grid_lonlat(grid)
+    return interpolate_points(interpolator, lons, lats, **kwargs)
+
+
+def leave_one_out(interpolator, years=None, params=None, method="idw", k=8, power=2.0, bandwidth_km=150.0,
+                  max_distance_km=None):
+    """
+    Predicts every sample point from the others (its own value left out).
+
+    Returns:
+    - Dictionary with errors (year, n_points, param: predicted - observed),
+      and rmse, mae, bias per parameter (over years and points).
+    """
+    points = interpolator["points"]
+    years = list(points["years"]) if years is None else list(years)
+    params = list(points["params"]) if params is None else list(params)
+    layers, layer_shape = _layers(points, years, params)
+    k = min(k + 1, layers.shape[0])
+
+    distances, neighbours = interpolator["tree"].query(interpolator["tree"].data, k=k)
+    distances, neighbours = distances.reshape(-1, k), neighbours.reshape(-1, k)
+    # Drop each point itself (distance 0, not necessarily the first on ties)
+    own = neighbours == np.arange(len(neighbours))[:, None]
+    weights = _weights(distances, method, power, bandwidth_km)
+    weights = np.where(own, 0.0, weights)
+    if max_distance_km is not None:
+        weights = np.where(distances <= max_distance_km, weights, 0.0)
+    predicted = _combine(weights, neighbours, layers)
+    errors = (predicted - layers).reshape((-1,) + layer_shape)
+    errors = np.moveaxis(errors, 0, 1)               # (year, n_points, param)
+    with np.errstate(invalid='ignore'):
+        summary = {
+            "errors": errors,
+            "rmse": {p: float(np.sqrt(np.nanmean(errors[..., j] ** 2))) for j, p in enumerate(params)},
+            "mae": {p: float(np.nanmean(np.abs(errors[..., j]))) for j, p in enumerate(params)},
+            "bias": {p: float(np.nanmean(errors[..., j])) for j, p in enumerate(params)}
+        }
+    return summary
+
+
+def save_interpolated(rasters, grid, years, params, output_dir, prefix="nasa_power"):
+    """
+    Writes one float32 GeoTIFF per parameter, one band per year (band
+    descriptions are the years), on the target grid.
+
+    Returns:
+    - List of written paths.
+    """
+    import rasterio
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for j, param in enumerate(params):
+        path = os.path.join(output_dir, f"{prefix}_{param}.tif")
+        profile = {
+            "driver": "GTiff",
+            "height": grid["height"],
+            "width": grid["width"],
+            "count": len(years),
+            "dtype": "float32",
+            "crs": grid["crs"],
+            "transform": grid["transform"],
+            "nodata": np.nan,
+            "compress": "lzw"
+        }
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(rasters[:, j].astype(np.float32))
+            for band, year in enumerate(years, start=1):
+                dst.set_band_description(band, str(year))
+        print(f"Saved {path}")
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interpolate the NASA POWER grid to continuous rasters.")
+    parser.add_argument("--store", default="../data/plots/nasa_power_grid_data.npz",
+                        help="Grid store saved by data.py")
+    parser.add_argument("--points", default=None,
+                        help="Point set saved by power_adaptive.py (used instead of --store)")
+    parser.add_argument("--reference", default="../data/Datasets_Hackathon/Climate_Precipitation_Data/2010R.tif",
+                        help="Raster whose grid the outputs match")
+    parser.add_argument("--output-dir", default="../data/plots/power_maps", help="Directory for the GeoTIFFs")
+    parser.add_argument("--method", default="idw", choices=["idw", "gaussian"])
+    parser.add_argument("--k", type=int, default=8, help="Nearest grid points used")
+    parser.add_argument("--power", type=float, default=2.0, help="IDW power")
+    parser.add_argument("--bandwidth-km", type=float, default=150.0, help="Gaussian kernel bandwidth")
+    parser.add_argument("--params", nargs="+", default=None, help="Parameters (default: all)")
+    parser.add_argument("--loo", action="store_true", help="Print leave-one-out errors")
+    args = parser.parse_args(argv)
+
+    if args.points:
+        from power_adaptive import load_points
+        points = load_points(args.points)
+    else:
+        points = points_from_store(load_store(args.store))
+    interpolator = build_interpolator(points)
+    params = args.params or points["params"]
+    options = dict(params=params, method=args.method, k=args.k, power=args.power, bandwidth_km=args.bandwidth_km)
+
+    grid = grid_from_raster(args.reference)
+    rasters = interpolate_to_grid(interpolator, grid, **options)
+    save_interpolated(rasters, grid, list(points["years"]), params, args.output_dir)
+
+    if args.loo:
+        errors = leave_one_out(interpolator, **options)
+        for param in params:
+            print(f"{param}: RMSE {errors['rmse'][param]:.3f}, MAE {errors['mae'][param]:.3f}, "
+                  f"bias {errors['bias'][param]:+.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import os
+import hashlib
+import pandas as pd
+
+CACHE_DIR = os.path.join('data', 'processed', 'vector_cache')
+
+# Shapefile members whose changes invalidate the cached copy
+SHAPEFILE_PARTS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+# Layers already loaded in this process: key -> {"data": ..., "tree": ...}
+_LAYERS = {}
+
+
+def _source_files(path):
+    if path.lower().endswith('.shp'):
+        stem = os.path.splitext(path)[0]
+        return [stem + ext for ext in SHAPEFILE_PARTS if os.path.exists(stem + ext)]
+    return [path]
+
+
+def _source_mtime(path):
+    return max(os.path.getmtime(f) for f in _source_files(path))
+
+
+def _crs_tag(crs):
+    if crs is None:
+        return "native"
+    return hashlib.sha1(str(crs).encode('utf-8')).hexdigest()[:10]
+
+
+def cache_path_for(path, crs=None, cache_dir=CACHE_DIR):
+    """
+    Path of the cached (projected) copy of a vector layer or CSV. The source
+    extension and a hash of its absolute path are part of the name, so
+    Assaba_Region_layer.shp and Assaba_Region_layer.csv (or same-named layers
+    in different directories) get separate copies.
+    """
+    stem, ext = os.path.splitext(os.path.basename(path))
+    path_tag = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{stem}_{ext.lstrip('.').lower()}_{path_tag}_{_crs_tag(crs)}.parquet")
+
+
+def load_vector_layer(path, crs=None, cache_dir=CACHE_DIR):
+    """
+    Loads a shapefile (as a GeoDataFrame, reprojected to crs) or a CSV (as a
+    DataFrame) from a GeoParquet/Parquet cache, rebuilding the cache only when
+    the source is newer than it.
+
+    Parameters:
+    - path: Path to the .shp or .csv file.
+    - crs: Target CRS for shapefiles (None keeps the native CRS).
+    - cache_dir: Directory holding the Parquet copies.
+
+    Returns:
+    - GeoDataFrame (shapefiles) or DataFrame (CSV).
+    """
+    key = (os.path.abspath(path), str(crs))
+    mtime = _source_mtime(path)
+    layer = _LAYERS.get(key)
+    if layer is not None and layer["mtime"] == mtime:
+        return layer["data"]
+
+    is_csv = path.lower().endswith('.csv')
+    cached = cache_path_for(path, crs, cache_dir)
+    if os.path.exists(cached) and os.path.getmtime(cached) >= mtime:
+        if is_csv:
+            data = pd.read_parquet(cached)
+        else:
+            import geopandas as gpd
+            data = gpd.read_parquet(cached)
+    else:
+        if is_csv:
+            data = pd.read_csv(path)
+        else:
+            import geopandas as gpd
+            data = gpd.read_file(path)
+            if crs is not None and data.crs != crs:
+                data = data.to_crs(crs)
+        os.makedirs(cache_dir, exist_ok=True)
+        data.to_parquet(cached)
+        print(f"Cached {path} to {cached}")
+
+    _LAYERS[key] = {"data": data, "tree": None, "mtime": mtime}
+    return data
+
+
+def get_spatial_index(path, crs=None, cache_dir=CACHE_DIR):
+    """
+    Returns the (layer, STRtree) pair for a shapefile. The tree is built once
+    per process and reused by every query on the layer.
+    """
+    from shapely import STRtree
+
+    gdf = load_vector_layer(path, crs, cache_dir)
+    layer = _LAYERS[(os.path.abspath(path), str(crs))]
+    if layer["tree"] is None:
+        layer["tree"] = STRtree(gdf.geometry.values)
+    return gdf, layer["tree"]
+
+
+def query_bbox(path, bbox, crs=None, cache_dir=CACHE_DIR):
+    """
+    Features whose envelope intersects bbox = (minx, miny, maxx, maxy).
+    """
+    from shapely.geometry import box
+
+    gdf, tree = get_spatial_index(path, crs, cache_dir)
+    index = tree.query(box(*bbox))
+    return gdf.iloc[sorted(index)]
+
+
+def query_intersecting(path, geometry, crs=None, cache_dir=CACHE_DIR):
+    """
+    Features that truly intersect a geometry (e.g. road segments in a district).
+    """
+    gdf, tree = get_spatial_index(path, crs, cache_dir)
+    index = tree.query(geometry, predicate='intersects')
+    return gdf.iloc[sorted(index)]
+
+
+def query_nearest(path, geometries, crs=None, max_distance=None, cache_dir=CACHE_DIR):
+    """
+    Nearest feature of the layer for each input geometry.
+
+    Parameters:
+    - geometries: Sequence of shapely geometries (e.g. candidate site points).
+    - max_distance: Optional search radius (CRS units).
+
+    Returns:
+    - DataFrame with input_index, feature_index and distance.
+    """
+    gdf, tree = get_spatial_index(path, crs, cache_dir)
+    pairs, distances = tree.query_nearest(
+        list(geometries), max_distance=max_distance, return_distance=True
+    )
+    return pd.DataFrame({
+        "input_index": pairs[0],
+        "feature_index": gdf.index.values[pairs[1]],
+        "distance": distances
+    })
+
+
+def clip_layer(path, region, crs=None, cache_dir=CACHE_DIR):
+    """
+    Clips a layer to a region geometry, testing only the candidates returned
+    by the spatial index.
+    """
+    import geopandas as gpd
+
+    candidates = query_intersecting(path, region, crs, cache_dir)
+    return gpd.clip(candidates, region)
+
+
+def features_in_district(path, districts_path, district_name, name_field="ADM3_EN",
+                         crs=None, cache_dir=CACHE_DIR):
+    """
+    Features of a layer (e.g. Main_Road, Streamwater) intersecting a district.
+    """
+    districts = load_vector_layer(districts_path, crs, cache_dir)
+    selected = districts[districts[name_field] == district_name]
+    if selected.empty:
+        raise ValueError(f"District not found: {district_name}")
+    return query_intersecting(path, selected.geometry.union_all(), crs, cache_dir)
@@ -1,5 +1,4 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+from vector_cache import load_vector_layer
 
 def visualize_data(csv_path):
     """
@@ -8,8 +7,10 @@ def visualize_data(csv_path):
     Parameters:
     - csv_path: Path to the CSV file.
     """
+    import matplotlib.pyplot as plt
+
     try:
-        df = pd.read_csv(csv_path)
+        df = load_vector_layer(csv_path)
         
         # Bar chart for AREA_SQKM
         plt.figure(figsize=(10, 6))
@@ -36,6 +37,9 @@ def visualize_data(csv_path):
     except Exception as e:
         print(f"Error visualizing data from {csv_path}: {e}")
 
-if __name__ == "__main__":
+def main():
     csv_path = 'Datasets_Hackathon/Admin_layers/Assaba_Region_layer.csv'
     visualize_data(csv_path)
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,303 @@
 #!/usr/bin/env python
+import os
 import requests
 import json
 import time
+import hashlib
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from uid import CATALOG_DB, get_download_options
+from ingest import ingest, region_from_bbox, RASTER_EXTENSIONS
 
+BASE_URL = "http://land.copernicus.eu/api"
 
-def request_season_max_value(bearer_token):
-    """
-    Requests the "Season Maximum Value 2010–present (raster 300 m), global, yearly, version 1" dataset
-    from the Copernicus Land API.
+# Dataset and download IDs for "Season Maximum Value" (Season 1)
+SEASON_MAX_DATASET_ID = "28a93a5edcce4b6a931dc53b1c3f1eab"
+SEASON_MAX_DOWNLOAD_INFO_ID = "1c7acc95-02e5-4503-82fc-966a6dd225dd"
 
-    The payload sets:
-      - DatasetID to "28a93a5edcce4b6a931dc53b1c3f1eab"
-      - DatasetDownloadInformationID to "1c7acc95-02e5-4503-82fc-966a6dd225dd" (Season 1 option)
-      - OutputFormat as "Geotiff" and CRS as EPSG:4326.
-      - A bounding box covering Mauritania's Sahel: [-10.5, 16.0, -4.0, 22.0].
-      - A temporal filter from January 1, 2010 until now.
+# Bounding box covering Mauritania's Sahel: [min_lon, min_lat, max_lon, max_lat]
+SAHEL_BBOX = [-10.5, 16.0, -4.0, 22.0]
+
+# Final states of an asynchronous data request
+SUCCESS_STATES = {"Finished_ok"}
+FAILURE_STATES = {"Finished_nok", "Rejected", "Cancelled"}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def resolve_season_max_ids(db_path=CATALOG_DB):
     """
-    url = "http://land.copernicus.eu/api/@datarequest_post"
-    headers = {
+    Returns the known "Season Maximum Value" (Season 1) IDs, checked against
+    the local catalog (see uid.py) when there is one. The catalog only
+    replaces the download option ID, and only when the known dataset no
+    longer lists it but has an option named exactly "Season 1"; a text search
+    could rank another version or season first.
+    """
+    if not os.path.exists(db_path):
+        return SEASON_MAX_DATASET_ID, SEASON_MAX_DOWNLOAD_INFO_ID
+    options = get_download_options(SEASON_MAX_DATASET_ID, db_path)
+    if not options:
+        print(f"Dataset {SEASON_MAX_DATASET_ID} is not in {db_path}; using the known IDs.")
+        return SEASON_MAX_DATASET_ID, SEASON_MAX_DOWNLOAD_INFO_ID
+    if any(option["id"] == SEASON_MAX_DOWNLOAD_INFO_ID for option in options):
+        return SEASON_MAX_DATASET_ID, SEASON_MAX_DOWNLOAD_INFO_ID
+    season_1 = [option["id"] for option in options if (option["name"] or "").strip().lower() == "season 1"]
+    if len(season_1) == 1:
+        print(f"Download option {SEASON_MAX_DOWNLOAD_INFO_ID} not found; using {season_1[0]} (Season 1).")
+        return SEASON_MAX_DATASET_ID, season_1[0]
+    print(f"No unique Season 1 option for {SEASON_MAX_DATASET_ID} in {db_path}; using the known IDs.")
+    return SEASON_MAX_DATASET_ID, SEASON_MAX_DOWNLOAD_INFO_ID
+
+
+def make_session(bearer_token):
+    session = requests.Session()
+    session.headers.update({
         'Accept': 'application/json',
-        'Content-Type': 'application/json',
         'Authorization': f'Bearer {bearer_token}'
-    }
+    })
+    return session
 
-    # Dataset and download IDs for "Season Maximum Value" (Season 1)
-    dataset_id = "28a93a5edcce4b6a931dc53b1c3f1eab"
-    download_info_id = "1c7acc95-02e5-4503-82fc-966a6dd225dd"
 
-    # Define temporal filter:
-    # Start date: 2010-01-01 in Unix epoch milliseconds.
-    start_date = datetime.datetime(2010, 1, 1)
-    start_date_ms = int(start_date.timestamp() * 1000)
-    # End date: current date and time.
-    end_date = datetime.datetime.now()
-    end_date_ms = int(end_date.timestamp() * 1000)
+def build_season_max_payload(dataset_id=SEASON_MAX_DATASET_ID, download_info_id=SEASON_MAX_DOWNLOAD_INFO_ID,
+                             bbox=SAHEL_BBOX, start_date=datetime.datetime(2010, 1, 1), end_date=None):
+    """
+    Builds the data request payload for the "Season Maximum Value" dataset.
+
+    The payload sets:
+      - DatasetID and DatasetDownloadInformationID (Season 1 option by default)
+      - OutputFormat as "Geotiff" and CRS as EPSG:4326.
+      - The bounding box (Mauritania's Sahel by default).
+      - A temporal filter from start_date (January 1, 2010) until end_date (now).
+    """
+    if end_date is None:
+        end_date = datetime.datetime.now()
 
+    # Dates in Unix epoch milliseconds.
     temporal_filter = {
-        "StartDate": start_date_ms,
-        "EndDate": end_date_ms
+        "StartDate": int(start_date.timestamp() * 1000),
+        "EndDate": int(end_date.timestamp() * 1000)
     }
 
-    payload = {
+    return {
         "Datasets": [
             {
                 "DatasetID": dataset_id,
                 "DatasetDownloadInformationID": download_info_id,
                 "OutputFormat": "Geotiff",
                 "OutputGCS": "EPSG:4326",
-                "BoundingBox": [-10.5, 16.0, -4.0, 22.0],  # [min_lon, min_lat, max_lon, max_lat]
+                "BoundingBox": list(bbox),
                 "TemporalFilter": temporal_filter
             }
         ]
     }
 
+
+def request_season_max_value(bearer_token, base_url=BASE_URL):
+    """
+    Requests the "Season Maximum Value 2010–present (raster 300 m), global, yearly, version 1" dataset
+    from the Copernicus Land API and returns the API response (with the task ids).
+    """
     print("Sending request for Season Maximum Value (2010–present) dataset...")
-    response = requests.post(url, headers=headers, json=payload)
-    if response.status_code != 200:
+    return submit_data_request(make_session(bearer_token), build_season_max_payload(), base_url)
+
+
+def submit_data_request(session, payload, base_url=BASE_URL):
+    """
+    POSTs an asynchronous data request. Returns the JSON response, whose
+    "TaskIds" list holds one {"TaskID": ...} entry per requested dataset.
+    """
+    response = session.post(f"{base_url}/@datarequest_post", json=payload)
+    if response.status_code not in (200, 201):
         raise Exception(f"Request failed with status code {response.status_code}: {response.text}")
+    return response.json()
+
 
+def get_request_status(session, task_id, base_url=BASE_URL):
+    response = session.get(f"{base_url}/@datarequest_status_get", params={"TaskID": task_id})
+    if response.status_code != 200:
+        raise Exception(f"Status request failed with status code {response.status_code}: {response.text}")
     return response.json()
 
 
+def wait_for_request(session, task_id, base_url=BASE_URL, poll_interval=15, max_poll_interval=600,
+                     timeout=24 * 3600, sleep=time.sleep):
+    """
+    Polls a data request with exponential backoff until it finishes.
+
+    Returns:
+    - The final status response (with "DownloadURL" on success).
+    """
+    waited = 0
+    interval = poll_interval
+    while True:
+        status = get_request_status(session, task_id, base_url)
+        state = status.get("Status")
+        if state in SUCCESS_STATES:
+            return status
+        if state in FAILURE_STATES:
+            raise Exception(f"Data request {task_id} ended with status {state}: {status.get('Message', '')}")
+        if waited >= timeout:
+            raise TimeoutError(f"Data request {task_id} still {state} after {waited} s")
+        print(f"Data request {task_id}: {state}, next check in {interval} s")
+        sleep(interval)
+        waited += interval
+        interval = min(interval * 2, max_poll_interval)
+
+
+def _file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def download_file(session, url, dest_path, expected_size=None, checksum=None, algorithm='sha256',
+                  max_retries=3, chunk_size=CHUNK_SIZE, base_url=BASE_URL):
+    """
+    Streams a file to disk in chunks, resuming an interrupted download with an
+    HTTP Range request and verifying its size and (optionally) checksum.
+
+    Parameters:
+    - session: requests.Session to use.
+    - url: File URL.
+    - dest_path: Final path; data is written to dest_path + ".part" until complete.
+    - expected_size: Size in bytes (defaults to what the server announces).
+    - checksum: Optional hex digest to verify.
+    - algorithm: Hash algorithm of checksum.
+    - max_retries: Attempts before giving up (each attempt resumes the last one).
+    - base_url: API URL; the session's bearer token is only sent to this host.
+
+    Returns:
+    - dest_path.
+    """
+    if os.path.exists(dest_path) and (expected_size is None or os.path.getsize(dest_path) == expected_size) \
+            and (checksum is None or _file_digest(dest_path, algorithm) == checksum.lower()):
+        print(f"{dest_path} already downloaded.")
+        return dest_path
+
+    os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+    part_path = dest_path + '.part'
+    last_error = None
+    for attempt in range(1, max_retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        if urlparse(url).hostname != urlparse(base_url).hostname:
+            # Result files may be served from another host: keep the token to the API
+            headers['Authorization'] = None
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 416 and offset and expected_size in (None, offset):
+                    # Nothing left to fetch: the partial file is already complete
+                    break
+                if response.status_code == 206:
+                    mode = 'ab'
+                    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                elif response.status_code == 200:
+                    # Server ignored the range: start over
+                    mode, offset = 'wb', 0
+                    total = response.headers.get('Content-Length', '')
+                else:
+                    raise Exception(f"HTTP {response.status_code} downloading {url}")
+                if expected_size is None and total.isdigit():
+                    expected_size = int(total)
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            f.write(chunk)
+            size = os.path.getsize(part_path)
+            if expected_size is not None and size != expected_size:
+                raise Exception(f"Incomplete download of {url}: {size}/{expected_size} bytes")
+            break
+        except Exception as e:
+            last_error = e
+            print(f"Download attempt {attempt} of {url} failed: {e}")
+    else:
+        raise Exception(f"Giving up on {url}: {last_error}")
+
+    if checksum is not None and _file_digest(part_path, algorithm) != checksum.lower():
+        os.remove(part_path)
+        raise Exception(f"Checksum mismatch for {url}")
+    os.replace(part_path, dest_path)
+    print(f"Downloaded {url} to {dest_path}")
+    return dest_path
+
+
+def download_files(downloads, bearer_token=None, workers=4, session_factory=None, **kwargs):
+    """
+    Downloads several files in parallel.
+
+    Parameters:
+    - downloads: List of dicts with url, dest_path and optional expected_size/checksum.
+    - bearer_token: Token for the default sessions.
+    - workers: Number of parallel downloads.
+    - session_factory: Callable returning a session (one per download).
+    - kwargs: Passed on to download_file.
+
+    Returns:
+    - List of downloaded paths, in input order.
+    """
+    if session_factory is None:
+        session_factory = lambda: make_session(bearer_token)
+
+    def run(item):
+        with session_factory() as session:
+            return download_file(
+                session, item["url"], item["dest_path"],
+                expected_size=item.get("expected_size"), checksum=item.get("checksum"), **kwargs
+            )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, downloads))
+
+
+def _download_urls(status):
+    """
+    Extracts the result URL(s) from a finished request status.
+    """
+    urls = status.get("DownloadURL") or status.get("DownloadURLs") or []
+    return [urls] if isinstance(urls, str) else list(urls)
+
+
+def fetch_data_request(bearer_token, payload, out_dir, base_url=BASE_URL, workers=4, sleep=time.sleep):
+    """
+    Submits a data request, waits for every resulting task and downloads
+    their files to out_dir.
+
+    Returns:
+    - List of downloaded file paths.
+    """
+    session = make_session(bearer_token)
+    response = submit_data_request(session, payload, base_url)
+    task_ids = [task["TaskID"] for task in response.get("TaskIds", [])]
+    print(f"Submitted data request, tasks: {', '.join(task_ids)}")
+
+    downloads = []
+    for task_id in task_ids:
+        status = wait_for_request(session, task_id, base_url, sleep=sleep)
+        for url in _download_urls(status):
+            name = os.path.basename(urlparse(url).path) or f"{task_id}.zip"
+            downloads.append({"url": url, "dest_path": os.path.join(out_dir, name)})
+    return download_files(downloads, bearer_token, workers, base_url=base_url)
+
+
 def main():
     # Replace with your actual Bearer token
     bearer_token = "<YOUR_BEARER_TOKEN>"
 
     try:
-        result = request_season_max_value(bearer_token)
-        print("API Response:")
-        print(json.dumps(result, indent=2))
+        dataset_id, download_info_id = resolve_season_max_ids()
+        payload = build_season_max_payload(dataset_id, download_info_id)
+        paths = fetch_data_request(bearer_token, payload, "copernicus_downloads")
+        print("Downloaded files:")
+        print(json.dumps(paths, indent=2))
+
+        # Keep only the Sahel window of each raster for the later analyses
+        rasters = [p for p in paths if p.lower().endswith(RASTER_EXTENSIONS)]
+        for file_path, status in ingest(rasters, region_from_bbox(SAHEL_BBOX),
+                                        os.path.join('data', 'processed', 'clipped', 'copernicus')):
+            print(f"{file_path}: {status}")
     except Exception as e:
         print("Error:", e)
 
@@ -1,45 +1,264 @@
-import ee
+import os
+import json
+import time
 
-# 1. Authenticate and Initialize Earth Engine
-try:
-    ee.Initialize(project="g20-hackaton")
-except Exception as e:
-    ee.Authenticate()
-    ee.Initialize()
-
-# 2. Define the Region of Interest (ROI) - bounding box for southern Mauritania
+# Region of Interest (ROI) - bounding box for southern Mauritania
 lat_min, lat_max = 14, 18
 lon_min, lon_max = -12, -6
-roi = ee.Geometry.Rectangle([lon_min, lat_min, lon_max, lat_max])
-
-# 3. Fetch EVI data for each year from 2010 to 2023
-for year in range(2010, 2024):
-    start_date = f"{year}-01-01"
-    end_date   = f"{year}-12-31"
-
-    # MODIS/006/MOD13Q1 has EVI at 250m resolution, 16-day composites
-    evi_col = (
-        ee.ImageCollection("MODIS/006/MOD13Q1")
-        .filterBounds(roi)
-        .filterDate(start_date, end_date)
-        .select('EVI')
-    )
-
-    # Create a mean composite for the entire year
-    evi_mean = evi_col.mean().clip(roi)
-
-    # Set up an export task to Google Drive
-    task = ee.batch.Export.image.toDrive(
-        image=evi_mean,
-        description=f"MODIS_EVI_Composite_SahelMauritania_{year}",
-        folder='GEE_Exports',  # Adjust to your preferred Drive folder
-        fileNamePrefix=f"MODIS_EVI_{year}",
-        region=roi.coordinates(),
-        scale=250,          # MOD13Q1 is 250m
-        crs='EPSG:4326'
-    )
-    task.start()
-    print(f"Export task for {year} started.")
-
-print("All EVI export tasks started. Check Earth Engine Tasks for progress.")
+ROI_BOUNDS = [lon_min, lat_min, lon_max, lat_max]
+
+MANIFEST_PATH = 'GEE_Exports/export_manifest.json'
+
+# Earth Engine task states
+FINISHED_STATES = {'COMPLETED'}
+# UNKNOWN is what getTaskStatus reports for a task id it does not know
+FAILED_STATES = {'FAILED', 'CANCELLED', 'CANCEL_REQUESTED', 'UNKNOWN'}
+# States of a task started by an earlier run that may still be in flight
+ACTIVE_STATES = {'SUBMITTED', 'UNSUBMITTED', 'READY', 'RUNNING'}
+
+
+class EarthEngineClient:
+    """
+    Starts Drive exports and reports task status through the Earth Engine API.
+    Any object with the same start_export/task_status methods (e.g. a local
+    fake) can be passed to run_exports instead.
+    """
+
+    def __init__(self, project="g20-hackaton"):
+        import ee
+
+        try:
+            ee.Initialize(project=project)
+        except Exception:
+            ee.Authenticate()
+            ee.Initialize(project=project)
+        self.ee = ee
+
+    def start_export(self, job):
+        """
+        Builds the yearly composite described by job, starts its export to
+        Google Drive and returns the task id.
+        """
+        ee = self.ee
+        roi = ee.Geometry.Rectangle(job["bounds"])
+        image = (
+            ee.ImageCollection(job["collection"])
+            .filterBounds(roi)
+            .filterDate(job["start_date"], job["end_date"])
+            .select(job["band"])
+            .mean()
+            .clip(roi)
+        )
+        task = ee.batch.Export.image.toDrive(
+            image=image,
+            description=job["name"],
+            folder=job["folder"],
+            fileNamePrefix=job["file_prefix"],
+            region=roi.coordinates(),
+            scale=job["scale"],
+            crs=job["crs"]
+        )
+        task.start()
+        return task.id
+
+    def task_status(self, task_id):
+        """
+        Returns a dict with at least 'state' (and 'error_message' on failure).
+        """
+        return self.ee.data.getTaskStatus(task_id)[0]
+
+    def reduce_annual_regions(self, products, years, regions, scale):
+        """
+        Computes, in one server-side request, the regional mean of every
+        product's annual composite for every (year, region) pair.
+
+        Parameters:
+        - products: List of product dicts (see gee_query.DEFAULT_PRODUCTS).
+        - years: List of years.
+        - regions: Dict of region name -> [lon_min, lat_min, lon_max, lat_max].
+        - scale: Reduction scale in metres.
+
+        Returns:
+        - List of row dicts with year, region and one value per product name.
+        """
+        ee = self.ee
+        region_fc = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Rectangle(bounds), {"region": name})
+            for name, bounds in regions.items()
+        ])
+        names = [product["name"] for product in products]
+
+        def per_year(year):
+            start = ee.Date.fromYMD(year, 1, 1)
+            end = start.advance(1, 'year')
+            bands = []
+            for product in products:
+                collection = (
+                    ee.ImageCollection(product["collection"])
+                    .filterDate(start, end)
+                    .filterBounds(region_fc.geometry())
+                    .select(product["band"])
+                )
+                composite = collection.sum() if product["composite"] == "sum" else collection.mean()
+                bands.append(composite.rename(product["name"]))
+            stats = ee.Image.cat(bands).reduceRegions(
+                collection=region_fc, reducer=ee.Reducer.mean(), scale=scale
+            )
+            return stats.map(lambda feature: feature.set("year", year))
+
+        table = ee.FeatureCollection(ee.List(years).map(per_year)).flatten()
+        selectors = ["year", "region"] + names
+        # Only the property table is transferred, never image or geometry metadata
+        values = table.reduceColumns(ee.Reducer.toList(len(selectors)), selectors).get("list").getInfo()
+        return [dict(zip(selectors, row)) for row in values]
+
+
+def evi_export_job(year, bounds=ROI_BOUNDS, folder='GEE_Exports'):
+    """
+    Describes the export of the mean MODIS EVI composite for one year.
+    MODIS/006/MOD13Q1 has EVI at 250m resolution, 16-day composites.
+    """
+    return {
+        "name": f"MODIS_EVI_Composite_SahelMauritania_{year}",
+        "year": year,
+        "collection": "MODIS/006/MOD13Q1",
+        "band": "EVI",
+        "start_date": f"{year}-01-01",
+        "end_date": f"{year}-12-31",
+        "bounds": list(bounds),
+        "folder": folder,
+        "file_prefix": f"MODIS_EVI_{year}",
+        "scale": 250,
+        "crs": "EPSG:4326"
+    }
+
+
+def load_manifest(manifest_path):
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest_path, manifest):
+    directory = os.path.dirname(manifest_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def run_exports(jobs, client, manifest_path=MANIFEST_PATH, max_concurrent=3, max_retries=2,
+                poll_interval=10, max_poll_interval=300, max_poll_failures=5, sleep=time.sleep):
+    """
+    Runs export jobs with at most max_concurrent tasks in flight, polling
+    their status with exponential backoff and recording every state change
+    in a local JSON manifest. Tasks an interrupted run left in flight are
+    polled again by their recorded task id instead of being started twice.
+
+    Parameters:
+    - jobs: List of job dicts (see evi_export_job); "name" must be unique.
+    - client: EarthEngineClient or any object with start_export/task_status.
+    - manifest_path: JSON file with the state of every job.
+    - max_concurrent: Maximum number of tasks running at once.
+    - max_retries: How many times a failed job is started again.
+    - poll_interval: First delay (seconds) between status polls.
+    - max_poll_interval: Upper bound of the backoff delay.
+    - max_poll_failures: Consecutive failed status polls after which a job
+      is marked FAILED (and retried like any failed task).
+    - sleep: Function used to wait (replaceable in tests).
+
+    Returns:
+    - The final manifest (job name -> state record).
+    """
+    manifest = load_manifest(manifest_path)
+    pending = []
+    running = {}
+    for job in jobs:
+        record = manifest.setdefault(job["name"], {})
+        if record.get("state") in FINISHED_STATES:
+            print(f"{job['name']} already exported, skipping.")
+        elif record.get("state") in ACTIVE_STATES and record.get("task_id"):
+            # Started by an interrupted run: poll it, resubmit only if it is unknown or fails
+            record["attempts"] = 1
+            record["poll_failures"] = 0
+            running[job["name"]] = job
+            print(f"Resuming {job['name']} (task {record['task_id']}).")
+        else:
+            # Retries are counted per run
+            record["attempts"] = 0
+            pending.append(job)
+
+    interval = poll_interval
+    while pending or running:
+        while pending and len(running) < max_concurrent:
+            job = pending.pop(0)
+            record = manifest[job["name"]]
+            record["attempts"] += 1
+            try:
+                record["task_id"] = client.start_export(job)
+                record["state"] = "SUBMITTED"
+                record["poll_failures"] = 0
+                record.pop("error", None)
+                running[job["name"]] = job
+                print(f"Export task {job['name']} started (attempt {record['attempts']}).")
+            except Exception as e:
+                record["state"] = "FAILED"
+                record["error"] = str(e)
+                print(f"Could not start {job['name']}: {e}")
+                if record["attempts"] <= max_retries:
+                    pending.append(job)
+            save_manifest(manifest_path, manifest)
+
+        if not running:
+            continue
+
+        sleep(interval)
+        changed = False
+        for name, job in list(running.items()):
+            record = manifest[name]
+            try:
+                status = client.task_status(record["task_id"])
+            except Exception as e:
+                record["poll_failures"] = record.get("poll_failures", 0) + 1
+                print(f"Could not poll {name} ({record['poll_failures']}/{max_poll_failures}): {e}")
+                if record["poll_failures"] < max_poll_failures:
+                    continue
+                # The task cannot be followed any more (deleted, credentials lost...)
+                status = {"state": "FAILED", "error_message": f"Status unavailable: {e}"}
+            else:
+                record["poll_failures"] = 0
+            state = status.get("state", "UNKNOWN")
+            if state != record.get("state"):
+                changed = True
+                record["state"] = state
+                print(f"{name}: {state}")
+            if state in FINISHED_STATES:
+                del running[name]
+            elif state in FAILED_STATES:
+                record["error"] = status.get("error_message", "")
+                del running[name]
+                if record["attempts"] <= max_retries:
+                    pending.append(job)
+        save_manifest(manifest_path, manifest)
+        # Poll again soon after a change, back off while nothing happens
+        interval = poll_interval if changed else min(interval * 2, max_poll_interval)
+
+    return manifest
+
+
+def main():
+    client = EarthEngineClient()
+    jobs = [evi_export_job(year) for year in range(2010, 2024)]
+    manifest = run_exports(jobs, client)
+    failed = [name for name, record in manifest.items() if record.get("state") not in FINISHED_STATES]
+    if failed:
+        print("Exports not completed:", ", ".join(sorted(failed)))
+    else:
+        print("All EVI exports completed.")
+
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+
+CACHE_DIR = 'GEE_Exports/query_cache'
+
+# Annual composites reduced per region: mean EVI and LAI, total precipitation
+DEFAULT_PRODUCTS = [
+    {"name": "EVI", "collection": "MODIS/006/MOD13Q1", "band": "EVI", "composite": "mean"},
+    {"name": "LAI", "collection": "MODIS/006/MOD15A2H", "band": "Lai_500m", "composite": "mean"},
+    {"name": "precipitation", "collection": "UCSB-CHG/CHIRPS/DAILY", "band": "precipitation", "composite": "sum"}
+]
+
+# [lon_min, lat_min, lon_max, lat_max]
+DEFAULT_REGIONS = {
+    "mauritania_sahel": [-17, 15, -4, 24]
+}
+
+
+def query_key(products, years, regions, scale):
+    """
+    Cache key of a query: collections, date range, geometries and scale.
+    """
+    payload = json.dumps({
+        "products": products,
+        "years": sorted(years),
+        "regions": regions,
+        "scale": scale
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def annual_region_table(client, products=DEFAULT_PRODUCTS, years=range(2010, 2024),
+                        regions=DEFAULT_REGIONS, scale=5000, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Per-year, per-region statistics of several products, computed as one
+    batched server-side reduction and cached locally.
+
+    Parameters:
+    - client: gee.EarthEngineClient or any object with reduce_annual_regions
+      (e.g. a local stub returning fixed rows).
+    - products: List of product dicts (name, collection, band, composite).
+    - years: Years to reduce.
+    - regions: Dict of region name -> [lon_min, lat_min, lon_max, lat_max].
+    - scale: Reduction scale in metres.
+    - cache_dir: Directory of the JSON cache (None disables it).
+    - refresh: Ignore the cached result and query again.
+
+    Returns:
+    - List of row dicts sorted by region and year.
+    """
+    years = list(years)
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, f"{query_key(products, years, regions, scale)}.json")
+        if not refresh and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+    rows = client.reduce_annual_regions(products, years, regions, scale)
+    rows = sorted(rows, key=lambda row: (row["region"], row["year"]))
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+
+def print_table(rows):
+    """
+    Prints the rows as an aligned text table.
+    """
+    if not rows:
+        print("No results.")
+        return
+    columns = list(rows[0].keys())
+    print("  ".join(f"{c:>16}" for c in columns))
+    for row in rows:
+        cells = []
+        for c in columns:
+            value = row.get(c)
+            cells.append(f"{value:>16.3f}" if isinstance(value, float) else f"{str(value):>16}")
+        print("  ".join(cells))
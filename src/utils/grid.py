@@ -1,17 +1,11 @@
 #!/usr/bin/env python
 import os
 import sys
-import cdsapi
-import xarray as xr
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-
-import os
-import sys
-import cdsapi
 
 
 def download_era5():
+    import cdsapi
+
     filename = "era5_2022.nc"
 
     # Check if file exists
@@ -65,10 +59,6 @@ def download_era5():
     return filename
 
 
-# Run the function
-download_era5()
-
-
 def visualize_era5(filename):
     """
     Opens an ERA5 NetCDF file with xarray, subsets the data to Mauritania's Sahel region,
@@ -78,6 +68,10 @@ def visualize_era5(filename):
     Parameters:
         filename (str): Path to the ERA5 NetCDF file.
     """
+    import xarray as xr
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+
     # Open the dataset
     try:
         ds = xr.open_dataset(filename, engine="netcdf4")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import argparse
+import datetime
+
+# Assaba region, [min_lon, min_lat, max_lon, max_lat]
+ASSABA_BBOX = [-13.1, 15.5, -10.5, 18.6]
+
+DEFAULT_OUTPUT_DIR = os.path.join('data', 'processed', 'clipped')
+
+RASTER_EXTENSIONS = ('.tif', '.tiff')
+
+
+def region_from_bbox(bbox, crs="EPSG:4326"):
+    """
+    Region of interest from a [min_x, min_y, max_x, max_y] box.
+    """
+    return {"bounds": tuple(float(v) for v in bbox), "crs": crs, "geometry": None,
+            "source": {"bbox": [float(v) for v in bbox], "crs": crs}}
+
+
+def region_from_polygons(vector_path, field=None, values=None):
+    """
+    Region of interest from admin polygons (e.g. Assaba_Region_layer.shp),
+    optionally only the features whose field is in values.
+    """
+    import geopandas as gpd
+
+    gdf = gpd.read_file(vector_path)
+    if field is not None:
+        gdf = gdf[gdf[field].astype(str).isin([str(v) for v in values])]
+        if gdf.empty:
+            raise ValueError(f"No feature of {vector_path} has {field} in {values}")
+    geometry = gdf.geometry.union_all() if hasattr(gdf.geometry, "union_all") else gdf.geometry.unary_union
+    return {"bounds": tuple(float(v) for v in geometry.bounds), "crs": gdf.crs.to_string(),
+            "geometry": geometry.__geo_interface__,
+            "source": {"path": os.path.abspath(vector_path), "field": field, "values": values,
+                       "fingerprint": _vector_fingerprint(vector_path)}}
+
+
+def _fingerprint(file_path):
+    return {"size": os.path.getsize(file_path), "mtime": os.path.getmtime(file_path)}
+
+
+def _vector_fingerprint(vector_path):
+    """
+    Fingerprints of a vector layer and, for a shapefile, its .dbf/.shx/.prj/.cpg
+    companions, so editing attributes or the projection also counts as a change.
+    """
+    stem, ext = os.path.splitext(vector_path)
+    paths = [vector_path]
+    if ext.lower() == '.shp':
+        paths += [stem + companion for companion in ('.dbf', '.shx', '.prj', '.cpg')
+                  if os.path.exists(stem + companion)]
+    return {os.path.basename(path): _fingerprint(path) for path in paths}
+
+
+def source_window(src, region, pad=1):
+    """
+    Pixel window of src covering the region (plus pad pixels), clipped to the raster.
+    Only this window is read from the source.
+
+    Returns:
+    - rasterio Window, or None if the region does not overlap the raster.
+    """
+    from rasterio.warp import transform_bounds
+    from rasterio.windows import Window, from_bounds
+
+    bounds = region["bounds"]
+    if src.crs is not None and region["crs"] != src.crs:
+        bounds = transform_bounds(region["crs"], src.crs, *bounds, densify_pts=21)
+    window = from_bounds(*bounds, transform=src.transform)
+    col0 = int(window.col_off) - pad
+    row0 = int(window.row_off) - pad
+    col1 = int(window.col_off + window.width + 0.999999) + pad
+    row1 = int(window.row_off + window.height + 0.999999) + pad
+    col0, row0 = max(col0, 0), max(row0, 0)
+    col1, row1 = min(col1, src.width), min(row1, src.height)
+    if col1 <= col0 or row1 <= row0:
+        return None
+    return Window(col0, row0, col1 - col0, row1 - row0)
+
+
+def clip_raster(source_path, region, output_path, pad=1, mask=False, force=False):
+    """
+    Writes the part of a large raster covering the region as a small tiled,
+    compressed GeoTIFF, reading only the intersecting window of the source.
+    A provenance file (<output>.json) records the source, its fingerprint,
+    the region and the window; the clip is skipped while they are unchanged.
+
+    Parameters:
+    - source_path: Large raster (e.g. mrt_pd_2020_1km.tif or a Copernicus download).
+    - region: Region from region_from_bbox or region_from_polygons.
+    - output_path: Clipped GeoTIFF to write.
+    - pad: Extra pixels kept around the region.
+    - mask: Set the pixels outside the region polygon to nodata.
+    - force: Clip even if the output is up to date.
+
+    Returns:
+    - Status string: "clipped", "up to date" or "no overlap".
+    """
+    import numpy as np
+    import rasterio
+    from rasterio.features import geometry_mask
+    from rasterio.warp import transform_geom
+
+    provenance_path = output_path + '.json'
+    request = {"source": os.path.abspath(source_path), "fingerprint": _fingerprint(source_path),
+               "region": region["source"], "pad": pad, "mask": mask}
+    if not force and os.path.exists(output_path) and os.path.exists(provenance_path):
+        with open(provenance_path, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+        if all(recorded.get(key) == value for key, value in request.items()):
+            return "up to date"
+
+    with rasterio.open(source_path) as src:
+        window = source_window(src, region, pad)
+        if window is None:
+            return "no overlap"
+        data = src.read(window=window)
+        transform = src.window_transform(window)
+        profile = src.profile
+        nodata = src.nodata
+
+        if mask and region["geometry"] is not None:
+            geometry = region["geometry"]
+            if src.crs is not None and region["crs"] != src.crs:
+                geometry = transform_geom(region["crs"], src.crs, geometry)
+            outside = geometry_mask([geometry], out_shape=data.shape[1:], transform=transform)
+            if nodata is None:
+                nodata = np.nan if np.issubdtype(data.dtype, np.floating) else np.iinfo(data.dtype).max
+            data[:, outside] = nodata
+
+        profile.update(
+            driver='GTiff', width=int(window.width), height=int(window.height), transform=transform,
+            nodata=nodata, compress='deflate', tiled=True, blockxsize=256, blockysize=256
+        )
+        # Small clips cannot hold a 256-pixel tile
+        if profile["width"] < 256 or profile["height"] < 256:
+            profile.update(tiled=False)
+            profile.pop("blockxsize")
+            profile.pop("blockysize")
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp_path = output_path + '.tmp.tif'
+        try:
+            with rasterio.open(tmp_path, 'w', **profile) as dst:
+                dst.write(data)
+                dst.update_tags(**src.tags())
+            os.replace(tmp_path, output_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        provenance = dict(
+            request,
+            created=datetime.datetime.now().isoformat(timespec='seconds'),
+            source_crs=src.crs.to_wkt() if src.crs else None,
+            source_shape=[src.height, src.width],
+            window={"col_off": int(window.col_off), "row_off": int(window.row_off),
+                    "width": int(window.width), "height": int(window.height)}
+        )
+    with open(provenance_path, 'w', encoding='utf-8') as f:
+        json.dump(provenance, f, indent=1)
+    return "clipped"
+
+
+def collect_rasters(paths):
+    """
+    Expands files and directories (searched recursively) into a sorted list of GeoTIFFs.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.lower().endswith(RASTER_EXTENSIONS))
+        else:
+            found.append(path)
+    return sorted(set(found))
+
+
+def ingest(paths, region, output_dir=DEFAULT_OUTPUT_DIR, pad=1, mask=False, force=False):
+    """
+    Clips every raster of paths (files or directories) to the region into output_dir.
+
+    Returns:
+    - List of (file_path, status) tuples.
+    """
+    results = []
+    for file_path in collect_rasters(paths):
+        output_path = os.path.join(output_dir, os.path.basename(file_path))
+        try:
+            status = clip_raster(file_path, region, output_path, pad, mask, force)
+        except Exception as e:
+            status = f"error: {e}"
+        results.append((file_path, status))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clip large rasters to a region with windowed reads.")
+    parser.add_argument("paths", nargs="+", help="Rasters or directories containing them")
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                        default=None, help=f"Region in lon/lat (default: Assaba {ASSABA_BBOX})")
+    parser.add_argument("--admin", default=None, help="Polygon layer of the region (instead of --bbox)")
+    parser.add_argument("--field", default=None, help="Attribute used to select admin features")
+    parser.add_argument("--values", nargs="+", default=None, help="Values of --field to keep")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory for the clipped rasters")
+    parser.add_argument("--pad", type=int, default=1, help="Extra pixels around the region")
+    parser.add_argument("--mask", action="store_true", help="Set pixels outside the admin polygons to nodata")
+    parser.add_argument("--force", action="store_true", help="Clip even if the output is up to date")
+    args = parser.parse_args(argv)
+
+    if args.admin:
+        if (args.field is None) != (args.values is None):
+            parser.error("--field and --values go together")
+        region = region_from_polygons(args.admin, args.field, args.values)
+    else:
+        region = region_from_bbox(args.bbox or ASSABA_BBOX)
+
+    results = ingest(args.paths, region, args.output_dir, args.pad, args.mask, args.force)
+    failed = 0
+    for file_path, status in results:
+        print(f"{file_path}: {status}")
+        failed += status.startswith("error")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,317 @@
-from dbfread import DBF
-import csv
+import os
 import sys
+import struct
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 
-def read_dbf(file_path):
+OUTPUT_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather"
+}
+
+# DBF field types decoded by the fast fixed-width reader
+SUPPORTED_TYPES = {'C', 'N', 'F', 'D', 'L'}
+
+
+def read_dbf_header(f):
     """
-    Reads a DBF file and saves its contents to a CSV file.
-    
+    Parses the header of an open DBF file.
+
+    Returns:
+    - n_records, header_length, record_length
+    - fields: list of dicts with name, type, offset (inside a record), length, decimals.
+    """
+    header = f.read(32)
+    n_records, header_length, record_length = struct.unpack('<IHH', header[4:12])
+    fields = []
+    offset = 1  # first byte of every record is the deletion flag
+    while True:
+        descriptor = f.read(32)
+        if not descriptor or descriptor[0] == 0x0D:
+            break
+        name = descriptor[:11].split(b'\0')[0].decode('ascii', errors='replace')
+        length = descriptor[16]
+        fields.append({
+            "name": name,
+            "type": chr(descriptor[11]),
+            "offset": offset,
+            "length": length,
+            "decimals": descriptor[17]
+        })
+        offset += length
+    return n_records, header_length, record_length, fields
+
+
+def _decode_column(raw, field, encoding):
+    """
+    Converts the fixed-width bytes of one field into a typed pandas Series.
+    """
+    kind = field["type"]
+    if kind == 'C':
+        # Right-stripped only, as dbfread does (leading spaces are data)
+        return pd.Series(np.char.decode(np.char.rstrip(raw, b' \0'), encoding), dtype=object)
+    text = np.char.strip(np.char.decode(raw, 'ascii', errors='replace'))
+    if kind in ('N', 'F'):
+        values = pd.to_numeric(pd.Series(text), errors='coerce')
+        if kind == 'N' and field["decimals"] == 0:
+            return values.astype('Int64')
+        return values.astype('float64')
+    if kind == 'D':
+        return pd.to_datetime(pd.Series(text), format='%Y%m%d', errors='coerce').dt.date
+    # Logical: T/Y true, F/N false, '?' or blank unknown
+    upper = np.char.upper(text)
+    result = pd.Series(pd.NA, index=range(len(text)), dtype='boolean')
+    result[np.isin(upper, ['T', 'Y'])] = True
+    result[np.isin(upper, ['F', 'N'])] = False
+    return result
+
+
+def iter_dbf_batches(file_path, columns=None, batch_size=50000, encoding='latin1'):
+    """
+    Streams a DBF file as DataFrames of at most batch_size records, decoding
+    only the requested columns with vectorized fixed-width slicing.
+
     Parameters:
     - file_path: Path to the DBF file.
+    - columns: Optional list of field names to keep (column projection).
+    - batch_size: Records per batch.
+    - encoding: Encoding of character fields.
+
+    Yields:
+    - pandas DataFrames with typed columns (deleted records are skipped).
     """
+    with open(file_path, 'rb') as f:
+        n_records, header_length, record_length, fields = read_dbf_header(f)
+        if columns is not None:
+            missing = set(columns) - {field["name"] for field in fields}
+            if missing:
+                raise ValueError(f"Unknown columns in {file_path}: {sorted(missing)}")
+            fields = [field for field in fields if field["name"] in columns]
+        if any(field["type"] not in SUPPORTED_TYPES for field in fields):
+            yield from _iter_dbfread_batches(file_path, [field["name"] for field in fields], batch_size, encoding)
+            return
+
+        f.seek(header_length)
+        remaining = n_records
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            buffer = f.read(count * record_length)
+            count = len(buffer) // record_length
+            if count == 0:
+                break
+            remaining -= count
+            records = np.frombuffer(buffer, dtype=np.uint8, count=count * record_length).reshape(count, record_length)
+            records = records[records[:, 0] != ord('*')]
+            data = {}
+            for field in fields:
+                start = field["offset"]
+                raw = np.ascontiguousarray(records[:, start:start + field["length"]]).view(f"S{field['length']}").ravel()
+                data[field["name"]] = _decode_column(raw, field, encoding).values
+            yield pd.DataFrame(data)
+
+
+def _iter_dbfread_batches(file_path, columns, batch_size, encoding):
+    """
+    Fallback for field types the fast reader does not decode (memo, etc.).
+    """
+    from dbfread import DBF
+
+    table = DBF(file_path, encoding=encoding)
+    batch = []
+    for record in table:
+        batch.append({name: record[name] for name in columns})
+        if len(batch) >= batch_size:
+            yield pd.DataFrame(batch, columns=columns)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=columns)
+
+
+def _arrow_schema(file_path, columns):
+    """
+    Arrow schema matching the DBF field definitions, so every batch is written
+    with the same column types.
+    """
+    import pyarrow as pa
+
+    with open(file_path, 'rb') as f:
+        fields = read_dbf_header(f)[3]
+    types = []
+    for field in fields:
+        if columns is not None and field["name"] not in columns:
+            continue
+        kind = field["type"]
+        if kind in ('N', 'F'):
+            arrow_type = pa.int64() if kind == 'N' and field["decimals"] == 0 else pa.float64()
+        elif kind == 'D':
+            arrow_type = pa.date32()
+        elif kind == 'L':
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        types.append(pa.field(field["name"], arrow_type))
+    return pa.schema(types)
+
+
+def output_path_for(file_path, output_format="csv", output_dir=None, relative_to=None):
+    """
+    Output path of a converted DBF (same name, new extension). With
+    relative_to, the input's folders below it are kept under output_dir, so
+    same-named tables from different folders do not overwrite each other.
+    """
+    base = os.path.basename(file_path)
+    stem = base[:-4] if base.lower().endswith('.dbf') else base
+    if output_dir is None:
+        directory = os.path.dirname(file_path)
+    elif relative_to is not None:
+        directory = os.path.join(output_dir, os.path.relpath(os.path.dirname(os.path.abspath(file_path)), relative_to))
+    else:
+        directory = output_dir
+    return os.path.normpath(os.path.join(directory, stem + OUTPUT_EXTENSIONS[output_format]))
+
+
+def convert_dbf(file_path, output_format="csv", output_dir=None, columns=None,
+                batch_size=50000, encoding='latin1', force=False, relative_to=None):
+    """
+    Converts one DBF file to CSV, Parquet or Feather, batch by batch.
+    Skips the file when its output is newer than the input (unless force).
+    A failed conversion leaves no partial output behind.
+
+    Returns:
+    - (file_path, status) where status is "converted", "up-to-date" or an error message.
+    """
+    out_path = output_path_for(file_path, output_format, output_dir, relative_to)
+    if not force and os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(file_path):
+        return file_path, "up-to-date"
+
+    tmp_path = out_path + '.tmp'
     try:
-        table = DBF(file_path, encoding='latin1')
-        csv_path = file_path.replace('.dbf', '.csv')
-        with open(csv_path, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(table.field_names)
-            for record in table:
-                writer.writerow(list(record.values()))
-        print(f"Saved attribute data to {csv_path}")
+        os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+        batches = iter_dbf_batches(file_path, columns, batch_size, encoding)
+        if output_format == "csv":
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+                header = True
+                for batch in batches:
+                    batch.to_csv(csvfile, index=False, header=header)
+                    header = False
+                if header:
+                    with open(file_path, 'rb') as f:
+                        names = [field["name"] for field in read_dbf_header(f)[3]
+                                 if columns is None or field["name"] in columns]
+                    csvfile.write(",".join(names) + "\n")
+        else:
+            import pyarrow as pa
+
+            schema = _arrow_schema(file_path, columns)
+            if output_format == "parquet":
+                import pyarrow.parquet as pq
+                writer = pq.ParquetWriter(tmp_path, schema)
+            else:
+                # Feather V2 is the Arrow IPC file format
+                writer = pa.ipc.new_file(tmp_path, schema)
+            try:
+                for batch in batches:
+                    table = pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+                    writer.write_table(table)
+            finally:
+                writer.close()
+        os.replace(tmp_path, out_path)
+        return file_path, "converted"
     except Exception as e:
-        print(f"Error reading {file_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return file_path, f"error: {e}"
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python read_dbf.py <path_to_dbf_file>")
+
+def collect_dbf_files(paths):
+    """
+    Expands files and directories (searched recursively) into a sorted list of .dbf files.
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.lower().endswith('.dbf'))
+        else:
+            found.append(path)
+    return sorted(set(found))
+
+
+def convert_dbfs(paths, output_format="csv", output_dir=None, columns=None, batch_size=50000,
+                 encoding='latin1', force=False, workers=None):
+    """
+    Converts many DBF files (or directories of them, e.g. the GPP *.tif.vat.dbf
+    tables and the admin layers) in parallel.
+
+    Parameters:
+    - paths: Files and/or directories.
+    - output_format: "csv", "parquet" or "feather".
+    - output_dir: Optional directory for all outputs (default: next to each input);
+      the inputs' folders below their common parent are recreated in it.
+    - columns: Optional list of columns to keep.
+    - batch_size: Records decoded per batch.
+    - encoding: Encoding of character fields.
+    - force: Convert even when the output is up to date.
+    - workers: Number of worker processes (default: CPU count).
+
+    Returns:
+    - List of (file_path, status) tuples.
+    """
+    if output_format not in OUTPUT_EXTENSIONS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    files = collect_dbf_files(paths)
+    if not files:
+        return []
+    relative_to = None
+    if output_dir is not None:
+        relative_to = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    options = (output_format, output_dir, columns, batch_size, encoding, force, relative_to)
+    if workers == 1 or len(files) == 1:
+        return [convert_dbf(f, *options) for f in files]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_dbf, f, *options) for f in files]
+        return [future.result() for future in futures]
+
+
+def read_dbf(file_path):
+    """
+    Reads a DBF file and saves its contents to a CSV file.
+
+    Parameters:
+    - file_path: Path to the DBF file.
+    """
+    _, status = convert_dbf(file_path, "csv", force=True)
+    if status == "converted":
+        print(f"Saved attribute data to {output_path_for(file_path, 'csv')}")
     else:
-        read_dbf(sys.argv[1])
+        print(f"Error reading {file_path}: {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert DBF attribute tables to CSV, Parquet or Feather.")
+    parser.add_argument("paths", nargs="+", help="DBF files or directories containing them")
+    parser.add_argument("--format", default="csv", choices=sorted(OUTPUT_EXTENSIONS), help="Output format")
+    parser.add_argument("--output-dir", default=None, help="Directory for the outputs (default: next to the inputs)")
+    parser.add_argument("--columns", nargs="+", default=None, help="Only keep these columns")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Records per batch")
+    parser.add_argument("--encoding", default="latin1", help="Encoding of character fields")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel worker processes")
+    parser.add_argument("--force", action="store_true", help="Convert even if the output is up to date")
+    args = parser.parse_args(argv)
+
+    results = convert_dbfs(
+        args.paths, args.format, args.output_dir, args.columns,
+        args.batch_size, args.encoding, args.force, args.workers
+    )
+    failed = 0
+    for file_path, status in results:
+        print(f"{file_path}: {status}")
+        failed += status.startswith("error")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
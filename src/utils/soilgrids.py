@@ -0,0 +1,228 @@
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+BASE_URL = "https://rest.isric.org/soilgrids/v2.0"
+CACHE_DB = 'soilgrids_cache.sqlite'
+
+DEFAULT_DEPTHS = ["0-5cm", "5-15cm", "15-30cm", "30-60cm", "60-100cm", "100-200cm"]
+DEFAULT_VALUES = ["mean"]
+
+# SoilGrids 250 m grid (Interrupted Goode Homolosine): origin and cell size in metres
+IGH_CRS = "+proj=igh +lat_0=0 +lon_0=0 +datum=WGS84 +units=m +no_defs"
+GRID_ORIGIN_X = -19949750.0
+GRID_ORIGIN_Y = 8361000.0
+CELL_SIZE = 250.0
+
+
+def snap_to_grid(lons, lats):
+    """
+    Snaps lon/lat points to SoilGrids 250 m cells, so points falling in the
+    same cell are fetched once.
+
+    Returns:
+    - cols, rows: int arrays of cell indices.
+    - center_lons, center_lats: cell centres (used for the queries).
+    """
+    from pyproj import Transformer
+
+    to_igh = Transformer.from_crs("EPSG:4326", IGH_CRS, always_xy=True)
+    xs, ys = to_igh.transform(np.asarray(lons, dtype=float), np.asarray(lats, dtype=float))
+    cols = np.floor((np.asarray(xs) - GRID_ORIGIN_X) / CELL_SIZE).astype(np.int64)
+    rows = np.floor((GRID_ORIGIN_Y - np.asarray(ys)) / CELL_SIZE).astype(np.int64)
+    center_xs = GRID_ORIGIN_X + (cols + 0.5) * CELL_SIZE
+    center_ys = GRID_ORIGIN_Y - (rows + 0.5) * CELL_SIZE
+    center_lons, center_lats = Transformer.from_crs(IGH_CRS, "EPSG:4326", always_xy=True).transform(center_xs, center_ys)
+    return cols, rows, np.asarray(center_lons), np.asarray(center_lats)
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 60 / calls_per_minute seconds apart, across threads.
+    """
+
+    def __init__(self, calls_per_minute):
+        self.interval = 60.0 / calls_per_minute
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def query_point(lon, lat, properties, depths=DEFAULT_DEPTHS, values=DEFAULT_VALUES, base_url=BASE_URL,
+                session=None, max_retries=4):
+    """
+    Queries several properties for one point in a single call.
+
+    Returns:
+    - Dict of property name -> layer JSON (unit_measure and depths).
+    """
+    params = [("lon", lon), ("lat", lat)]
+    params += [("property", p) for p in properties]
+    params += [("depth", d) for d in depths]
+    params += [("value", v) for v in values]
+    delay = 5
+    for attempt in range(max_retries):
+        response = (session or requests).get(f"{base_url}/properties/query", params=params, timeout=60)
+        if response.status_code == 200:
+            layers = response.json().get("properties", {}).get("layers", [])
+            return {layer["name"]: layer for layer in layers}
+        if response.status_code in (429, 502, 503, 504) and attempt + 1 < max_retries:
+            time.sleep(delay)
+            delay *= 2
+            continue
+        raise Exception(f"Error retrieving soil data (status code: {response.status_code})")
+
+
+def _connect_cache(cache_path):
+    connection = sqlite3.connect(cache_path)
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS layers ("
+        "col INTEGER, row INTEGER, property TEXT, selection TEXT, layer TEXT, "
+        "PRIMARY KEY (col, row, property, selection))"
+    )
+    return connection
+
+
+def _top_depth(label):
+    """
+    Top of a depth label in cm ("15-30cm" -> 15), for sorting depths from the surface down.
+    """
+    try:
+        return float(str(label).split('-')[0])
+    except ValueError:
+        return np.inf
+
+
+def _layer_rows(layer, point_ids, prop):
+    unit = layer.get("unit_measure", {})
+    d_factor = unit.get("d_factor") or 1
+    rows = []
+    for depth in layer.get("depths", []):
+        for statistic, value in depth.get("values", {}).items():
+            converted = None if value is None else value / d_factor
+            for point_id in point_ids:
+                rows.append({
+                    "point_id": point_id,
+                    "property": prop,
+                    "depth": depth.get("label"),
+                    "statistic": statistic,
+                    "value": converted,
+                    "unit": unit.get("target_units")
+                })
+    return rows
+
+
+def get_soil_properties(lons, lats, properties, depths=DEFAULT_DEPTHS, values=DEFAULT_VALUES,
+                        cache_path=CACHE_DB, workers=4, calls_per_minute=5, base_url=BASE_URL):
+    """
+    Soil properties for many points as a tidy (point, property, depth) table.
+
+    Points are snapped to the SoilGrids 250 m grid and each cell is fetched at
+    most once, requesting only the properties missing from the persistent cache.
+    Calls run concurrently under a shared rate limit.
+
+    Parameters:
+    - lons, lats: Point coordinates (degrees).
+    - properties: SoilGrids property names (e.g. ["nitrogen", "soc", "phh2o"]).
+    - depths: Depth intervals to request.
+    - values: Statistics to request (e.g. ["mean", "Q0.5"]).
+    - cache_path: SQLite cache file.
+    - workers: Concurrent requests.
+    - calls_per_minute: Rate limit shared by all workers.
+    - base_url: API root (replaceable by a local stub).
+
+    Returns:
+    - DataFrame with point_id, lon, lat, property, depth, statistic, value, unit.
+    """
+    import pandas as pd
+
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    cols, rows, center_lons, center_lats = snap_to_grid(lons, lats)
+    selection = json.dumps([sorted(depths), sorted(values)])
+
+    cells = {}
+    for point_id, cell in enumerate(zip(cols.tolist(), rows.tolist())):
+        cells.setdefault(cell, {"points": [], "lon": center_lons[point_id], "lat": center_lats[point_id]})
+        cells[cell]["points"].append(point_id)
+
+    connection = _connect_cache(cache_path)
+    try:
+        layers = {}
+        missing = {}
+        for cell in cells:
+            for prop in properties:
+                cached = connection.execute(
+                    "SELECT layer FROM layers WHERE col = ? AND row = ? AND property = ? AND selection = ?",
+                    (cell[0], cell[1], prop, selection)
+                ).fetchone()
+                if cached is not None:
+                    layers[(cell, prop)] = json.loads(cached[0])
+                else:
+                    missing.setdefault(cell, []).append(prop)
+
+        limiter = RateLimiter(calls_per_minute)
+        local = threading.local()
+
+        def fetch(cell):
+            if not hasattr(local, "session"):
+                local.session = requests.Session()
+            limiter.wait()
+            return cell, query_point(cells[cell]["lon"], cells[cell]["lat"], missing[cell],
+                                     depths, values, base_url, local.session)
+
+        if missing:
+            print(f"Fetching {len(missing)} SoilGrids cells ({len(cells) - len(missing)} fully cached)")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for cell, fetched in executor.map(fetch, list(missing)):
+                    for prop in missing[cell]:
+                        layer = fetched.get(prop, {"name": prop, "depths": []})
+                        layers[(cell, prop)] = layer
+                        connection.execute(
+                            "INSERT OR REPLACE INTO layers (col, row, property, selection, layer) VALUES (?, ?, ?, ?, ?)",
+                            (cell[0], cell[1], prop, selection, json.dumps(layer))
+                        )
+                    connection.commit()
+    finally:
+        connection.close()
+
+    table = []
+    for cell, info in cells.items():
+        for prop in properties:
+            table.extend(_layer_rows(layers[(cell, prop)], info["points"], prop))
+    df = pd.DataFrame(table, columns=["point_id", "property", "depth", "statistic", "value", "unit"])
+    df.insert(1, "lon", lons[df["point_id"].to_numpy(dtype=int)])
+    df.insert(2, "lat", lats[df["point_id"].to_numpy(dtype=int)])
+    df = df.assign(top_depth=df["depth"].map(_top_depth))
+    df = df.sort_values(["point_id", "property", "top_depth"], kind="stable")
+    return df.drop(columns="top_depth").reset_index(drop=True)
+
+
+def get_soil_nutrients(lat, lon, property_name="nitrogen"):
+    """
+    Retrieve soil nutrient data for a given location (single point, single property).
+    """
+    return get_soil_properties([lon], [lat], [property_name])
+
+
+def main():
+    # Example: a few candidate restoration sites in Assaba
+    site_lons = [-11.40, -11.42, -12.10, -11.05]
+    site_lats = [16.62, 16.63, 16.90, 17.20]
+    soil = get_soil_properties(site_lons, site_lats, ["nitrogen", "soc", "phh2o"], depths=["0-5cm", "5-15cm"])
+    print(soil)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 #!/usr/bin/env python
-import ee
-import json
-import geemap
 import sys
+from gee import EarthEngineClient
+from gee_query import annual_region_table, print_table, DEFAULT_PRODUCTS
 
 def main():
+    import ee
+    import geemap
+
     # Initialize Earth Engine specifying the project (modify the ID if necessary)
     try:
-        ee.Initialize(project="g20-hackaton")
+        client = EarthEngineClient(project="g20-hackaton")
     except Exception as e:
         print("Error during Earth Engine initialization:", e)
         sys.exit(1)
@@ -19,58 +21,12 @@ def main():
     # Define the date range and the years (we use 2022 as an example layer)
     years = list(range(2010, 2024))
 
-    # 1. Retrieve EVI (MODIS MOD13Q1)
-    def annual_mean_evi(year):
-        start = ee.Date.fromYMD(year, 1, 1)
-        end = start.advance(1, 'year')
-        image = (
-            ee.ImageCollection('MODIS/006/MOD13Q1')
-            .filterDate(start, end)
-            .filterBounds(mauritania_sahel)
-            .select('EVI')
-            .mean()
-            .set('year', year)
-        )
-        return image
-
-    annual_evi = ee.ImageCollection(ee.List(years).map(annual_mean_evi))
-    print("EVI Collection:")
-    print(json.dumps(annual_evi.getInfo(), indent=2))
-
-    # 2. Retrieve LAI (MODIS MOD15A2H) – we use "Lai_500m"
-    def annual_mean_lai(year):
-        start = ee.Date.fromYMD(year, 1, 1)
-        end = start.advance(1, 'year')
-        image = (
-            ee.ImageCollection('MODIS/006/MOD15A2H')
-            .filterDate(start, end)
-            .filterBounds(mauritania_sahel)
-            .select('Lai_500m')
-            .mean()
-            .set('year', year)
-        )
-        return image
-
-    annual_lai = ee.ImageCollection(ee.List(years).map(annual_mean_lai))
-    print("LAI Collection:")
-    print(json.dumps(annual_lai.getInfo(), indent=2))
-
-    # 3. Retrieve Precipitation (CHIRPS Daily) – calculate the annual total
-    def annual_precip(year):
-        start = ee.Date.fromYMD(year, 1, 1)
-        end = start.advance(1, 'year')
-        image = (
-            ee.ImageCollection('UCSB-CHG/CHIRPS/DAILY')
-            .filterDate(start, end)
-            .filterBounds(mauritania_sahel)
-            .sum()
-            .set('year', year)
-        )
-        return image
-
-    annual_precip = ee.ImageCollection(ee.List(years).map(annual_precip))
-    print("Annual Precipitation:")
-    print(json.dumps(annual_precip.getInfo(), indent=2))
+    # Per-year regional statistics (mean EVI and LAI, total CHIRPS precipitation),
+    # computed in one batched server-side reduction; only the table is fetched
+    regions = {"mauritania_sahel": [-17, 15, -4, 24]}
+    rows = annual_region_table(client, DEFAULT_PRODUCTS, years, regions)
+    print("Annual EVI, LAI and precipitation:")
+    print_table(rows)
 
     # Create the interactive map with geemap, centered on the region
     # Set layer_ctrl=False to remove the layer control in the top-right
@@ -1,39 +1,243 @@
-import requests
+import os
 import json
+import sqlite3
+import requests
 
+BASE_URL = "http://land.copernicus.eu/api"
+CATALOG_DB = 'copernicus_catalog.sqlite'
 
-def search_datasets():
-    # URL to search for datasets with specified metadata fields.
-    url = (
-        "http://land.copernicus.eu//api/@search"
-        "?portal_type=DataSet"
-        "&metadata_fields=UID"
-        "&metadata_fields=dataset_full_format"
-        "&metadata_fields=dataset_download_information"
-    )
+METADATA_FIELDS = [
+    "UID",
+    "modified",
+    "dataset_full_format",
+    "dataset_download_information"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    uid TEXT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    url TEXT,
+    formats TEXT,
+    modified TEXT,
+    raw TEXT
+);
+CREATE TABLE IF NOT EXISTS download_options (
+    id TEXT PRIMARY KEY,
+    dataset_uid TEXT,
+    name TEXT,
+    format TEXT,
+    collection TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS download_options_dataset ON download_options (dataset_uid);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def search_datasets(b_start=0, b_size=50, base_url=BASE_URL, session=None, sort_on="modified"):
+    """
+    Fetches one page of the dataset listing, newest modification first.
+
+    Parameters:
+    - b_start: Index of the first item of the page.
+    - b_size: Page size.
+    - base_url: API root (replaceable by a local stand-in).
+    - session: Optional requests.Session.
+
+    Returns:
+    - The JSON page ("items", "items_total", "batching").
+    """
+    params = [
+        ("portal_type", "DataSet"),
+        ("b_start", b_start),
+        ("b_size", b_size),
+        ("sort_on", sort_on),
+        ("sort_order", "descending")
+    ] + [("metadata_fields", field) for field in METADATA_FIELDS]
     headers = {
         'Accept': 'application/json'
     }
 
-    response = requests.get(url, headers=headers)
+    response = (session or requests).get(f"{base_url}/@search", params=params, headers=headers)
 
     if response.status_code == 200:
-        data = response.json()
-        # Pretty-print the JSON response.
-        print("Search results:")
-        print(json.dumps(data, indent=2))
-        return data
+        return response.json()
     else:
         raise Exception(f"Error: HTTP {response.status_code} - {response.text}")
 
 
+def connect_catalog(db_path=CATALOG_DB):
+    """
+    Opens (and initializes) the local catalog database.
+    """
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    try:
+        connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS datasets_fts USING fts5(uid UNINDEXED, title, description, formats)"
+        )
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5: find_datasets falls back to LIKE
+        pass
+    return connection
+
+
+def _has_fts(connection):
+    row = connection.execute("SELECT name FROM sqlite_master WHERE name = 'datasets_fts'").fetchone()
+    return row is not None
+
+
+def _as_text(value):
+    """
+    Formats/collections come either as plain strings or as {"token", "title"} vocab terms.
+    """
+    if isinstance(value, dict):
+        return str(value.get("title") or value.get("token") or "")
+    if isinstance(value, list):
+        return ", ".join(_as_text(v) for v in value)
+    return "" if value is None else str(value)
+
+
+def _store_item(connection, item, has_fts):
+    uid = item.get("UID") or item.get("@id")
+    formats = _as_text(item.get("dataset_full_format"))
+    connection.execute(
+        "INSERT OR REPLACE INTO datasets (uid, title, description, url, formats, modified, raw) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (uid, item.get("title", ""), item.get("description", ""), item.get("@id", ""),
+         formats, item.get("modified", ""), json.dumps(item))
+    )
+    if has_fts:
+        connection.execute("DELETE FROM datasets_fts WHERE uid = ?", (uid,))
+        connection.execute(
+            "INSERT INTO datasets_fts (uid, title, description, formats) VALUES (?, ?, ?, ?)",
+            (uid, item.get("title", ""), item.get("description", ""), formats)
+        )
+
+    connection.execute("DELETE FROM download_options WHERE dataset_uid = ?", (uid,))
+    options = item.get("dataset_download_information") or {}
+    if isinstance(options, dict):
+        options = options.get("items", [])
+    for option in options:
+        connection.execute(
+            "INSERT OR REPLACE INTO download_options (id, dataset_uid, name, format, collection, raw) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (option.get("@id"), uid, _as_text(option.get("name")), _as_text(option.get("full_format")),
+             _as_text(option.get("collection")), json.dumps(option))
+        )
+
+
+def harvest_catalog(db_path=CATALOG_DB, base_url=BASE_URL, page_size=50, full=False, session=None):
+    """
+    Pages through the dataset listing and stores it in the local catalog.
+
+    Pages come newest-modified first, so an incremental refresh stops at the
+    first dataset older than the last harvest.
+
+    Parameters:
+    - db_path: SQLite file of the catalog.
+    - base_url: API root.
+    - page_size: Items per request.
+    - full: Re-harvest everything instead of refreshing incrementally.
+    - session: Optional requests.Session.
+
+    Returns:
+    - Number of datasets added or updated.
+    """
+    connection = connect_catalog(db_path)
+    has_fts = _has_fts(connection)
+    row = connection.execute("SELECT value FROM meta WHERE key = 'last_modified'").fetchone()
+    last_modified = None if (full or row is None) else row["value"]
+
+    updated = 0
+    newest = last_modified
+    b_start = 0
+    try:
+        while True:
+            page = search_datasets(b_start, page_size, base_url, session)
+            items = page.get("items", [])
+            stop = not items
+            for item in items:
+                modified = item.get("modified") or ""
+                if last_modified is not None and modified and modified < last_modified:
+                    stop = True
+                    break
+                _store_item(connection, item, has_fts)
+                updated += 1
+                if modified and (newest is None or modified > newest):
+                    newest = modified
+            connection.commit()
+            b_start += len(items)
+            if stop or b_start >= page.get("items_total", 0) or not page.get("batching", {}).get("next"):
+                break
+        if newest is not None:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_modified', ?)", (newest,))
+            connection.commit()
+    finally:
+        connection.close()
+    print(f"Catalog {db_path}: {updated} datasets added or updated.")
+    return updated
+
+
+def find_datasets(query, db_path=CATALOG_DB, limit=20):
+    """
+    Full-text search over dataset titles, descriptions and formats.
+
+    Returns:
+    - List of dicts with uid, title, formats and url, best matches first.
+    """
+    connection = connect_catalog(db_path)
+    try:
+        if _has_fts(connection):
+            terms = " ".join(f'"{word}"' for word in query.replace('"', ' ').split())
+            rows = connection.execute(
+                "SELECT d.uid, d.title, d.formats, d.url FROM datasets_fts f "
+                "JOIN datasets d ON d.uid = f.uid WHERE datasets_fts MATCH ? ORDER BY rank LIMIT ?",
+                (terms, limit)
+            ).fetchall()
+        else:
+            pattern = f"%{query}%"
+            rows = connection.execute(
+                "SELECT uid, title, formats, url FROM datasets "
+                "WHERE title LIKE ? OR description LIKE ? LIMIT ?",
+                (pattern, pattern, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        connection.close()
+
+
+def get_download_options(dataset_uid, db_path=CATALOG_DB):
+    """
+    Download options (DatasetDownloadInformationID, name, format) of a dataset.
+    """
+    connection = connect_catalog(db_path)
+    try:
+        rows = connection.execute(
+            "SELECT id, name, format, collection FROM download_options WHERE dataset_uid = ? ORDER BY name",
+            (dataset_uid,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        connection.close()
+
+
 def main():
     try:
-        results = search_datasets()
+        harvest_catalog()
+        for dataset in find_datasets("Season Maximum Value"):
+            print(f"{dataset['uid']}  {dataset['title']}  [{dataset['formats']}]")
+            for option in get_download_options(dataset["uid"]):
+                print(f"    {option['id']}  {option['name']}  {option['format']}")
     except Exception as e:
         print("Search failed:", e)
 
 
 if __name__ == "__main__":
     main()
-
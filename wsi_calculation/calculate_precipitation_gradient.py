@@ -2,33 +2,53 @@ import os
 import numpy as np
 import rasterio
 from rasterio.transform import Affine
-from rasterio.plot import show
-from scipy.ndimage import gaussian_gradient_magnitude
+try:
+    from analysis_tools.instrumentation_module import start_run, finish_run, stage
+except ImportError:
+    # Run as a plain script (without g20.py's path setup): no instrumentation
+    import contextlib
+
+    def start_run(run_name, report_path=None, profile=None):
+        pass
+
+    def finish_run():
+        return None
+
+    def stage(name, kind="compute"):
+        return contextlib.nullcontext()
 
 def calculate_gradient(input_tif, output_tif):
+    from scipy.ndimage import gaussian_gradient_magnitude
+
     with rasterio.open(input_tif) as src:
-        data = src.read(1)
-        gradient = gaussian_gradient_magnitude(data, sigma=1)
+        with stage("read precipitation", "read"):
+            data = src.read(1)
+        with stage("gradient", "compute"):
+            gradient = gaussian_gradient_magnitude(data, sigma=1)
         
         transform = src.transform
         profile = src.profile
         profile.update(dtype=rasterio.float32, count=1, compress='lzw')
         
-        with rasterio.open(output_tif, 'w', **profile) as dst:
+        with stage("write gradient", "write"), rasterio.open(output_tif, 'w', **profile) as dst:
             dst.write(gradient.astype(rasterio.float32), 1)
 
 def main():
+    start_run("precipitation_gradient")
     input_dir = 'data/Datasets_Hackathon/Climate_Precipitation_Data/'
     output_dir = 'data/processed/tif_files/'
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    for year in range(2010, 2024):
-        input_tif = os.path.join(input_dir, f'{year}R.tif')
-        output_tif = os.path.join(output_dir, f'{year}_precipitation_gradient.tif')
-        calculate_gradient(input_tif, output_tif)
-        print(f'Gradient TIFF saved to {output_tif}')
+    try:
+        for year in range(2010, 2024):
+            input_tif = os.path.join(input_dir, f'{year}R.tif')
+            output_tif = os.path.join(output_dir, f'{year}_precipitation_gradient.tif')
+            calculate_gradient(input_tif, output_tif)
+            print(f'Gradient TIFF saved to {output_tif}')
+    finally:
+        finish_run()
 
 if __name__ == '__main__':
     main()
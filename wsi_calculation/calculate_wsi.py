@@ -1,7 +1,4 @@
-import pandas as pd
 import numpy as np
-import rasterio
-from rasterio.transform import from_origin
 
 def calculate_wsi(precipitation_data):
     # Example calculation for WSI
@@ -11,6 +8,9 @@ def calculate_wsi(precipitation_data):
     return precipitation_data
 
 def save_as_tiff(data, output_file):
+    import rasterio
+    from rasterio.transform import from_origin
+
     transform = from_origin(0, 0, 1, 1)  # Example transform, adjust as needed
     new_dataset = rasterio.open(
         output_file,
@@ -27,6 +27,8 @@ def save_as_tiff(data, output_file):
     new_dataset.close()
 
 def main():
+    import pandas as pd
+
     # Read the precipitation data from the CSV file
     input_file = 'precipitation_results.csv'
     precipitation_data = pd.read_csv(input_file)